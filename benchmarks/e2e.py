@@ -0,0 +1,352 @@
+"""
+Benchmark ponta a ponta: sensor -> broker -> gateway (custom_callback, regras,
+dispatcher) -> comando gRPC -> atuador.
+
+Roda em um único processo, sem rede externa: transporte RabbitMQ em memória
+(source.utils.rabbitmq.memory), o gateway real, sensores reais e um servidor
+gRPC local que faz o papel dos atuadores. Para cada tamanho de frota mede:
+
+  - throughput: leituras publicadas o mais rápido possível -> mensagens/s processadas;
+  - ingest: leituras no ritmo nominal da frota -> latência da publicação até o
+    fim do custom_callback do gateway (p50/p99);
+  - command: leituras que mudam o estado desejado -> latência até o comando
+    chegar ao atuador (p50/p99).
+
+Uso:
+    python -m benchmarks.e2e --sizes 10 100 1000
+    python -m benchmarks.e2e --batch   # sensores em micro-lotes (BatchingPublisher)
+    python -m benchmarks.e2e --baseline benchmarks/results/anterior.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent import futures
+from datetime import datetime, timezone
+
+import grpc
+
+# Todas as conexões do processo (inclusive a do gateway) usam o broker em memória
+os.environ["RABBITMQ_TRANSPORT"] = "memory"
+
+from configs.envs import CURRENT_DIR
+from source.devices.actuators.proto.actuators_pb2 import Response
+from source.devices.actuators.proto.actuators_pb2_grpc import (ActuatorServiceServicer,
+                                                              add_ActuatorServiceServicer_to_server)
+from source.devices.sensors.abs.sensor_abs import SensorABS
+from source.devices.sensors.fleet import SENSOR_TYPES
+from source.gateway.rules import ACTIVE, INACTIVE
+from source.utils.rabbitmq import BatchingPublisher, RabbitMQConnection
+from source.utils.rabbitmq.memory import MemoryBroker
+
+DEFAULT_OUTPUT = CURRENT_DIR / "benchmarks" / "results" / "latest.json"
+
+# Atuador de cada tipo de sensor: (campos do registro, prefixo da routing key)
+ACTUATORS = {
+    "temperature": ({"type": "actuator", "subtype": "ac", "state": "off", "temperature": 22.0},
+                    "command.air_conditioner"),
+    "luminosity": ({"type": "actuator", "subtype": "lamp", "state": "off"}, "command.lamp"),
+    "presence": ({"type": "door", "state": "closed"}, "command.door"),
+}
+
+
+class ProbeActuators(ActuatorServiceServicer):
+    """Servidor gRPC que atende todos os atuadores do benchmark e registra a chegada de cada comando."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.arrivals = {}  # device_id -> perf_counter da última chamada
+        self.last_arrival = 0.0
+
+    def _record(self, request):
+        now = time.perf_counter()
+        with self._condition:
+            self.arrivals[request.id] = now
+            self.last_arrival = now
+            self._condition.notify_all()
+        return Response(success=True, error_message="")
+
+    controlLightBulb = controlAC = controlDoor = controlSprinkler = \
+        lambda self, request, context: self._record(request)
+
+    def wait_for(self, device_ids, since, timeout):
+        """Aguarda um comando (após 'since') para cada dispositivo; retorna {id: chegada}."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                arrived = {device_id: self.arrivals[device_id] for device_id in device_ids
+                           if self.arrivals.get(device_id, 0.0) > since}
+                remaining = deadline - time.monotonic()
+                if len(arrived) == len(device_ids) or remaining <= 0:
+                    return arrived
+                self._condition.wait(remaining)
+
+
+def percentiles(values):
+    """p50/p99/max em milissegundos."""
+    if not values:
+        return {"count": 0, "p50": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))] * 1000, 3)
+
+    return {"count": len(ordered), "p50": at(0.50), "p99": at(0.99), "max": at(1.0)}
+
+
+def log(message):
+    # stdout fica redirecionado (o gateway imprime cada mensagem); o progresso vai para stderr
+    print(f"[BENCH] {message}", file=sys.stderr, flush=True)
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.broker = MemoryBroker.default()
+        self.latencies = []
+        self.processed = 0
+        from source.gateway import gateway
+        self.gw = gateway
+        # Gateway real, sem persistência em disco
+        gateway.registry_store = None
+        gateway.custom_callback = self.measured(gateway.custom_callback)
+        self.connection = RabbitMQConnection(transport="memory")
+        self.publishers = {sensor_type: SensorABS.create_publisher(self.connection, sensor_type, verbose=False,
+                                                                   batch=args.batch)
+                           for sensor_type in SENSOR_TYPES}
+
+        self.probe = ProbeActuators()
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=args.grpc_workers))
+        add_ActuatorServiceServicer_to_server(self.probe, self.server)
+        self.grpc_port = self.server.add_insecure_port("localhost:0")
+
+    def measured(self, callback):
+        """Envolve o callback do gateway: conta as mensagens e mede publicação -> fim do processamento."""
+        lock = threading.Lock()
+
+        def wrapper(body, *args):
+            callback(body, *args)
+            done = time.perf_counter()
+            message = body if isinstance(body, (dict, list)) else json.loads(body)
+            # Um micro-lote conta como uma leitura por mensagem
+            messages = message if isinstance(message, list) else [message]
+            sent = [item["sent_at"] for item in messages if item.get("sent_at") is not None]
+            with lock:
+                self.processed += len(messages)
+                self.latencies.extend(done - sent_at for sent_at in sent)
+        return wrapper
+
+    def flush(self):
+        """Publica os micro-lotes pendentes (com --batch)."""
+        for publisher in self.publishers.values():
+            if isinstance(publisher, BatchingPublisher):
+                publisher.flush()
+
+    def start(self):
+        self.server.start()
+        self.gw.start_background_services()
+
+    def stop(self):
+        self.gw.stop_background_services()
+        self.server.stop(0)
+
+    # Preparação
+    def create_fleet(self, size):
+        """Cria 'size' sensores (tipos alternados), cada um com o seu atuador registrado no gateway."""
+        sensors = []
+        types = list(SENSOR_TYPES)
+        for index in range(size):
+            sensor_type = types[index % len(types)]
+            fields, routing_prefix = ACTUATORS[sensor_type]
+            actuator_id = f"bench{size}_{sensor_type}_actuator_{index}"
+            status = dict(fields, id=actuator_id, grpc_host="localhost", grpc_port=self.grpc_port,
+                          min_dwell=0, max_rate=None)  # sem dwell/limite de taxa: mede o caminho, não a proteção
+            self.connection.channel.basic_publish(exchange="sensors_exchange",
+                                                  routing_key=f"{routing_prefix}.{actuator_id}",
+                                                  body=json.dumps(status))
+            sensors.append(SENSOR_TYPES[sensor_type](f"bench{size}_{sensor_type}_{index}",
+                                                     f"Bench {sensor_type} {index}", actuator_id,
+                                                     self.connection, self.publishers[sensor_type]))
+        self.wait(lambda: all(sensor.related_device in self.gw.disp for sensor in sensors), "registro dos atuadores")
+        return sensors
+
+    def wait(self, condition, what, timeout=None):
+        deadline = time.monotonic() + (timeout or self.args.timeout)
+        while not condition():
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Tempo esgotado aguardando {what}")
+            time.sleep(0.002)
+
+    def backlog(self):
+        """Mensagens ainda não confirmadas (na fila ou em processamento)."""
+        stats = self.broker.stats()
+        return stats["queued"] + stats["delivered"] - stats["acked"]
+
+    def settle(self):
+        """Aguarda o broker e o dispatcher esvaziarem e zera as medições."""
+        self.wait(lambda: self.backlog() == 0 and self.gw.dispatcher.pending() == 0, "fila vazia")
+        while time.perf_counter() - self.probe.last_arrival < 0.2:
+            time.sleep(0.05)
+        self.latencies = []
+        return self.processed
+
+    # Fases
+    def run_throughput(self, sensors):
+        total = max(self.args.messages, len(sensors))
+        processed = self.settle()
+        start = time.perf_counter()
+        for index in range(total):
+            sensor = sensors[index % len(sensors)]
+            sensor.publish_data(sensor.generate_data())
+        self.flush()
+        published = time.perf_counter()
+        self.wait(lambda: self.processed - processed >= total, "processamento das leituras")
+        elapsed = time.perf_counter() - start
+        return {
+            "messages": total,
+            "seconds": round(elapsed, 4),
+            "msgs_per_s": round(total / elapsed, 1),
+            "publish_msgs_per_s": round(total / (published - start), 1),
+        }
+
+    def run_ingest(self, sensors):
+        rate = len(sensors) / self.args.interval
+        total = len(sensors) * self.args.rounds
+        processed = self.settle()
+        start = time.perf_counter()
+        for index in range(total):
+            delay = start + index / rate - time.perf_counter()
+            if delay > 0.001:
+                time.sleep(delay)
+            sensor = sensors[index % len(sensors)]
+            data = sensor.generate_data()
+            data["sent_at"] = time.perf_counter()
+            sensor.publish_data(data)
+        self.flush()
+        self.wait(lambda: self.processed - processed >= total, "processamento das leituras")
+        return dict(percentiles(self.latencies), offered_msgs_per_s=round(rate, 1))
+
+    def run_commands(self, sensors):
+        latencies = []
+        missing = 0
+        for _ in range(self.args.rounds):
+            self.settle()
+            sent_at = {}
+            readings = [(sensor, self.flip(sensor)) for sensor in sensors]
+            since = time.perf_counter()
+            for sensor, data in readings:
+                sent_at[sensor.related_device] = time.perf_counter()
+                sensor.publish_data(data)
+            self.flush()
+            arrived = self.probe.wait_for(list(sent_at), since, self.args.timeout)
+            latencies.extend(arrived[device_id] - sent_at[device_id] for device_id in arrived)
+            missing += len(sent_at) - len(arrived)
+        return dict(percentiles(latencies), missing=missing)
+
+    def flip(self, sensor):
+        """Leitura que leva o atuador do sensor ao estado oposto ao atual, segundo as regras carregadas."""
+        rule = self.gw.rule_table.rules[sensor.type]
+        actuator = self.gw.disp.get(sensor.related_device)
+        target = INACTIVE if rule.code(actuator.get("state")) == ACTIVE else ACTIVE
+        value = rule.high + 1 if rule.above == target else rule.low - 1
+        data = sensor.generate_data()
+        data[rule.field] = ("on" if value > 0.5 else "off") if rule.field == "state" else value
+        return data
+
+    def run_size(self, size):
+        log(f"Frota de {size} sensores...")
+        sensors = self.create_fleet(size)
+        result = {"sensors": size}
+        result["throughput"] = self.run_throughput(sensors)
+        log(f"  throughput: {result['throughput']['msgs_per_s']} msgs/s")
+        result["ingest_latency_ms"] = self.run_ingest(sensors)
+        log(f"  ingest: p50 {result['ingest_latency_ms']['p50']} ms, p99 {result['ingest_latency_ms']['p99']} ms")
+        result["command_latency_ms"] = self.run_commands(sensors)
+        log(f"  command: p50 {result['command_latency_ms']['p50']} ms, "
+            f"p99 {result['command_latency_ms']['p99']} ms, {result['command_latency_ms']['missing']} sem resposta")
+        return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=CURRENT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Regressões em relação ao baseline: queda de throughput ou aumento de p99 acima de 'tolerance'."""
+    previous = {entry["sensors"]: entry for entry in baseline.get("results", [])}
+    regressions = []
+    for entry in results:
+        old = previous.get(entry["sensors"])
+        if old is None:
+            continue
+        if entry["throughput"]["msgs_per_s"] < old["throughput"]["msgs_per_s"] * (1 - tolerance):
+            regressions.append(f"{entry['sensors']} sensores: throughput {old['throughput']['msgs_per_s']} -> "
+                               f"{entry['throughput']['msgs_per_s']} msgs/s")
+        for key in ("ingest_latency_ms", "command_latency_ms"):
+            new_p99, old_p99 = entry[key]["p99"], old[key]["p99"]
+            if new_p99 is not None and old_p99 is not None and new_p99 > old_p99 * (1 + tolerance):
+                regressions.append(f"{entry['sensors']} sensores: {key} p99 {old_p99} -> {new_p99} ms")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta do gateway")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help='Tamanhos de frota')
+    parser.add_argument('--messages', type=int, default=20000, help='Leituras na fase de throughput')
+    parser.add_argument('--interval', type=float, default=1.0, help='Segundos entre leituras de cada sensor (ingest)')
+    parser.add_argument('--rounds', type=int, default=2, help='Rodadas das fases de ingest e de comandos')
+    parser.add_argument('--grpc_workers', type=int, default=16, help='Threads do servidor gRPC dos atuadores')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Espera máxima (s) de cada fase')
+    parser.add_argument('--output', type=str, default=str(DEFAULT_OUTPUT), help='Arquivo JSON de resultados')
+    parser.add_argument('--batch', action='store_true',
+                        help='Sensores publicam em micro-lotes (BatchingPublisher)')
+    parser.add_argument('--baseline', type=str, default=None, help='Resultados anteriores para comparação')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Variação aceita antes de acusar regressão')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        bench = Bench(args)
+        bench.start()
+        try:
+            results = [bench.run_size(size) for size in args.sizes]
+        finally:
+            bench.stop()
+
+    report = {
+        "revision": git_revision(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    log(f"Resultados gravados em {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            log(f"REGRESSÃO: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
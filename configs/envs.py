@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 CURRENT_DIR = Path(__file__).resolve().parent.parent  
@@ -5,6 +6,22 @@ RABBITMQ_HOST = "localhost"
 RABBITMQ_PORT = 5672
 RABBITMQ_USER = "guest"
 RABBITMQ_PASSWORD = "guest"
+TELEMETRY_CODEC = os.environ.get("TELEMETRY_CODEC", "protobuf")  # 'protobuf' ou 'json' (leituras e status)
+# 'amqp' (RabbitMQ) ou 'memory' (broker em memória no processo, para testes e benchmarks)
+RABBITMQ_TRANSPORT = os.environ.get("RABBITMQ_TRANSPORT", "amqp")
+# Publicação com confirmações em pipeline (RabbitMQPublisher e AsyncRabbitMQPublisher com confirm=True)
+PUBLISH_CONFIRM_WINDOW = 1000  # publicações aguardando confirmação antes de bloquear
+PUBLISH_CONFIRM_TIMEOUT = 30  # segundos
+# Consumo (RabbitMQConsumer)
+CONSUMER_PREFETCH = 200  # mensagens entregues e ainda sem ack, por consumidor
+CONSUMER_ACK_BATCH = 50  # mensagens confirmadas por basic_ack (multiple=True)
+CONSUMER_ACK_INTERVAL = 0.2  # segundos até confirmar um lote incompleto
+# Micro-lotes de leituras (BatchingPublisher): várias leituras por mensagem AMQP
+SENSOR_BATCH = os.environ.get("SENSOR_BATCH", "0") == "1"  # sensores e frota publicam em lotes
+BATCH_MAX_SIZE = 100  # leituras por mensagem
+BATCH_MAX_DELAY = 0.5  # segundos máximos que uma leitura espera no lote
+BATCH_COMPRESS_MIN = 1024  # bytes a partir dos quais o lote é comprimido (0 = nunca)
+BATCH_COMPRESS_LEVEL = 1  # nível do zlib: o mais rápido já reduz bem leituras repetitivas
 
 
 GRPC_LAMP_PORT = 50051
@@ -13,4 +30,89 @@ GRPC_AIR_PORT = 50052
 
 
 SENSOR_DELAY = 2
-DEVICES_DELAY = 5
\ No newline at end of file
+DEVICES_DELAY = 5
+# Publicação por exceção dos sensores: variação mínima do valor para publicar (0 = qualquer mudança)
+SENSOR_DEADBANDS = {"temperature": 0.2, "luminosity": 20.0, "presence": 0}
+SENSOR_MAX_SILENCE = 30  # segundos sem publicar até enviar uma leitura de keep-alive
+SENSOR_SILENCE_TIMEOUT = 2 * SENSOR_MAX_SILENCE  # gateway: sensor sem mensagens além disso está silencioso
+ACTUATOR_STATUS_REFRESH = 12  # heartbeats entre reenvios do status completo (recupera gateways reiniciados)
+DEVICE_SILENCE_TIMEOUT = 3 * DEVICES_DELAY  # segundos sem mensagens até o dispositivo contar como silencioso
+
+# Frota de sensores virtuais (source/devices/sensors/fleet.py)
+FLEET_WORKERS = 1  # processos que dividem a frota
+FLEET_BATCH_WINDOW = 0.05  # sensores com leitura prevista nesta janela (s) são gerados juntos
+FLEET_REPORT_INTERVAL = 10  # segundos entre relatórios de vazão
+RULES_SWEEP_DELAY = 60  # Varredura de segurança das regras (avaliação normal é por evento)
+
+# Pool de canais gRPC do gateway
+GRPC_CHANNEL_IDLE_TIMEOUT = 300  # segundos sem uso antes de fechar o canal
+GRPC_KEEPALIVE_TIME_MS = 60000
+GRPC_KEEPALIVE_TIMEOUT_MS = 10000
+# Permite nos servidores dos atuadores os pings de keepalive enviados pelo gateway
+GRPC_SERVER_OPTIONS = [
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.min_time_between_pings_ms', GRPC_KEEPALIVE_TIME_MS),
+    ('grpc.http2.min_ping_interval_without_data_ms', GRPC_KEEPALIVE_TIME_MS),
+]
+
+# Despacho de comandos para atuadores
+COMMAND_WORKERS = 8
+GRPC_COMMAND_TIMEOUT = 5  # prazo (s) de cada chamada gRPC
+COMMAND_WAIT_TIMEOUT = 10  # espera máxima (s) das rotas HTTP pelo resultado
+
+# Proteção dos atuadores contra oscilação dos sensores
+ACTUATOR_MIN_DWELL = {  # tempo mínimo (s) entre mudanças de estado por regra
+    'lamp': 2.0,
+    'door': 3.0,
+    'ac': 30.0,
+    'sprinkler': 5.0,
+}
+ACTUATOR_MAX_RATE = 1.0  # comandos por segundo por atuador
+ACTUATOR_RATE_BURST = 3
+
+# Stream de eventos (SSE) para a interface web
+SSE_HEARTBEAT = 15  # segundos entre comentários de keep-alive
+SSE_MAX_PENDING = 1000  # dispositivos pendentes por cliente antes de desconectá-lo
+
+# Servidor HTTP do gateway
+GATEWAY_MODE = 'dev'  # 'dev' (Flask debug) ou 'prod' (waitress)
+GATEWAY_HOST = '0.0.0.0'
+GATEWAY_PORT = 8080
+GATEWAY_THREADS = 32  # cada cliente SSE conectado ocupa uma thread
+# Threads sempre livres para as demais rotas: acima de (threads - reserva) clientes SSE, /events responde 503
+SSE_RESERVED_THREADS = 8
+GATEWAY_CONNECTION_LIMIT = 1000
+GATEWAY_CHANNEL_TIMEOUT = 120
+GATEWAY_BACKLOG = 1024
+GATEWAY_INGEST_WORKERS = 4  # lanes que processam as mensagens recebidas do broker
+GATEWAY_INGEST_ASYNC = os.environ.get("GATEWAY_INGEST_ASYNC", "0") == "1"  # consumo em event loop asyncio
+# Sharding da ingestão entre instâncias do gateway (exchange x-consistent-hash)
+INGEST_SHARDS = int(os.environ.get("INGEST_SHARDS", "0"))  # filas de shard (0 = filas por tipo, uma instância)
+GATEWAY_INSTANCE = os.environ.get("GATEWAY_INSTANCE", "gateway-0")  # nome desta instância no anel
+GATEWAY_INSTANCES = os.environ.get("GATEWAY_INSTANCES", GATEWAY_INSTANCE).split(",")  # todas as instâncias
+GATEWAY_RING_REPLICAS = 128  # nós virtuais por instância no anel (distribuição mais uniforme)
+# Ingestão e regras em processos separados, que publicam o estado dos dispositivos em memória
+# compartilhada lida pelas rotas HTTP (exige INGEST_SHARDS > 0: os shards são divididos entre eles)
+GATEWAY_WORKERS = int(os.environ.get("GATEWAY_WORKERS", "0"))  # 0 = ingestão e HTTP no mesmo processo
+GATEWAY_WORKER_SLOTS = 4096  # dispositivos por worker na tabela compartilhada (512 bytes cada)
+GATEWAY_TABLE_POLL = 0.2  # segundos entre leituras da tabela para o stream de eventos (SSE)
+GATEWAY_TABLE_READ_RETRIES = 1000  # releituras de um registro em escrita antes de desistir (worker morto)
+GATEWAY_WORKER_RESTART_DELAY = 5  # segundos mínimos entre reinícios de um mesmo worker
+
+# Histórico em memória das leituras dos sensores
+HISTORY_CAPACITY = 1800  # leituras por sensor (8 bytes cada)
+HISTORY_RETENTION = 3600  # segundos
+HISTORY_MAX_POINTS = 500  # acima disso, /history reduz a resolução automaticamente
+
+# Persistência do registro de dispositivos (snapshot + log de mudanças)
+REGISTRY_PERSISTENCE = True
+# Com sharding, cada instância guarda só os seus dispositivos (e cada worker, em um subdiretório)
+REGISTRY_DATA_DIR = CURRENT_DIR / "data" / (GATEWAY_INSTANCE if INGEST_SHARDS else "")
+REGISTRY_LOG_COMPACT_ENTRIES = 10000  # entradas no log antes de compactar
+REGISTRY_LOG_MAX_BYTES = 8 * 1024 * 1024  # tamanho do log antes de compactar
+REGISTRY_FLUSH_INTERVAL = 1.0  # segundos entre fsyncs do log (perda máxima numa queda)
+REGISTRY_MAX_TOMBSTONES = 10000  # remoções lembradas para /listdevice_data?since= (além disso, lista completa)
+
+# Regras sensor -> atuador (recarregadas sem reiniciar quando o arquivo muda)
+RULES_FILE = CURRENT_DIR / "configs" / "rules.json"
+RULES_RELOAD_INTERVAL = 5  # segundos entre verificações do arquivo de regras
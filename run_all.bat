@@ -1,6 +1,6 @@
 @echo off
 echo Iniciando gateway...
-start python gateway.py
+start python gateway.py --mode prod
 
 echo Iniciando sensor_temperature...
 start python sensor_temperature.py
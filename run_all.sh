@@ -1,6 +1,6 @@
 #!/bin/bash
 echo "Iniciando gateway..."
-nohup python3 gateway.py > gateway.log 2>&1 &
+nohup python3 gateway.py --mode prod > gateway.log 2>&1 &
 
 echo "Iniciando sensor_temperature..."
 nohup python3 sensor_temperature.py > sensor_temperature.log 2>&1 &
@@ -0,0 +1,4 @@
+from source.devices.sensors.fleet import main
+
+if __name__ == "__main__":
+    main()
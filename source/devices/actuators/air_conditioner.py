@@ -6,8 +6,8 @@ import argparse
 import threading
 from .proto.actuators_pb2 import Response
 from .proto.actuators_pb2_grpc import ActuatorServiceServicer, add_ActuatorServiceServicer_to_server
-from source.utils.rabbitmq.connection import RabbitMQConnection
-from configs.envs import DEVICES_DELAY, GRPC_AIR_PORT
+from .status import ActuatorStatusPublisher
+from configs.envs import DEVICES_DELAY, GRPC_AIR_PORT, GRPC_SERVER_OPTIONS
 class AirConditionerServer(ActuatorServiceServicer):
     """
     Implementa o serviço gRPC para controle do ar-condicionado.
@@ -24,6 +24,7 @@ class AirConditionerServer(ActuatorServiceServicer):
         self.device_id = device_id
         self.grpc_port = grpc_port
         self.rabbitmq_host = rabbitmq_host
+        self.status_publisher = ActuatorStatusPublisher(rabbitmq_host)
 
         # Estado inicial
         self.active = False
@@ -34,23 +35,10 @@ class AirConditionerServer(ActuatorServiceServicer):
 
     def publish_status(self):
         """
-        Publica o status atual no RabbitMQ.
+        Publica o status atual no RabbitMQ pela conexão persistente
+        (completo se mudou; caso contrário, só um heartbeat).
         """
         try:
-            print(f"[DEVICE] Tentando estabelecer conexão com RabbitMQ em {self.rabbitmq_host}...")
-            connection = RabbitMQConnection(host=self.rabbitmq_host)
-            print("[DEVICE] Conexão estabelecida com sucesso.")
-            channel = connection.channel
-            print("[DEVICE] Canal obtido com sucesso.")
-
-            print("[DEVICE] Declarando exchange 'sensors_exchange' (tipo: topic, durável)...")
-            channel.exchange_declare(
-                exchange='sensors_exchange',
-                exchange_type='topic',
-                durable=True
-            )
-            print("[DEVICE] Exchange declarado com sucesso.")
-
             message = {
                 "id": self.device_id,
                 "type": "actuator",  # Tipo como "actuator"
@@ -62,18 +50,11 @@ class AirConditionerServer(ActuatorServiceServicer):
             }
             routing_key = f"command.air_conditioner.{self.device_id}"
 
-            print(f"[DEVICE] Publicando mensagem:")
-            print(f"         Exchange: 'sensors_exchange'")
-            print(f"         Routing Key: '{routing_key}' (Fila associada: 'queue.ac')")
-            print(f"         Mensagem: {json.dumps(message, indent=2)}")
-            channel.basic_publish(
-                exchange='sensors_exchange',
-                routing_key=routing_key,
-                body=json.dumps(message)
-            )
-            print("[DEVICE] Mensagem enviada. Fechando conexão com RabbitMQ...")
-            connection.close()
-            print("[DEVICE SUCCESS] Status publicado e conexão fechada.\n")
+            if self.status_publisher.publish_status(message, routing_key):
+                print(f"[DEVICE] Status publicado:")
+                print(f"         Exchange: 'sensors_exchange'")
+                print(f"         Routing Key: '{routing_key}' (Fila associada: 'queue.ac')")
+                print(f"         Mensagem: {json.dumps(message, indent=2)}\n")
         except Exception as e:
             print(f"[DEVICE ERROR] Erro ao publicar status: {e}\n")
 
@@ -113,7 +94,7 @@ class AirConditionerServer(ActuatorServiceServicer):
         print("[DEVICE INFO] Thread de publicação periódica iniciada.")
 
         print("[DEVICE INFO] Criando servidor gRPC...")
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10), options=GRPC_SERVER_OPTIONS)
         add_ActuatorServiceServicer_to_server(self, server)
         server.add_insecure_port(f'[::]:{self.grpc_port}')
         server.start()
@@ -125,6 +106,7 @@ class AirConditionerServer(ActuatorServiceServicer):
         except KeyboardInterrupt:
             print("[DEVICE INFO] Interrupção detectada. Encerrando servidor gRPC...")
             server.stop(0)
+            self.status_publisher.close()
             print("[DEVICE INFO] Servidor gRPC encerrado.\n")
 
     @classmethod
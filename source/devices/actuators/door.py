@@ -6,8 +6,8 @@ import argparse
 import threading
 from .proto.actuators_pb2 import Response
 from .proto.actuators_pb2_grpc import ActuatorServiceServicer, add_ActuatorServiceServicer_to_server
-from source.utils.rabbitmq.connection import RabbitMQConnection
-from configs.envs import DEVICES_DELAY, GRPC_DOOR_PORT
+from .status import ActuatorStatusPublisher
+from configs.envs import DEVICES_DELAY, GRPC_DOOR_PORT, GRPC_SERVER_OPTIONS
 
 class DoorActuatorServer(ActuatorServiceServicer):
     """
@@ -24,32 +24,21 @@ class DoorActuatorServer(ActuatorServiceServicer):
         self.device_id = device_id
         self.grpc_port = grpc_port
         self.rabbitmq_host = rabbitmq_host
+        self.status_publisher = ActuatorStatusPublisher(rabbitmq_host)
         self.open = False  # Porta inicia fechada
         print(f"[DEVICE INFO] Porta '{self.device_id}' inicializada com state='closed'.")
         self.publish_status()
 
     def publish_status(self):
         try:
-            connection = RabbitMQConnection(host=self.rabbitmq_host)
-            channel = connection.channel
-            channel.exchange_declare(
-                exchange='sensors_exchange',
-                exchange_type='topic',
-                durable=True
-            )
             message = {
                 "id": self.device_id,
                 "type": "door",
                 "state": "open" if self.open else "closed"
             }
             routing_key = f"command.door.{self.device_id}"
-            channel.basic_publish(
-                exchange='sensors_exchange',
-                routing_key=routing_key,
-                body=json.dumps(message)
-            )
-            connection.close()
-            print(f"[DEVICE SUCCESS] Status da porta '{self.device_id}' publicado: {message}")
+            if self.status_publisher.publish_status(message, routing_key):
+                print(f"[DEVICE SUCCESS] Status da porta '{self.device_id}' publicado: {message}")
         except Exception as e:
             print(f"[DEVICE ERROR] Erro ao publicar status da porta '{self.device_id}': {e}")
 
@@ -77,7 +66,7 @@ class DoorActuatorServer(ActuatorServiceServicer):
         print("[DEVICE INFO] Thread de publicação iniciada para porta.")
 
         print("[DEVICE INFO] Criando servidor gRPC para porta...")
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10), options=GRPC_SERVER_OPTIONS)
         add_ActuatorServiceServicer_to_server(self, server)
         server.add_insecure_port(f'[::]:{self.grpc_port}')
         server.start()
@@ -87,6 +76,7 @@ class DoorActuatorServer(ActuatorServiceServicer):
             server.wait_for_termination()
         except KeyboardInterrupt:
             server.stop(0)
+            self.status_publisher.close()
             print("[DEVICE INFO] Servidor gRPC da porta encerrado.")
 
     @classmethod
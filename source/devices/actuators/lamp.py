@@ -6,8 +6,8 @@ import argparse
 import threading
 from .proto.actuators_pb2 import Response
 from .proto.actuators_pb2_grpc import ActuatorServiceServicer, add_ActuatorServiceServicer_to_server
-from source.utils.rabbitmq.connection import RabbitMQConnection
-from configs.envs import RABBITMQ_HOST, GRPC_LAMP_PORT, DEVICES_DELAY
+from .status import ActuatorStatusPublisher
+from configs.envs import RABBITMQ_HOST, GRPC_LAMP_PORT, DEVICES_DELAY, GRPC_SERVER_OPTIONS
 
 from configs.envs import DEVICES_DELAY
 
@@ -26,6 +26,7 @@ class LightBulbServer(ActuatorServiceServicer):
         self.device_id = device_id
         self.grpc_port = grpc_port
         self.rabbitmq_host = rabbitmq_host
+        self.status_publisher = ActuatorStatusPublisher(rabbitmq_host)
 
         # Estado inicial da lâmpada
         self.active = False
@@ -35,18 +36,10 @@ class LightBulbServer(ActuatorServiceServicer):
 
     def publish_status(self):
         """
-        Publica o status atual da lâmpada no RabbitMQ utilizando a conexão robusta.
+        Publica o status atual da lâmpada no RabbitMQ pela conexão persistente
+        (completo se mudou; caso contrário, só um heartbeat).
         """
         try:
-            print(f"[INFO] Conectando ao RabbitMQ em {self.rabbitmq_host}...")
-            connection = RabbitMQConnection(host=self.rabbitmq_host)
-            channel = connection.channel
-
-            # Declara o exchange 'sensors_exchange'
-            channel.exchange_declare(
-                exchange='sensors_exchange', exchange_type='topic', durable=True
-            )
-
             message = {
                 'id': self.device_id,
                 'type': 'actuator',
@@ -54,27 +47,18 @@ class LightBulbServer(ActuatorServiceServicer):
                 'state': 'on' if self.active else 'off',
                 'grpc_host': 'localhost',
                 'grpc_port': self.grpc_port,
-                'temperature': None,         # Placeholder
                 'luminosity': self.luminosity if self.active else 0,
-                'related_device': None       # Placeholder
             }
             routing_key = f"command.lamp.{self.device_id}"
 
             # Supondo que o gateway esteja inscrito em filas que recebam mensagens
             # com routing key "command.lamp.*", a mensagem será encaminhada para a
             # fila associada, por exemplo, "queue.lamp".
-            print(f"[INFO] Publicando mensagem no RabbitMQ:")
-            print(f"       Exchange: 'sensors_exchange'")
-            print(f"       Routing Key: '{routing_key}' (Fila associada: 'queue.lamp')")
-            print(f"       Mensagem: {json.dumps(message, indent=2)}")
-
-            channel.basic_publish(
-                exchange='sensors_exchange',
-                routing_key=routing_key,
-                body=json.dumps(message)
-            )
-            connection.close()
-            print(f"[SUCCESS] Status publicado com sucesso no RabbitMQ.\n")
+            if self.status_publisher.publish_status(message, routing_key):
+                print(f"[INFO] Status publicado no RabbitMQ:")
+                print(f"       Exchange: 'sensors_exchange'")
+                print(f"       Routing Key: '{routing_key}' (Fila associada: 'queue.lamp')")
+                print(f"       Mensagem: {json.dumps(message, indent=2)}\n")
         except Exception as e:
             print(f"[ERROR] Falha ao publicar no RabbitMQ: {str(e)}\n")
 
@@ -117,7 +101,7 @@ class LightBulbServer(ActuatorServiceServicer):
         periodic_thread.start()
 
         # Cria e configura o servidor gRPC
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10), options=GRPC_SERVER_OPTIONS)
         add_ActuatorServiceServicer_to_server(self, server)
         server.add_insecure_port(f'[::]:{self.grpc_port}')
         server.start()
@@ -128,6 +112,7 @@ class LightBulbServer(ActuatorServiceServicer):
                 time.sleep(86400)
         except KeyboardInterrupt:
             server.stop(0)
+            self.status_publisher.close()
             print("[INFO] Servidor gRPC encerrado.\n")
 
     @classmethod
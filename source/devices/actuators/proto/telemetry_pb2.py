@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: telemetry.proto
+# Protobuf Python Version: 5.29.0
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    5,
+    29,
+    0,
+    '',
+    'telemetry.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0ftelemetry.proto\x12\ttelemetry\"\xc1\x03\n\tTelemetry\x12\x0f\n\x02id\x18\x01 \x01(\tH\x00\x88\x01\x01\x12\x11\n\x04type\x18\x02 \x01(\tH\x01\x88\x01\x01\x12\x14\n\x07subtype\x18\x03 \x01(\tH\x02\x88\x01\x01\x12\x12\n\x05state\x18\x04 \x01(\tH\x03\x88\x01\x01\x12\x11\n\x04name\x18\x05 \x01(\tH\x04\x88\x01\x01\x12\x16\n\ttimestamp\x18\x06 \x01(\tH\x05\x88\x01\x01\x12\x1b\n\x0erelated_device\x18\x07 \x01(\tH\x06\x88\x01\x01\x12\x18\n\x0btemperature\x18\x08 \x01(\x01H\x07\x88\x01\x01\x12\x17\n\nluminosity\x18\t \x01(\x01H\x08\x88\x01\x01\x12\x16\n\tgrpc_host\x18\n \x01(\tH\t\x88\x01\x01\x12\x16\n\tgrpc_port\x18\x0b \x01(\x05H\n\x88\x01\x01\x12\x10\n\x03seq\x18\x0c \x01(\x04H\x0b\x88\x01\x01\x12\x0f\n\x02hb\x18\r \x01(\x04H\x0c\x88\x01\x01\x42\x05\n\x03_idB\x07\n\x05_typeB\n\n\x08_subtypeB\x08\n\x06_stateB\x07\n\x05_nameB\x0c\n\n_timestampB\x11\n\x0f_related_deviceB\x0e\n\x0c_temperatureB\r\n\x0b_luminosityB\x0c\n\n_grpc_hostB\x0c\n\n_grpc_portB\x06\n\x04_seqB\x05\n\x03_hb\"8\n\x0eTelemetryBatch\x12&\n\x08readings\x18\x01 \x03(\x0b\x32\x14.telemetry.Telemetryb\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'telemetry_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_TELEMETRY']._serialized_start=31
+  _globals['_TELEMETRY']._serialized_end=480
+  _globals['_TELEMETRYBATCH']._serialized_start=482
+  _globals['_TELEMETRYBATCH']._serialized_end=538
+# @@protoc_insertion_point(module_scope)
@@ -6,8 +6,8 @@ import argparse
 import threading
 from .proto.actuators_pb2 import Response
 from .proto.actuators_pb2_grpc import ActuatorServiceServicer, add_ActuatorServiceServicer_to_server
-from source.utils.rabbitmq.connection import RabbitMQConnection
-from configs.envs import RABBITMQ_HOST, GRPC_SPLINKER_PORT
+from .status import ActuatorStatusPublisher
+from configs.envs import RABBITMQ_HOST, GRPC_SPLINKER_PORT, GRPC_SERVER_OPTIONS
 
 class SprinklerServer(ActuatorServiceServicer):
     """
@@ -19,24 +19,17 @@ class SprinklerServer(ActuatorServiceServicer):
         self.device_id = device_id
         self.grpc_port = grpc_port
         self.rabbitmq_host = rabbitmq_host
+        self.status_publisher = ActuatorStatusPublisher(rabbitmq_host)
         self.active = False
         print(f"[INFO] Sprinkler '{self.device_id}' inicializado.")
         self.publish_status()  # Publica o status inicial
 
     def publish_status(self):
         """
-        Publica o status atual do sprinkler no RabbitMQ utilizando a conexão robusta.
+        Publica o status atual do sprinkler no RabbitMQ pela conexão persistente
+        (completo se mudou; caso contrário, só um heartbeat).
         """
         try:
-            print(f"[INFO] Conectando ao RabbitMQ em {self.rabbitmq_host}...")
-            connection = RabbitMQConnection(host=self.rabbitmq_host)
-            channel = connection.channel
-
-            # Declara o exchange 'sensors_exchange'
-            channel.exchange_declare(
-                exchange='sensors_exchange', exchange_type='topic', durable=True
-            )
-
             message = {
                 'id': self.device_id,
                 'type': 'actuator',
@@ -44,27 +37,17 @@ class SprinklerServer(ActuatorServiceServicer):
                 'state': 'on' if self.active else 'off',
                 'grpc_host': 'localhost',
                 'grpc_port': self.grpc_port,
-                'temperature': None,
-                'luminosity': None,
-                'related_device': None
             }
             routing_key = f"command.sprinkler.{self.device_id}"
 
             # Supondo que o gateway esteja inscrito em filas que recebam
             # mensagens com routing key "command.sprinkler.*",
             # a mensagem será encaminhada para a fila "queue.sprinkler.{device_id}".
-            print(f"[INFO] Publicando mensagem no RabbitMQ:")
-            print(f"       Exchange: 'sensors_exchange'")
-            print(f"       Routing Key: '{routing_key}' (Fila associada: 'queue.sprinkler')")
-            print(f"       Mensagem: {json.dumps(message, indent=2)}")
-
-            channel.basic_publish(
-                exchange='sensors_exchange',
-                routing_key=routing_key,
-                body=json.dumps(message)
-            )
-            connection.close()
-            print(f"[SUCCESS] Status publicado com sucesso no RabbitMQ.\n")
+            if self.status_publisher.publish_status(message, routing_key):
+                print(f"[INFO] Status publicado no RabbitMQ:")
+                print(f"       Exchange: 'sensors_exchange'")
+                print(f"       Routing Key: '{routing_key}' (Fila associada: 'queue.sprinkler')")
+                print(f"       Mensagem: {json.dumps(message, indent=2)}\n")
         except Exception as e:
             print(f"[ERROR] Falha ao publicar no RabbitMQ: {str(e)}\n")
 
@@ -97,7 +80,7 @@ class SprinklerServer(ActuatorServiceServicer):
         periodic_thread.start()
 
         # Cria e configura o servidor gRPC
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10), options=GRPC_SERVER_OPTIONS)
         add_ActuatorServiceServicer_to_server(self, server)
         server.add_insecure_port(f'[::]:{self.grpc_port}')
         server.start()
@@ -108,6 +91,7 @@ class SprinklerServer(ActuatorServiceServicer):
                 time.sleep(86400)
         except KeyboardInterrupt:
             server.stop(0)
+            self.status_publisher.close()
             print("[INFO] Servidor gRPC encerrado.\n")
 
     @classmethod
@@ -0,0 +1,95 @@
+import threading
+
+from pika.exceptions import AMQPError
+
+from configs.envs import ACTUATOR_STATUS_REFRESH, RABBITMQ_HOST, TELEMETRY_CODEC
+from source.utils.rabbitmq.codec import codec_by_name
+from source.utils.rabbitmq.connection import RabbitMQConnection
+from source.utils.rabbitmq.publisher import RabbitMQPublisher
+
+
+class ActuatorStatusPublisher:
+    """
+    Publica o status de um atuador em 'sensors_exchange' por uma conexão
+    persistente com o RabbitMQ.
+
+    A conexão é aberta na primeira publicação e a exchange é declarada uma
+    única vez (de novo apenas ao reconectar). A publicação periódica e as
+    respostas aos comandos gRPC rodam em threads diferentes: um lock
+    serializa o uso da conexão, que não é thread-safe.
+
+    publish_status() envia o status completo apenas quando ele muda, com um
+    número de sequência ('seq'); enquanto nada muda, envia só um heartbeat
+    {"id": ..., "hb": seq}. A cada 'refresh' heartbeats o status completo é
+    reenviado, para que um gateway reiniciado volte a conhecer o atuador.
+
+    Cada mensagem leva o id do atuador na routing key e no header shard_key
+    (ver setup_shards): com o gateway em shards, o atuador e os sensores
+    ligados a ele caem na mesma instância.
+    """
+
+    def __init__(self, rabbitmq_host=RABBITMQ_HOST, exchange_name='sensors_exchange',
+                 refresh=ACTUATOR_STATUS_REFRESH):
+        self._host = rabbitmq_host
+        self._exchange_name = exchange_name
+        self._refresh = refresh
+        self._connection = None
+        self._publisher = None
+        self._lock = threading.Lock()
+        self._last_status = None
+        self._seq = 0
+        self._heartbeats = 0  # heartbeats desde o último status completo
+
+    def _ensure_publisher(self):
+        if self._publisher is None:
+            self._connection = RabbitMQConnection(host=self._host)
+            self._publisher = RabbitMQPublisher(
+                connection=self._connection,
+                exchange_name=self._exchange_name,
+                verbose=False,
+                codec=codec_by_name(TELEMETRY_CODEC)
+            )
+        return self._publisher
+
+    def publish(self, message, routing_key):
+        """Publica 'message'; se a conexão caiu, reconecta e tenta mais uma vez."""
+        with self._lock:
+            self._publish_locked(message, routing_key)
+
+    def _publish_locked(self, message, routing_key):
+        publisher = self._ensure_publisher()
+        # O atuador é a shard_key dele mesmo e dos sensores ligados a ele
+        shard_key = message.get('id')
+        try:
+            publisher.publish_message(message, routing_key=routing_key, shard_key=shard_key)
+        except AMQPError as e:
+            print(f"[RabbitMQ] Erro ao publicar status: {e}. Tentando reconectar...")
+            publisher.reconnect()
+            publisher.publish_message(message, routing_key=routing_key, shard_key=shard_key)
+
+    def publish_status(self, status, routing_key):
+        """
+        Publica o status completo se ele mudou (ou se o reenvio periódico venceu);
+        caso contrário, apenas um heartbeat.
+        :return: True se o status completo foi publicado.
+        """
+        with self._lock:
+            changed = status != self._last_status
+            if changed:
+                self._seq += 1
+            if changed or self._heartbeats >= self._refresh:
+                self._publish_locked(dict(status, seq=self._seq), routing_key)
+                # Só memoriza após publicar: uma falha faz a próxima chamada reenviar
+                self._last_status = dict(status)
+                self._heartbeats = 0
+                return True
+            self._publish_locked({'id': status['id'], 'hb': self._seq}, routing_key)
+            self._heartbeats += 1
+            return False
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+            self._connection = None
+            self._publisher = None
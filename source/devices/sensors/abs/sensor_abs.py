@@ -1,9 +1,13 @@
 from threading import Thread, Event
 import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
 import json
-from configs.envs import SENSOR_DELAY
+from configs.envs import (INGEST_SHARDS, SENSOR_BATCH, SENSOR_DEADBANDS, SENSOR_DELAY, SENSOR_MAX_SILENCE,
+                          TELEMETRY_CODEC)
+from source.utils.rabbitmq.batcher import BatchingPublisher
+from source.utils.rabbitmq.codec import codec_by_name
+from source.utils.rabbitmq.setup import setup_shards
 from source.utils.rabbitmq.connection import RabbitMQConnection
 from source.utils.rabbitmq.publisher import RabbitMQPublisher
 from source.utils.rabbitmq.consumer import RabbitMQConsumer
@@ -12,9 +16,33 @@ from time import strftime, localtime
 
 
 class SensorABS(ABC):
-    """Abstract class representing smart sensors communicating via RabbitMQ."""
-
-    def __init__(self, device_id: str, device_name: str, related_device: str, device_type: str, connection: RabbitMQConnection):
+    """
+    Abstract class representing smart sensors communicating via RabbitMQ.
+
+    Readings are reported by exception: report() publishes only when the
+    value moved past the sensor type's deadband (SENSOR_DEADBANDS), the
+    state changed, or SENSOR_MAX_SILENCE seconds passed since the last
+    published reading (keep-alive). The gateway keeps the last value, so
+    silence means "unchanged".
+
+    Readings are published with the device id in the routing key
+    (sensor.<type>.<id>) and a shard_key header; see shard_key.
+
+    With a BatchingPublisher (SENSOR_BATCH=1), reported readings are
+    buffered and sent as one AMQP message per batch; flush_pending() must
+    be called periodically so the last readings are not held back.
+    """
+
+    # Reading field compared against the deadband (None: every reading is reported)
+    value_field: Optional[str] = None
+
+    def __init__(self, device_id: str, device_name: str, related_device: str, device_type: str,
+                 connection: RabbitMQConnection,
+                 publisher: Optional[Union[RabbitMQPublisher, BatchingPublisher]] = None):
+        """
+        :param publisher: optional publisher shared by several sensors of the same
+                          type (e.g. a sensor fleet); one is created if omitted.
+        """
         self._id = device_id
         self._name = device_name
         self._type = device_type
@@ -22,17 +50,49 @@ class SensorABS(ABC):
         self._is_on = True
         self._shutdown_event = Event()  
         self.related_device = related_device
-        self._publisher = RabbitMQPublisher(
+        self._connection = connection
+        self._publisher = publisher or self.create_publisher(connection, device_type)
+        self._consumer = None  # created on first use: a fleet of sensors must not declare one queue each
+        self.deadband = SENSOR_DEADBANDS.get(device_type, 0)
+        self.max_silence = SENSOR_MAX_SILENCE
+        self._last_reported = None
+        self._last_reported_at = 0.0
+
+    @staticmethod
+    def create_publisher(connection: RabbitMQConnection, device_type: str, verbose: bool = True,
+                         batch: bool = SENSOR_BATCH) -> Union[RabbitMQPublisher, BatchingPublisher]:
+        """
+        Publisher for the readings of one sensor type (micro-batched if 'batch').
+        The queue the gateway consumes (the type queue, or every shard queue
+        with INGEST_SHARDS) is declared here too, so readings published before
+        the gateway starts are kept. Removing the bindings of the unsharded
+        layout is left to the gateway (see unbind_ingest_queues).
+        """
+        publisher = RabbitMQPublisher(
             connection=connection,
             exchange_name="sensors_exchange",
-            queue_name=f"queue.{self._type}",
-            routing_key=f"sensor.{self._type}"
-        )
-        self._consumer = RabbitMQConsumer(
-            connection=connection,
-            exchange_name="commands_exchange",
-            queues={f"queue.{self._id}": f"command.{self._id}"}
+            routing_key=f"sensor.{device_type}",
+            verbose=verbose,
+            codec=codec_by_name(TELEMETRY_CODEC)
         )
+        channel = connection.channel
+        if INGEST_SHARDS:
+            setup_shards(channel)
+        else:
+            channel.queue_declare(queue=f"queue.{device_type}", durable=True)
+            channel.queue_bind(exchange="sensors_exchange", queue=f"queue.{device_type}",
+                               routing_key=f"sensor.{device_type}.#")
+        return BatchingPublisher(publisher) if batch else publisher
+
+    @property
+    def consumer(self) -> RabbitMQConsumer:
+        if self._consumer is None:
+            self._consumer = RabbitMQConsumer(
+                connection=self._connection,
+                exchange_name="commands_exchange",
+                queues={f"queue.{self._id}": f"command.{self._id}"}
+            )
+        return self._consumer
 
     @property
     def id(self) -> str:
@@ -50,15 +110,69 @@ class SensorABS(ABC):
     def is_on(self) -> bool:
         return self._is_on
 
+    @property
+    def routing_key(self) -> str:
+        return f"sensor.{self._type}.{self._id}"
+
+    @property
+    def shard_key(self) -> str:
+        """
+        Key hashed by the gateway's shard exchange: the related actuator, so
+        the sensor, its actuator and the rule between them are handled by the
+        same gateway instance.
+        """
+        return self.related_device or self._id
+
     def publish_data(self, data: Dict[str, Any]):
         """Publish sensor data with reconnection handling."""
         try:
             if self._is_on:
-                self._publisher.publish_message(data)
+                self._publisher.publish_message(data, routing_key=self.routing_key, shard_key=self.shard_key)
         except (StreamLostError, AMQPConnectionError) as e:
             print(f"[RabbitMQ] Erro ao publicar: {e}. Tentando reconectar...")
             self._publisher.reconnect()  # Implementar reconexão segura no publisher
-            self._publisher.publish_message(data)
+            if isinstance(self._publisher, BatchingPublisher):
+                self._publisher.flush()  # the reading is already in the batch
+            else:
+                self._publisher.publish_message(data, routing_key=self.routing_key, shard_key=self.shard_key)
+
+    def flush_pending(self, force: bool = False):
+        """Publishes the buffered readings that are due (all of them if 'force') when batching."""
+        if isinstance(self._publisher, BatchingPublisher):
+            if force:
+                self._publisher.flush()
+            else:
+                self._publisher.flush_due()
+
+    def should_report(self, data: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """True if 'data' differs enough from the last reported reading (or the keep-alive is due)."""
+        previous = self._last_reported
+        now = time.monotonic() if now is None else now
+        if previous is None or now - self._last_reported_at >= self.max_silence:
+            return True
+        if data.get("state") != previous.get("state"):
+            return True
+        field = self.value_field
+        if field is None:
+            return True
+        value, last = data.get(field), previous.get(field)
+        if not isinstance(value, (int, float)) or not isinstance(last, (int, float)):
+            return value != last
+        return abs(value - last) > self.deadband
+
+    def mark_reported(self, data: Dict[str, Any], now: Optional[float] = None):
+        """Records 'data' as the last reading published (the deadband reference)."""
+        self._last_reported = data
+        self._last_reported_at = time.monotonic() if now is None else now
+
+    def report(self, data: Dict[str, Any]) -> bool:
+        """Publishes 'data' only if should_report(); returns whether it was published."""
+        now = time.monotonic()
+        if not self._is_on or not self.should_report(data, now):
+            return False
+        self.publish_data(data)
+        self.mark_reported(data, now)
+        return True
 
     def listen_for_shutdown(self):
         """Listens for on/off commands with reconnection logic."""
@@ -76,17 +190,23 @@ class SensorABS(ABC):
                 self._is_on = True
 
         try:
-            self._consumer.start(callback_function=command_callback)
+            self.consumer.start(callback_function=command_callback)
         except (StreamLostError, AMQPConnectionError) as e:
             print(f"[RabbitMQ] Erro ao consumir: {e}. Tentando reconectar...")
-            self._consumer.reconnect()
-            self._consumer.start(callback_function=command_callback)
+            self.consumer.reconnect()
+            self.consumer.start(callback_function=command_callback)
 
     @abstractmethod
-    def generate_data(self) -> Dict[str, Any]:
-        """Generate sensor-specific data."""
+    def generate_data(self, timestamp: Optional[str] = None) -> Dict[str, Any]:
+        """Generate sensor-specific data (stamped with 'timestamp' if given)."""
         pass
 
+    @classmethod
+    def generate_batch(cls, sensors: List["SensorABS"]) -> List[Dict[str, Any]]:
+        """Generate one reading per sensor, sharing a single timestamp."""
+        timestamp = strftime("%Y-%m-%d %H:%M:%S", localtime())
+        return [sensor.generate_data(timestamp) for sensor in sensors]
+
     def start(self):
         """Starts sensor threads and handles graceful shutdown."""
         print(f"Starting sensor {self._name} ({self._type})...")
@@ -105,12 +225,17 @@ class SensorABS(ABC):
         while not self._shutdown_event.is_set() and self._is_on:
             try:
                 data = self.generate_data()
-                self.publish_data(data)
-                print(f"[Publish] {self._name} published data: {data}")
+                if self.report(data):
+                    print(f"[Publish] {self._name} published data: {data}")
+                self.flush_pending()
                 time.sleep(SENSOR_DELAY)
             except Exception as e:
                 print(f"[Sensor] Erro durante publicação periódica: {e}")
                 time.sleep(5)  # Aguarda antes de tentar novamente
+        try:
+            self.flush_pending(force=True)
+        except Exception as e:
+            print(f"[Sensor] Erro ao publicar o último lote: {e}")
 
     def __str__(self):
         state_str = "ON" if self.is_on else "OFF"
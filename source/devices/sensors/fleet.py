@@ -0,0 +1,377 @@
+import argparse
+import asyncio
+import heapq
+import multiprocessing
+import time
+from collections import defaultdict
+from itertools import count
+from threading import Event
+from typing import Dict, List, Optional, Tuple
+
+from configs.envs import (FLEET_BATCH_WINDOW, FLEET_REPORT_INTERVAL, FLEET_WORKERS, INGEST_SHARDS, SENSOR_BATCH,
+                          SENSOR_DELAY, TELEMETRY_CODEC)
+from source.utils.rabbitmq.batcher import BatchingPublisher
+from source.utils.rabbitmq.codec import codec_by_name
+from source.utils.rabbitmq.aio import AsyncRabbitMQConnection, AsyncRabbitMQPublisher
+from source.utils.rabbitmq.connection import RabbitMQConnection
+from source.devices.sensors.abs.sensor_abs import SensorABS
+from source.devices.sensors.luminosity import LuminositySensor
+from source.devices.sensors.presence import PresenceSensor
+from source.devices.sensors.temperature import TemperatureSensor
+
+SENSOR_TYPES = {
+    "temperature": TemperatureSensor,
+    "luminosity": LuminositySensor,
+    "presence": PresenceSensor,
+}
+
+# Actuator each sensor type drives by default (same as the standalone sensor scripts)
+DEFAULT_RELATED = {
+    "temperature": "air_conditioner",
+    "luminosity": "lamp",
+    "presence": "door_actuator",
+}
+
+# (sensor_type, device_id, device_name, related_device)
+SensorSpec = Tuple[str, str, str, str]
+
+
+class SensorFleet:
+    """
+    Hosts many virtual sensors in a single process.
+
+    All sensors share one connection and one publisher per sensor type. A
+    single heap-based scheduler replaces the publishing thread of each sensor:
+    every tick it pops the sensors that are due (within 'batch_window'),
+    generates their readings in one batch per type and reports them (only
+    readings past the deadband, or keep-alives, are published).
+
+    With 'batch', each type's publisher is a BatchingPublisher: the readings
+    of many sensors go out as one AMQP message, and the scheduler also wakes
+    up when a partial batch reaches its maximum delay.
+
+    pika connections are not thread-safe: run() must be called from the
+    thread that owns the connection.
+    """
+
+    def __init__(self, connection: RabbitMQConnection, interval: float = SENSOR_DELAY,
+                 batch_window: float = FLEET_BATCH_WINDOW, report_interval: float = FLEET_REPORT_INTERVAL,
+                 batch: bool = SENSOR_BATCH):
+        self._connection = connection
+        self._batch = batch
+        self._interval = interval
+        self._batch_window = batch_window
+        self._report_interval = report_interval
+        self._publishers = {}  # sensor_type -> shared RabbitMQPublisher
+        self._sensors: List[SensorABS] = []
+        self._schedule = []  # heap of (due, seq, sensor)
+        self._seq = count()
+        self._stop_event = Event()
+        self.published = 0
+        self.suppressed = 0  # readings inside the deadband, not published
+        self.late = 0
+
+    def add(self, sensor_type: str, device_id: str, device_name: str, related_device: str) -> SensorABS:
+        """Creates a sensor of the given type; its first reading is spread over one interval."""
+        publisher = self._publishers.get(sensor_type)
+        if publisher is None:
+            publisher = self._publishers[sensor_type] = SensorABS.create_publisher(
+                self._connection, sensor_type, verbose=False, batch=self._batch)
+        sensor = SENSOR_TYPES[sensor_type](device_id, device_name, related_device, self._connection, publisher)
+        self._sensors.append(sensor)
+        return sensor
+
+    def _schedule_all(self):
+        # Staggers the first readings so the fleet does not publish in bursts
+        now = time.monotonic()
+        step = self._interval / max(1, len(self._sensors))
+        self._schedule = [(now + index * step, next(self._seq), sensor)
+                          for index, sensor in enumerate(self._sensors)]
+        heapq.heapify(self._schedule)
+
+    def _publish_due(self, now: float):
+        """Publishes every sensor due up to now + batch_window and reschedules it."""
+        limit = now + self._batch_window
+        due = []
+        while self._schedule and self._schedule[0][0] <= limit:
+            due.append(heapq.heappop(self._schedule))
+
+        by_type = defaultdict(list)
+        for _, _, sensor in due:
+            if sensor.is_on:
+                by_type[type(sensor)].append(sensor)
+        for sensor_class, sensors in by_type.items():
+            published = sum(sensor.report(data) for sensor, data in zip(sensors, sensor_class.generate_batch(sensors)))
+            self.published += published
+            self.suppressed += len(sensors) - published
+
+        for at, _, sensor in due:
+            next_at = at + self._interval
+            if next_at < now:
+                # Behind schedule: skip the missed readings instead of bursting
+                self.late += 1
+                next_at = now + self._interval
+            heapq.heappush(self._schedule, (next_at, next(self._seq), sensor))
+
+    def _batchers(self) -> List[BatchingPublisher]:
+        return [publisher for publisher in self._publishers.values() if isinstance(publisher, BatchingPublisher)]
+
+    def _next_wake(self) -> Optional[float]:
+        """Next reading due or partial batch reaching its maximum delay."""
+        times = [batcher.next_due() for batcher in self._batchers()]
+        if self._schedule:
+            times.append(self._schedule[0][0])
+        times = [at for at in times if at is not None]
+        return min(times) if times else None
+
+    def flush(self):
+        """Publishes every buffered reading (batching publishers only)."""
+        for batcher in self._batchers():
+            batcher.flush()
+
+    def run(self, duration: Optional[float] = None):
+        """Runs the scheduler until stop() (or for 'duration' seconds)."""
+        print(f"[Fleet] Starting {len(self._sensors)} sensors "
+              f"({', '.join(f'{t}: {n}' for t, n in self.counts().items())})...")
+        self._schedule_all()
+        started = last_report = time.monotonic()
+        reported = 0
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            if duration is not None and now - started >= duration:
+                break
+            if now - last_report >= self._report_interval:
+                rate = (self.published - reported) / (now - last_report)
+                print(f"[Fleet] {self.published} readings published ({rate:.0f}/s, "
+                      f"{self.suppressed} inside deadband, {self.late} late).")
+                last_report, reported = now, self.published
+            try:
+                for batcher in self._batchers():
+                    batcher.flush_due(now)
+                wake = self._next_wake()
+                if wake is None:
+                    self._connection.sleep(self._interval)
+                    continue
+                wait = wake - now
+                if wait > 0:
+                    # Waits through the connection so heartbeats keep being processed
+                    self._connection.sleep(min(wait, 1.0))
+                    continue
+                if self._schedule and self._schedule[0][0] <= now:
+                    self._publish_due(now)
+            except Exception as e:
+                print(f"[Fleet] Erro durante publicação: {e}")
+                self._connection.sleep(5)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[Fleet] Erro ao publicar os últimos lotes: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def counts(self) -> Dict[str, int]:
+        totals = defaultdict(int)
+        for sensor in self._sensors:
+            totals[sensor.type] += 1
+        return dict(totals)
+
+    def __len__(self):
+        return len(self._sensors)
+
+
+class AsyncSensorFleet:
+    """
+    Hosts many virtual sensors on one asyncio event loop.
+
+    Each sensor is an independent task (a logical stream with its own
+    period) instead of an entry in a shared schedule; all of them share one
+    asyncio connection and one publisher per sensor type.
+    """
+
+    def __init__(self, connection: AsyncRabbitMQConnection, interval: float = SENSOR_DELAY,
+                 report_interval: float = FLEET_REPORT_INTERVAL):
+        self._connection = connection
+        self._interval = interval
+        self._report_interval = report_interval
+        self._publishers: Dict[str, AsyncRabbitMQPublisher] = {}
+        self._sensors: List[Tuple[SensorABS, AsyncRabbitMQPublisher]] = []
+        self.published = 0
+        self.suppressed = 0
+        self.late = 0
+
+    async def add(self, sensor_type: str, device_id: str, device_name: str, related_device: str) -> SensorABS:
+        publisher = self._publishers.get(sensor_type)
+        if publisher is None:
+            # Declares and binds the type queue the gateway consumes (readings carry
+            # their own routing key); with INGEST_SHARDS the gateway declares the shards
+            publisher = self._publishers[sensor_type] = await AsyncRabbitMQPublisher(
+                connection=self._connection,
+                exchange_name="sensors_exchange",
+                queue_name=None if INGEST_SHARDS else f"queue.{sensor_type}",
+                routing_key=f"sensor.{sensor_type}.#",
+                verbose=False,
+                codec=codec_by_name(TELEMETRY_CODEC),
+            ).open()
+        # The sensor only generates readings here; publishing goes through the async publisher
+        sensor = SENSOR_TYPES[sensor_type](device_id, device_name, related_device, None, publisher)
+        self._sensors.append((sensor, publisher))
+        return sensor
+
+    async def _stream(self, sensor: SensorABS, publisher: AsyncRabbitMQPublisher, offset: float):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(offset)
+        next_at = loop.time()
+        while True:
+            try:
+                if sensor.is_on:
+                    data = sensor.generate_data()
+                    now = loop.time()
+                    if sensor.should_report(data, now):
+                        await publisher.publish_message(data, routing_key=sensor.routing_key,
+                                                        shard_key=sensor.shard_key)
+                        sensor.mark_reported(data, now)
+                        self.published += 1
+                    else:
+                        self.suppressed += 1
+            except Exception as e:
+                print(f"[Fleet] Erro durante publicação: {e}")
+                await asyncio.sleep(5)
+            next_at += self._interval
+            delay = next_at - loop.time()
+            if delay < 0:
+                # Behind schedule: skip the missed readings instead of bursting
+                self.late += 1
+                next_at, delay = loop.time(), 0
+            await asyncio.sleep(delay)
+
+    async def _report(self):
+        reported = 0
+        while True:
+            await asyncio.sleep(self._report_interval)
+            rate = (self.published - reported) / self._report_interval
+            print(f"[Fleet] {self.published} readings published ({rate:.0f}/s, "
+                  f"{self.suppressed} inside deadband, {self.late} late).")
+            reported = self.published
+
+    async def run(self, duration: Optional[float] = None):
+        """Runs every sensor stream until cancelled (or for 'duration' seconds)."""
+        print(f"[Fleet] Starting {len(self._sensors)} sensors on one event loop...")
+        # Staggers the first readings so the fleet does not publish in bursts
+        step = self._interval / max(1, len(self._sensors))
+        tasks = [asyncio.create_task(self._stream(sensor, publisher, index * step))
+                 for index, (sensor, publisher) in enumerate(self._sensors)]
+        tasks.append(asyncio.create_task(self._report()))
+        try:
+            await asyncio.wait(tasks, timeout=duration)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def __len__(self):
+        return len(self._sensors)
+
+
+async def run_async_worker(specs: List[SensorSpec], interval: float = SENSOR_DELAY,
+                           duration: Optional[float] = None):
+    """Runs the given sensors as asyncio tasks sharing one connection."""
+    connection = await AsyncRabbitMQConnection().connect()
+    fleet = AsyncSensorFleet(connection, interval=interval)
+    for spec in specs:
+        await fleet.add(*spec)
+    try:
+        await fleet.run(duration)
+    finally:
+        await connection.close()
+
+
+def build_specs(counts: Dict[str, int], related: Dict[str, str] = None) -> List[SensorSpec]:
+    """Sensor definitions for a fleet with 'counts[type]' sensors of each type."""
+    related = dict(DEFAULT_RELATED, **(related or {}))
+    specs = []
+    for sensor_type, amount in counts.items():
+        if sensor_type not in SENSOR_TYPES:
+            raise ValueError(f"Unknown sensor type: {sensor_type}")
+        for index in range(amount):
+            specs.append((sensor_type, f"{sensor_type}_sensor_{index:05d}",
+                          f"Fleet {sensor_type.capitalize()} Sensor {index}", related[sensor_type]))
+    return specs
+
+
+def run_worker(specs: List[SensorSpec], interval: float = SENSOR_DELAY, duration: Optional[float] = None,
+               use_asyncio: bool = False, batch: bool = SENSOR_BATCH):
+    """Runs one fleet (one connection) with the given sensors in the current process."""
+    if use_asyncio:
+        try:
+            asyncio.run(run_async_worker(specs, interval, duration))
+        except KeyboardInterrupt:
+            print("[Fleet] Interrompido manualmente.")
+        return
+    connection = RabbitMQConnection()
+    fleet = SensorFleet(connection, interval=interval, batch=batch)
+    for spec in specs:
+        fleet.add(*spec)
+    try:
+        fleet.run(duration)
+    except KeyboardInterrupt:
+        print("[Fleet] Interrompido manualmente.")
+    finally:
+        connection.close()
+
+
+def run_fleet(specs: List[SensorSpec], workers: int = FLEET_WORKERS, interval: float = SENSOR_DELAY,
+              duration: Optional[float] = None, use_asyncio: bool = False, batch: bool = SENSOR_BATCH):
+    """
+    Spreads the sensors over 'workers' processes, each with its own fleet and
+    connection (connections cannot be shared between processes).
+    """
+    workers = max(1, min(workers, len(specs)))
+    if workers == 1:
+        run_worker(specs, interval, duration, use_asyncio, batch)
+        return
+    processes = [multiprocessing.Process(target=run_worker,
+                                         args=(specs[index::workers], interval, duration, use_asyncio, batch),
+                                         daemon=True)
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("[Fleet] Interrompido manualmente, encerrando workers...")
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Frota de sensores virtuais em um único processo")
+    for sensor_type in SENSOR_TYPES:
+        parser.add_argument(f'--{sensor_type}', type=int, default=0, help=f'Quantidade de sensores de {sensor_type}')
+        parser.add_argument(f'--{sensor_type}_related', type=str, default=DEFAULT_RELATED[sensor_type],
+                            help=f'Atuador ligado aos sensores de {sensor_type}')
+    parser.add_argument('--workers', type=int, default=FLEET_WORKERS, help='Processos que dividem a frota')
+    parser.add_argument('--interval', type=float, default=SENSOR_DELAY, help='Segundos entre leituras de cada sensor')
+    parser.add_argument('--duration', type=float, default=None, help='Segundos de execução (padrão: até CTRL+C)')
+    parser.add_argument('--asyncio', action='store_true',
+                        help='Cada sensor vira uma tarefa asyncio (conexão assíncrona do pika)')
+    parser.add_argument('--batch', action='store_true',
+                        help='Publica as leituras em micro-lotes (uma mensagem AMQP por lote; padrão: SENSOR_BATCH)')
+    args = parser.parse_args(argv)
+    if args.batch and args.asyncio:
+        parser.error("--batch não é suportado com --asyncio")
+    batch = (args.batch or SENSOR_BATCH) and not args.asyncio
+
+    counts = {sensor_type: getattr(args, sensor_type) for sensor_type in SENSOR_TYPES}
+    related = {sensor_type: getattr(args, f'{sensor_type}_related') for sensor_type in SENSOR_TYPES}
+    specs = build_specs(counts, related)
+    if not specs:
+        parser.error("informe a quantidade de sensores, ex.: --temperature 1000 --presence 500")
+    run_fleet(specs, workers=args.workers, interval=args.interval, duration=args.duration,
+              use_asyncio=args.asyncio, batch=batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-from source.utils.rabbitmq import RabbitMQConnection
+from source.utils.rabbitmq import RabbitMQConnection, RabbitMQPublisher
 from source.devices.sensors.abs.sensor_abs import SensorABS
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from random import uniform
 from time import strftime, localtime
 
@@ -11,14 +11,17 @@ class LuminositySensor(SensorABS):
     Simulates luminosity data generation between 0 and 1000 lux.
     """
 
-    def __init__(self, device_id: str, device_name: str, related_device: str, connection: RabbitMQConnection):
-        super().__init__(device_id, device_name, related_device, "luminosity", connection)
+    value_field = "luminosity"
+
+    def __init__(self, device_id: str, device_name: str, related_device: str, connection: RabbitMQConnection,
+                 publisher: Optional[RabbitMQPublisher] = None):
+        super().__init__(device_id, device_name, related_device, "luminosity", connection, publisher)
         self.value = 0.0
 
-    def generate_data(self) -> Dict[str, Any]:
+    def generate_data(self, timestamp: Optional[str] = None) -> Dict[str, Any]:
         """Generates random luminosity data following the expected format by the Gateway."""
         self.value = round(uniform(0.0, 1000.0), 2)
-        self.timestamp = strftime("%Y-%m-%d %H:%M:%S", localtime())
+        self.timestamp = timestamp or strftime("%Y-%m-%d %H:%M:%S", localtime())
         return {
             "id": self.id,                           
             "name": self.name,                       
@@ -1,6 +1,6 @@
-from source.utils.rabbitmq import RabbitMQConnection
+from source.utils.rabbitmq import RabbitMQConnection, RabbitMQPublisher
 from source.devices.sensors.abs.sensor_abs import SensorABS
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from random import choice
 from time import strftime, localtime
 
@@ -11,14 +11,17 @@ class PresenceSensor(SensorABS):
     Simulates presence detection by randomly determining if someone is present or not.
     """
 
-    def __init__(self, device_id: str, device_name: str, related_device: str, connection: RabbitMQConnection):
-        super().__init__(device_id, device_name, related_device, "presence", connection)
+    value_field = "state"
+
+    def __init__(self, device_id: str, device_name: str, related_device: str, connection: RabbitMQConnection,
+                 publisher: Optional[RabbitMQPublisher] = None):
+        super().__init__(device_id, device_name, related_device, "presence", connection, publisher)
         self.status = False
 
-    def generate_data(self) -> Dict[str, Any]:
+    def generate_data(self, timestamp: Optional[str] = None) -> Dict[str, Any]:
         """Generates random presence data (True for presence, False for no presence)."""
         self.status = choice([True, False])
-        self.timestamp = strftime("%Y-%m-%d %H:%M:%S", localtime())
+        self.timestamp = timestamp or strftime("%Y-%m-%d %H:%M:%S", localtime())
         
         return {
             "id": self.id,                           
@@ -1,6 +1,6 @@
-from source.utils.rabbitmq import RabbitMQConnection
+from source.utils.rabbitmq import RabbitMQConnection, RabbitMQPublisher
 from source.devices.sensors.abs.sensor_abs import SensorABS
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from random import uniform
 from time import strftime, localtime
 
@@ -11,14 +11,17 @@ class TemperatureSensor(SensorABS):
     Simulates temperature data generation between 18°C and 30°C.
     """
 
-    def __init__(self, device_id: str, device_name: str, related_device: str, connection: RabbitMQConnection):
-        super().__init__(device_id, device_name, related_device, "temperature", connection)
+    value_field = "temperature"
+
+    def __init__(self, device_id: str, device_name: str, related_device: str, connection: RabbitMQConnection,
+                 publisher: Optional[RabbitMQPublisher] = None):
+        super().__init__(device_id, device_name, related_device, "temperature", connection, publisher)
         self.value = 0.0
 
-    def generate_data(self) -> Dict[str, Any]:
+    def generate_data(self, timestamp: Optional[str] = None) -> Dict[str, Any]:
         """Generates random temperature data."""
         self.value = round(uniform(18.0, 40.0), 2)
-        timestamp = strftime("%Y-%m-%d %H:%M:%S", localtime())
+        timestamp = timestamp or strftime("%Y-%m-%d %H:%M:%S", localtime())
         return {
             "id": self.id,
             "name": self.name,
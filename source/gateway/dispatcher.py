@@ -0,0 +1,244 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from configs.envs import COMMAND_WORKERS
+
+
+class _Command:
+    __slots__ = ('future', 'fn', 'args', 'kwargs', 'token')
+
+    def __init__(self, fn, args, kwargs, token=None):
+        self.future = Future()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        # Estado desejado; None indica comando que não pode ser substituído
+        self.token = token
+
+
+class _Policy:
+    """Tempo mínimo entre mudanças de estado e limite de taxa (token bucket)."""
+    __slots__ = ('min_dwell', 'max_rate', 'burst', 'tokens', 'refilled_at', 'last_change')
+
+    def __init__(self, min_dwell=0.0, max_rate=None, burst=1):
+        self.min_dwell = min_dwell
+        self.max_rate = max_rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.last_change = None
+
+    def delay(self, command, now):
+        """Segundos que o comando ainda precisa esperar (0 se pode ser enviado)."""
+        delay = 0.0
+        if command.token is not None and self.last_change is not None:
+            delay = self.min_dwell - (now - self.last_change)
+        if self.max_rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.max_rate)
+            self.refilled_at = now
+            if self.tokens < 1:
+                delay = max(delay, (1 - self.tokens) / self.max_rate)
+        return delay
+
+    def consume(self, now):
+        if self.max_rate:
+            self.tokens -= 1
+        self.last_change = now
+
+
+class _KeyState:
+    __slots__ = ('queue', 'running', 'timer')
+
+    def __init__(self):
+        self.queue = deque()
+        self.running = None
+        self.timer = None
+
+
+def _chain(source, target):
+    """Resolve 'target' com o mesmo resultado de 'source'."""
+    def copy(f):
+        if f.cancelled():
+            target.cancel()
+        elif f.exception() is not None:
+            target.set_exception(f.exception())
+        else:
+            target.set_result(f.result())
+    source.add_done_callback(copy)
+
+
+class CommandDispatcher:
+    """
+    Executa comandos para atuadores em um pool de threads.
+
+    Comandos com a mesma chave (id do dispositivo) são executados na ordem em
+    que foram submetidos, um de cada vez; chaves diferentes rodam em paralelo,
+    de modo que um atuador lento não atrasa os demais.
+
+    Comandos submetidos com submit_latest() representam um estado desejado:
+    um novo estado substitui o pendente ainda não enviado ("o mais recente
+    vence") e respeita o tempo mínimo de permanência (dwell) do atuador.
+    Todos os comandos respeitam o limite de taxa configurado por chave.
+
+    Após shutdown(), nada mais é agendado: comandos ainda não enviados (e os
+    submetidos depois) são cancelados.
+    """
+
+    def __init__(self, max_workers=COMMAND_WORKERS, min_dwell=0.0, max_rate=None, burst=1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="command")
+        self._lock = threading.Lock()
+        self._keys = {}  # key -> _KeyState (apenas chaves com comandos pendentes)
+        self._policies = {}  # key -> _Policy
+        self._default_policy = (min_dwell, max_rate, burst)
+        self._closed = False
+        self.coalesced = 0
+        self.deduplicated = 0
+        self.delayed = 0
+
+    def set_policy(self, key, min_dwell=0.0, max_rate=None, burst=1):
+        """Configura dwell (s) e taxa máxima (comandos/s) para a chave."""
+        with self._lock:
+            self._policies[key] = _Policy(min_dwell, max_rate, burst)
+
+    def _policy_locked(self, key):
+        policy = self._policies.get(key)
+        if policy is None:
+            policy = self._policies[key] = _Policy(*self._default_policy)
+        return policy
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Enfileira fn(*args, **kwargs) para a chave informada.
+
+        :return: concurrent.futures.Future com o resultado do comando.
+        """
+        command = _Command(fn, args, kwargs)
+        with self._lock:
+            self._enqueue_locked(key, command)
+        return command.future
+
+    def submit_latest(self, key, token, fn, *args, **kwargs):
+        """
+        Enfileira um comando que leva o atuador ao estado 'token'.
+
+        Se já houver um comando desse tipo aguardando envio, ele é substituído
+        (o Future antigo recebe o resultado do novo). Se o estado desejado já
+        estiver pendente ou em envio, nenhum comando novo é criado.
+        """
+        with self._lock:
+            state = self._keys.get(key)
+            superseded = None
+            if state is not None:
+                tail = state.queue[-1] if state.queue else None
+                if tail is not None and tail.token is not None:
+                    if tail.token == token:
+                        self.deduplicated += 1
+                        return tail.future
+                    state.queue.pop()
+                    superseded = tail.future
+                    self.coalesced += 1
+                running = state.running
+                if not state.queue and running is not None and running.token == token:
+                    self.deduplicated += 1
+                    if superseded is not None:
+                        _chain(running.future, superseded)
+                    return running.future
+            command = _Command(fn, args, kwargs, token)
+            self._enqueue_locked(key, command)
+        if superseded is not None:
+            _chain(command.future, superseded)
+        return command.future
+
+    def _enqueue_locked(self, key, command):
+        state = self._keys.get(key)
+        if state is None:
+            # Nenhum comando em andamento para a chave: agenda a execução
+            state = self._keys[key] = _KeyState()
+            state.queue.append(command)
+            self._schedule_locked(key)
+        else:
+            state.queue.append(command)
+
+    def _run_next(self, key):
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None:
+                return  # cancelada por shutdown()
+            if self._closed:
+                self._cancel_locked(key)
+                return
+            state.timer = None
+            command = state.queue[0]
+            now = time.monotonic()
+            policy = self._policy_locked(key)
+            delay = policy.delay(command, now)
+            if delay > 0:
+                # Aguarda fora do pool; enquanto isso o comando ainda pode ser substituído
+                self.delayed += 1
+                state.timer = threading.Timer(delay, self._on_timer, (key,))
+                state.timer.daemon = True
+                state.timer.start()
+                return
+            state.queue.popleft()
+            state.running = command
+            policy.consume(now)
+
+        if command.future.set_running_or_notify_cancel():
+            try:
+                command.future.set_result(command.fn(*command.args, **command.kwargs))
+            except BaseException as e:
+                command.future.set_exception(e)
+
+        with self._lock:
+            state.running = None
+            if self._keys.get(key) is not state:
+                return  # cancelada por shutdown() durante o envio
+            if state.queue:
+                # Reagenda em vez de drenar a fila, para não monopolizar a thread
+                self._schedule_locked(key)
+            else:
+                del self._keys[key]
+
+    def _on_timer(self, key):
+        with self._lock:
+            self._schedule_locked(key)
+
+    def _schedule_locked(self, key):
+        """Agenda o próximo comando da chave no pool; encerrado, cancela os pendentes."""
+        if self._closed:
+            self._cancel_locked(key)
+        else:
+            self._executor.submit(self._run_next, key)
+
+    def _cancel_locked(self, key):
+        """Cancela os comandos ainda não enviados da chave e a esquece."""
+        state = self._keys.pop(key, None)
+        if state is None:
+            return  # já cancelada (ex.: timer que disparou durante shutdown())
+        if state.timer is not None:
+            state.timer.cancel()
+        for command in state.queue:
+            command.future.cancel()
+
+    def pending(self):
+        """Quantidade de comandos aguardando execução."""
+        with self._lock:
+            return sum(len(state.queue) for state in self._keys.values())
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "coalesced": self.coalesced,
+            "deduplicated": self.deduplicated,
+            "delayed": self.delayed,
+        }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._closed = True
+            for key in list(self._keys):
+                self._cancel_locked(key)
+        # Descarta também os _run_next ainda na fila do pool; só os envios em andamento terminam
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+from json import dumps
+
+from configs.envs import GATEWAY_THREADS, SSE_HEARTBEAT, SSE_MAX_PENDING, SSE_RESERVED_THREADS
+
+
+class EventSubscriber:
+    """
+    Cliente conectado ao stream de eventos.
+
+    Eventos pendentes são agrupados por (evento, dispositivo): se o cliente
+    estiver lento, só o evento mais recente de cada tipo por dispositivo é mantido.
+    """
+
+    def __init__(self, device_id=None):
+        self.device_id = device_id
+        self.pending = OrderedDict()  # (event, device_id) -> (event, payload)
+        self.condition = threading.Condition()
+        self.closed = False
+
+
+class EventBroker:
+    """
+    Distribui eventos (Server-Sent Events) para os clientes conectados.
+
+    Cada cliente conectado ocupa uma thread do servidor HTTP durante todo o
+    stream: 'max_subscribers' limita os clientes simultâneos para que sobrem
+    threads para as demais rotas.
+    """
+
+    def __init__(self, max_pending=SSE_MAX_PENDING, heartbeat=SSE_HEARTBEAT,
+                 max_subscribers=max(0, GATEWAY_THREADS - SSE_RESERVED_THREADS)):
+        self._max_pending = max_pending
+        self._heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.dropped = 0
+        self.rejected = 0
+
+    def subscribe(self, device_id=None):
+        """
+        Registra um cliente; se 'device_id' for informado, recebe só eventos desse dispositivo.
+        :return: o cliente, ou None se o limite de clientes foi atingido.
+        """
+        subscriber = EventSubscriber(device_id)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+        with subscriber.condition:
+            subscriber.closed = True
+            subscriber.condition.notify()
+
+    def publish(self, event, device_id, data):
+        """Envia um evento a todos os clientes; 'data' é serializado uma única vez."""
+        key = (event, device_id)
+        payload = dumps(data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if subscriber.device_id is not None and subscriber.device_id != device_id:
+                continue
+            with subscriber.condition:
+                if key not in subscriber.pending and len(subscriber.pending) >= self._max_pending:
+                    # Cliente muito atrasado: desconecta para não acumular memória
+                    subscriber.closed = True
+                    self.dropped += 1
+                else:
+                    subscriber.pending[key] = (event, payload)
+                subscriber.condition.notify()
+
+    def stream(self, subscriber, initial=()):
+        """
+        Gerador de mensagens no formato text/event-stream.
+
+        :param initial: eventos (event, data) enviados antes das atualizações.
+        """
+        try:
+            yield "retry: 2000\n\n"
+            for event, data in initial:
+                yield f"event: {event}\ndata: {dumps(data)}\n\n"
+            while True:
+                with subscriber.condition:
+                    if not subscriber.pending and not subscriber.closed:
+                        subscriber.condition.wait(self._heartbeat)
+                    if subscriber.closed:
+                        return
+                    pending, subscriber.pending = subscriber.pending, OrderedDict()
+                if not pending:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield "".join(f"event: {event}\ndata: {payload}\n\n" for event, payload in pending.values())
+        finally:
+            self.unsubscribe(subscriber)
+
+    def __len__(self):
+        return len(self._subscribers)
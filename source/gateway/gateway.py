@@ -1,39 +1,121 @@
-import grpc
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import os
 import threading
-from flask import Flask, render_template, request, jsonify
-from json import loads
-from time import sleep
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from flask import Flask, Response, render_template, request, jsonify
+from json import dumps, loads
+from time import monotonic, sleep
 
 # Import utilitários RabbitMQ
-from configs.envs import DEVICES_DELAY, GRPC_AIR_PORT, GRPC_DOOR_PORT
+from configs.envs import (ACTUATOR_MAX_RATE, ACTUATOR_MIN_DWELL, ACTUATOR_RATE_BURST, COMMAND_WAIT_TIMEOUT,
+                         DEVICE_SILENCE_TIMEOUT, SENSOR_SILENCE_TIMEOUT,
+                         GATEWAY_BACKLOG, GATEWAY_CHANNEL_TIMEOUT, GATEWAY_CONNECTION_LIMIT, GATEWAY_HOST,
+                         GATEWAY_INGEST_ASYNC, GATEWAY_INGEST_WORKERS, INGEST_SHARDS,
+                         GATEWAY_MODE, GATEWAY_PORT, GATEWAY_TABLE_POLL, GATEWAY_THREADS, GATEWAY_WORKERS,
+                         GATEWAY_WORKER_RESTART_DELAY,
+                         GRPC_AIR_PORT, GRPC_COMMAND_TIMEOUT, GRPC_DOOR_PORT, REGISTRY_DATA_DIR,
+                         REGISTRY_PERSISTENCE, RULES_FILE, RULES_RELOAD_INTERVAL, RULES_SWEEP_DELAY,
+                         SSE_RESERVED_THREADS)
+from source.utils.rabbitmq.aio import AsyncRabbitMQConnection, AsyncRabbitMQConsumer
 from source.utils.rabbitmq.connection import RabbitMQConnection
-from source.utils.rabbitmq.consumer import RabbitMQConsumer
+from source.utils.rabbitmq.consumer import RabbitMQConsumer, RequeueMessage
 from source.utils.rabbitmq.publisher import RabbitMQPublisher
+from source.utils.rabbitmq.setup import (INGEST_QUEUES, SHARDS_EXCHANGE, SHARDS_EXCHANGE_ARGUMENTS, SHARDS_EXCHANGE_TYPE,
+                                         setup_shards, unbind_ingest_queues)
+from source.gateway.registry import DeviceRegistry
+from source.gateway.grpc_pool import GrpcChannelPool
+from source.gateway.dispatcher import CommandDispatcher
+from source.gateway.events import EventBroker
+from source.gateway.history import HistoryStore
+from source.gateway.latest import LatestValueTable
+from source.gateway.persistence import RegistryStore
+from source.gateway.rules import RuleTable, load_rules
+from source.gateway.sharding import ShardManager
 
 # Import dos módulos gRPC gerados
 from source.devices.actuators.proto import actuators_pb2
-from source.devices.actuators.proto import actuators_pb2_grpc
-
-# Constante de limiar para o sensor de temperatura
-# No início do gateway.py (após SENSOR_THRESHOLD)
-HIGH_TEMP_THRESHOLD = 25.0  # Limiar superior para ligar o ar
-LOW_TEMP_THRESHOLD = 12.0   # Limiar inferior para desligar o ar
-LUMINOSITY_THRESHOLD_LOW = 300.0  # Limiar para ligar a lâmpada
-LUMINOSITY_THRESHOLD_HIGH = 700.0 # Limiar para desligar a lâmpada
 
 app = Flask(__name__)
 app.config['JSON_SORT_KEYS'] = False
 
-# Lista dinâmica de dispositivos (armazenada no gateway)
-disp = []
+# Registro dinâmico de dispositivos (armazenado no gateway)
+disp = DeviceRegistry()
+
+# Canais gRPC reaproveitados entre comandos
+grpc_pool = GrpcChannelPool()
+
+# Pool de execução de comandos, com ordem preservada por dispositivo
+dispatcher = CommandDispatcher(max_rate=ACTUATOR_MAX_RATE, burst=ACTUATOR_RATE_BURST)
+
+# Regras sensor -> atuador (configs/rules.json), compiladas uma vez e
+# avaliadas em lote sobre colunas NumPy
+rule_table = RuleTable(load_rules(RULES_FILE))
+disp.add_listener(rule_table.on_registry_change)
+
+# Histórico recente das leituras de cada sensor
+history = HistoryStore()
+
+# Sharding da ingestão entre instâncias do gateway (INGEST_SHARDS > 0): esta
+# instância consome só as filas de shard que o anel atribui a ela
+shards = ShardManager() if INGEST_SHARDS else None
+
+# Eventos (SSE) enviados aos navegadores a cada mudança no registro
+event_broker = EventBroker()
+
+def publish_device_event(device_id, device, version):
+    if device is None:
+        event_broker.publish('removed', device_id, {"version": version, "id": device_id})
+    else:
+        event_broker.publish('device', device_id, {"version": version, "device": device})
+
+disp.add_listener(publish_device_event)
 
-# Conexão persistente para publicação
-rabbitmq_connection = RabbitMQConnection()
+# Com GATEWAY_WORKERS > 0, ingestão e regras rodam em processos separados
+# (run_ingest_worker), que publicam o estado dos dispositivos nesta tabela em
+# memória compartilhada; as rotas HTTP deste processo leem dela, sem locks nem IPC
+latest_table = None
+ingest_workers = []  # (processo, fila de comandos) de cada worker
+ingest_workers_lock = threading.Lock()
+worker_index = None  # índice deste processo, quando ele é um worker de ingestão
+# Comandos para atuadores repassados aos workers: id do pedido -> (worker, Future do resultado)
+command_replies = None  # fila em que os workers devolvem (id do pedido, (success, error))
+forwarded_commands = {}
+forwarded_commands_lock = threading.Lock()
+forwarded_command_ids = itertools.count(1)
+
+def device_source():
+    """De onde as rotas leem os dispositivos: o registro local ou a tabela dos workers."""
+    return disp if latest_table is None else latest_table
+
+def update_device_fields(device_id, **fields):
+    """
+    Atualiza campos de um dispositivo no registro. Com workers de ingestão, o
+    pedido vai a todos eles: só o dono do dispositivo o tem no registro (nos
+    demais, update_fields não faz nada), e a mudança chega à tabela por ele.
+    """
+    if latest_table is None:
+        return disp.update_fields(device_id, **fields)
+    notify_workers('update_fields', device_id, fields)
+    return True
+
+# Lista de dispositivos serializada, reaproveitada enquanto a versão não muda
+_listdevice_cache = (None, b"[]")
+_listdevice_cache_lock = threading.Lock()
+
+# Conexão persistente com o RabbitMQ (aberta em start_background_services)
+rabbitmq_connection = None
+# Consumidor de ingestão ativo (e o event loop dele, no modo asyncio), usado nos rebalanceamentos
+ingest_consumer = None
+ingest_loop = None
 publisher_lock = threading.Lock()
 
 def add_or_update_device(device_data):
-    global disp
     device_id = device_data.get('id')
+    if 'hb' in device_data:
+        return record_heartbeat(device_id, device_data['hb'])
     if device_data.get('type') == 'ac':
         if not device_data.get('grpc_port'):
             device_data['grpc_port'] = GRPC_AIR_PORT
@@ -48,51 +130,218 @@ def add_or_update_device(device_data):
         if not device_data.get('grpc_host'):
             device_data['grpc_host'] = 'localhost'
             print(f"[GATEWAY] grpc_host não especificado para '{device_id}', usando 'localhost'.")
-    for device in disp:
-        if device['id'] == device_id:
-            device.update(device_data)
-            print(f"[GATEWAY] Dispositivo atualizado: {device_data}")
-            return
-    disp.append(device_data)
-    print(f"[GATEWAY] Novo dispositivo adicionado: {device_data}")
+    device, created, changes = disp.upsert(device_data)
+    if created:
+        print(f"[GATEWAY] Novo dispositivo adicionado: {device_data}")
+    else:
+        print(f"[GATEWAY] Dispositivo atualizado: {device_data}")
+    update_grpc_channel(device, created, changes)
+    if created and device.get('type') != 'sensor':
+        configure_command_policy(device)
+    return device
+
+def record_heartbeat(device_id, seq):
+    """
+    Heartbeat de atuador ({"id", "hb": seq}): o dispositivo segue ativo e sem
+    mudanças, então nada é mesclado no registro. Se 'seq' difere do último
+    status recebido, uma atualização se perdeu; o status completo é reenviado
+    periodicamente pelo atuador.
+    """
+    device = disp.heartbeat(device_id)
+    if device is None:
+        print(f"[GATEWAY] Heartbeat de dispositivo desconhecido '{device_id}'; aguardando status completo.")
+    elif device.get('seq') != seq:
+        print(f"[GATEWAY] Heartbeat de '{device_id}' com seq {seq}, registro com seq {device.get('seq')}: "
+              f"aguardando status completo.")
+    return device
+
+def silent_devices():
+    """
+    Dispositivos sem mensagens além do esperado. Sensores publicam por exceção
+    (só quando o valor muda, com keep-alive a cada SENSOR_MAX_SILENCE), então
+    o prazo deles é SENSOR_SILENCE_TIMEOUT; atuadores enviam heartbeats.
+    """
+    silent = []
+    for device_id in disp.silent(min(DEVICE_SILENCE_TIMEOUT, SENSOR_SILENCE_TIMEOUT)):
+        device = disp.get(device_id)
+        is_sensor = device is not None and device.get('type') == 'sensor'
+        timeout = SENSOR_SILENCE_TIMEOUT if is_sensor else DEVICE_SILENCE_TIMEOUT
+        if monotonic() - (disp.last_seen(device_id) or 0) > timeout:
+            silent.append(device_id)
+    return silent
+
+def configure_command_policy(device):
+    """Define dwell e limite de taxa do atuador (o dispositivo pode sobrescrever via 'min_dwell'/'max_rate')."""
+    device_type = device.get('subtype') or device.get('type')
+    dispatcher.set_policy(
+        device['id'],
+        min_dwell=float(device.get('min_dwell', ACTUATOR_MIN_DWELL.get(device_type, 0.0))),
+        max_rate=device.get('max_rate', ACTUATOR_MAX_RATE),
+        burst=ACTUATOR_RATE_BURST,
+    )
+
+def update_grpc_channel(device, created, changes):
+    """
+    Associa o atuador ao canal gRPC do seu endereço, pré-aquecendo-o quando
+    ele se registra ou muda de endereço. O canal antigo só é fechado quando
+    nenhum outro dispositivo o usa (GrpcChannelPool.bind).
+    """
+    if not device.get('grpc_port'):
+        return
+    if not created and 'grpc_host' not in changes and 'grpc_port' not in changes:
+        return
+    grpc_pool.bind(device['id'], device.get('grpc_host', 'localhost'), device['grpc_port'])
 
 @app.route('/register', methods=['POST'])
 def register_device():
+    if latest_table is not None:
+        # O registro fica nos workers, e só o broker sabe qual deles é dono do dispositivo
+        return jsonify({"success": False, "error": "Com workers de ingestão (GATEWAY_WORKERS > 0), "
+                                                   "os dispositivos se registram pelo RabbitMQ."}), 501
     device_data = request.get_json()
-    add_or_update_device(device_data)
+    device = add_or_update_device(device_data)
+    if device is not None and 'hb' not in device_data:
+        evaluate_device(device)
     print(f"[GATEWAY] Registro recebido: {device_data}")
     return jsonify({"success": True}), 200
 
 def custom_callback(body, exchange_name, routing_key, queue_name):
     """
-    Processa mensagens recebidas e atualiza a lista de dispositivos.
+    Processa mensagens recebidas, atualiza o registro de dispositivos e
+    avalia imediatamente as regras afetadas pela mensagem. 'body' chega já
+    decodificado pelo consumidor (protobuf ou JSON, conforme o content_type);
+    um micro-lote chega como lista e é aplicado por apply_batch().
     """
+    if shards is not None and not shards.owns(queue_name):
+        # Shard passou para outra instância: a mensagem volta à fila para o novo dono
+        raise RequeueMessage()
     try:
-        message = loads(body)
+        message = body if isinstance(body, (dict, list)) else loads(body)
+        if shards is not None:
+            shards.track(message, queue_name)
+        if isinstance(message, list):
+            apply_batch(message)
+            return
+        if 'hb' in message:
+            # Heartbeat: dispositivo ativo e sem mudanças, nada a reavaliar
+            add_or_update_device(message)
+            return
         print(f"[GATEWAY] Mensagem recebida na fila '{queue_name}' (Routing Key: {routing_key}): {message}")
-        add_or_update_device(message)
+        device = add_or_update_device(message)
+        if device.get('type') == 'sensor':
+            history.record(device)
+        evaluate_device(device)
     except Exception as e:
         print(f"[GATEWAY ERROR] Erro ao processar mensagem da fila '{queue_name}': {e}")
 
+def apply_batch(messages):
+    """
+    Aplica um micro-lote de mensagens em uma passada: heartbeats e mensagens
+    de sensores atualizam o registro e o histórico com um único lock cada, e
+    as regras afetadas por todo o lote são avaliadas de uma vez. Mensagens
+    de outros dispositivos (raras em lotes) seguem por add_or_update_device().
+    """
+    readings = []
+    for message in messages:
+        if 'hb' in message:
+            record_heartbeat(message.get('id'), message['hb'])
+        elif message.get('type') == 'sensor':
+            readings.append(message)
+        else:
+            evaluate_device(add_or_update_device(message))
+    if not readings:
+        return
+    sensors = [device for device, _, _ in disp.upsert_many(readings)]
+    history.record_many(sensors)
+    rows = {row: None for device in sensors for row in rule_table.rows_for(device)}
+    try:
+        apply_rule_decisions(rule_table.evaluate(list(rows)))
+    except Exception as e:
+        print(f"[GATEWAY ERROR] Erro ao avaliar regras de um lote de {len(sensors)} leituras: {e}")
+    print(f"[GATEWAY] Lote de {len(messages)} mensagens aplicado ({len(sensors)} leituras de sensores).")
+
+def message_order_key(message, routing_key):
+    """
+    Chave das lanes de consumo: mensagens do mesmo dispositivo são processadas
+    em ordem. Um lote usa a routing key: os lotes de um mesmo host seguem em ordem.
+    """
+    if isinstance(message, list):
+        return routing_key
+    return message.get('id') or routing_key
+
+def ingest_topology():
+    """Exchange e filas de ingestão desta instância (argumentos de RabbitMQConsumer)."""
+    if shards is not None:
+        return dict(exchange_name=SHARDS_EXCHANGE, exchange_type=SHARDS_EXCHANGE_TYPE,
+                    exchange_arguments=SHARDS_EXCHANGE_ARGUMENTS, queues=shards.queues())
+    return dict(exchange_name="sensors_exchange", queues=dict(INGEST_QUEUES))
+
+async def consume_async():
+    """Ingestão asyncio: conexão e consumidor próprios, em um event loop dedicado."""
+    global ingest_consumer, ingest_loop
+    connection = await AsyncRabbitMQConnection().connect()
+    consumer = await AsyncRabbitMQConsumer(
+        connection=connection,
+        workers=GATEWAY_INGEST_WORKERS,
+        order_key=message_order_key,
+        decode=True,
+        **ingest_topology(),
+    ).open()
+    ingest_consumer, ingest_loop = consumer, asyncio.get_running_loop()
+    try:
+        await consumer.consume(custom_callback)
+    finally:
+        await connection.close()
+
 def start_rabbitmq_consumers():
     """
-    Inicia os consumidores do RabbitMQ.
+    Inicia os consumidores do RabbitMQ. As mensagens são processadas em
+    GATEWAY_INGEST_WORKERS lanes, fora da thread da conexão (que fica livre
+    para heartbeats e entregas). Com GATEWAY_INGEST_ASYNC, o consumo roda
+    em um event loop asyncio com conexão própria. Com INGEST_SHARDS, consome
+    apenas as filas de shard desta instância.
     """
-    consumer = RabbitMQConsumer(
+    global ingest_consumer
+    if shards is not None:
+        setup_shards(rabbitmq_connection.channel)
+        unbind_ingest_queues(rabbitmq_connection.channel)
+        print(f"[GATEWAY] Instância '{shards.instance}' com {len(shards.queues())} de {INGEST_SHARDS} shards.")
+    if GATEWAY_INGEST_ASYNC:
+        threading.Thread(target=asyncio.run, args=(consume_async(),), daemon=True).start()
+        print("[GATEWAY] Consumidores RabbitMQ (asyncio) iniciados.")
+        return
+    ingest_consumer = RabbitMQConsumer(
         connection=rabbitmq_connection,
-        exchange_name="sensors_exchange",
-        queues={
-            "queue.temperature": "sensor.temperature",
-            "queue.luminosity": "sensor.luminosity",
-            "queue.presence": "sensor.presence",
-            "queue.lamp": "command.lamp.*",
-            "queue.air_conditioner": "command.air_conditioner.*",
-            "queue.door": "command.door.*",
-            "queue.sprinkler": "command.sprinkler.*",
-        }
+        workers=GATEWAY_INGEST_WORKERS,
+        order_key=message_order_key,
+        decode=True,
+        **ingest_topology(),
     )
-    threading.Thread(target=consumer.start, args=(custom_callback,), daemon=True).start()
+    threading.Thread(target=ingest_consumer.start, args=(custom_callback,), daemon=True).start()
     print("[GATEWAY] Consumidores RabbitMQ iniciados.")
+
+def rebalance_shards(instances):
+    """
+    Redistribui as filas de shard para o novo conjunto de instâncias: passa a
+    consumir as filas ganhas, deixa as perdidas (mensagens delas ainda em
+    processamento voltam à fila, ver custom_callback) e remove do registro
+    local os dispositivos que agora pertencem a outra instância. Com workers
+    de ingestão, cada worker repete o rebalanceamento para a sua parte.
+    """
+    notify_workers('rebalance', instances)
+    gained, lost, dropped = shards.rebalance(instances)
+    queues = shards.queues()
+    if ingest_loop is not None:
+        asyncio.run_coroutine_threadsafe(ingest_consumer.update_queues(queues), ingest_loop)
+    elif ingest_consumer is not None:
+        # O canal só pode ser usado pela thread da conexão
+        rabbitmq_connection.add_callback_threadsafe(lambda: ingest_consumer.update_queues(queues))
+    for device_id in dropped:
+        disp.remove(device_id)
+        grpc_pool.release(device_id)
+    print(f"[GATEWAY] Rebalanceamento: {len(gained)} shards ganhos, {len(lost)} perdidos, "
+          f"{len(dropped)} dispositivos transferidos.")
+    return gained, lost, dropped
 def send_grpc_command(device_info, action, parameters=None):
     try:
         actuator_type = device_info.get('subtype') or device_info.get('type')
@@ -104,9 +353,7 @@ def send_grpc_command(device_info, action, parameters=None):
             print(error_msg)
             return False, error_msg
 
-        print(f"[GATEWAY] Estabelecendo canal gRPC para {actuator_type} '{device_info['id']}' em {grpc_host}:{grpc_port}...")
-        channel = grpc.insecure_channel(f"{grpc_host}:{grpc_port}")
-        stub = actuators_pb2_grpc.ActuatorServiceStub(channel)
+        stub = grpc_pool.get_stub(grpc_host, grpc_port)
 
         if actuator_type == 'lamp':
             active = (action == 'on')
@@ -116,7 +363,7 @@ def send_grpc_command(device_info, action, parameters=None):
                 active=active
             )
             print(f"[GATEWAY] Enviando comando para lâmpada '{device_info['id']}': {'ON' if active else 'OFF'}")
-            response = stub.controlLightBulb(request_message)
+            response = stub.controlLightBulb(request_message, timeout=GRPC_COMMAND_TIMEOUT)
         elif actuator_type == 'ac':
             active = (action in ['on', 'config'])
             temperature = parameters.get('temperature', device_info.get('temperature', 22.0)) if parameters else 22.0
@@ -128,7 +375,7 @@ def send_grpc_command(device_info, action, parameters=None):
             )
             print(f"[GATEWAY] Enviando comando para ar-condicionado '{device_info['id']}': "
                   f"{'ON' if active else 'OFF'} com temperatura {temperature}")
-            response = stub.controlAC(request_message)
+            response = stub.controlAC(request_message, timeout=GRPC_COMMAND_TIMEOUT)
         elif actuator_type == 'sprinkler':
             active = (action == 'on')
             request_message = actuators_pb2.RequestSprinkler(
@@ -137,7 +384,7 @@ def send_grpc_command(device_info, action, parameters=None):
                 active=active
             )
             print(f"[GATEWAY] Enviando comando para sprinkler '{device_info['id']}': {'ON' if active else 'OFF'}")
-            response = stub.controlSprinkler(request_message)
+            response = stub.controlSprinkler(request_message, timeout=GRPC_COMMAND_TIMEOUT)
         elif actuator_type == 'door':
             desired_open = True if action == 'open' else False
             request_message = actuators_pb2.RequestDoor(
@@ -146,17 +393,21 @@ def send_grpc_command(device_info, action, parameters=None):
                 is_open=desired_open
             )
             print(f"[GATEWAY] Enviando comando para porta '{device_info['id']}': {'open' if desired_open else 'closed'}")
-            response = stub.controlDoor(request_message)
+            response = stub.controlDoor(request_message, timeout=GRPC_COMMAND_TIMEOUT)
         else:
             error_msg = "[GATEWAY ERROR] Tipo não suportado."
             print(error_msg)
             return False, error_msg
 
         if response.success:
-            device_info['state'] = 'open' if (actuator_type == 'door' and action == 'open') else \
-                                   ('closed' if actuator_type == 'door' else action)
+            if actuator_type == 'door':
+                state = 'open' if action == 'open' else 'closed'
+            else:
+                state = 'on' if action == 'config' else action
+            fields = {'state': state}
             if actuator_type == 'ac' and parameters and 'temperature' in parameters:
-                device_info['temperature'] = parameters['temperature']
+                fields['temperature'] = parameters['temperature']
+            update_device_fields(device_info['id'], **fields)
             print(f"[GATEWAY] Comando para '{device_info['id']}' enviado com sucesso.\n")
             return True, ""
         else:
@@ -166,23 +417,203 @@ def send_grpc_command(device_info, action, parameters=None):
         print(f"[GATEWAY EXCEPTION] Exceção ao enviar comando para '{device_info['id']}': {e}\n")
         return False, str(e)
     
+def submit_command(device_info, action, parameters=None, wait=False, on_success=None, latest=False):
+    """
+    Submete um comando ao dispatcher.
+
+    :param wait: se True, aguarda e retorna (success, error); caso contrário
+                 retorna imediatamente o Future do comando.
+    :param on_success: função chamada (na thread do comando) se o comando der certo.
+    :param latest: se True, o comando substitui um estado pendente ainda não
+                   enviado e respeita o dwell do atuador (usado pelas regras).
+
+    Com workers de ingestão, o comando vai ao worker dono do dispositivo
+    (forward_command): ordem por dispositivo, dwell e limite de taxa valem
+    para comandos manuais e das regras no mesmo dispatcher.
+    """
+    if latest_table is not None:
+        future = forward_command(device_info['id'], action, parameters)
+    elif latest:
+        token = (action, tuple(sorted((parameters or {}).items())))
+        future = dispatcher.submit_latest(device_info['id'], token, send_grpc_command,
+                                          device_info, action, parameters)
+    else:
+        future = dispatcher.submit(device_info['id'], send_grpc_command, device_info, action, parameters)
+    future.add_done_callback(lambda f: publish_command_event(device_info['id'], action, f))
+    if on_success is not None:
+        future.add_done_callback(lambda f: f.result()[0] and on_success())
+    if not wait:
+        return future
+    try:
+        return future.result(timeout=COMMAND_WAIT_TIMEOUT)
+    except FutureTimeoutError:
+        return False, f"Tempo esgotado aguardando o comando ({COMMAND_WAIT_TIMEOUT}s)."
+
+def forward_command(device_id, action, parameters=None):
+    """
+    Envia um comando ao worker que publicou o estado mais recente do
+    dispositivo (o dono do shard dele).
+    :return: Future resolvido com (success, error) quando o worker responder.
+    """
+    future = Future()
+    worker = latest_table.owner(device_id)
+    if worker is None:
+        future.set_result((False, f"Dispositivo '{device_id}' não encontrado."))
+        return future
+    with forwarded_commands_lock:
+        request_id = next(forwarded_command_ids)
+        forwarded_commands[request_id] = (worker, future)
+    with ingest_workers_lock:
+        ingest_workers[worker][1].put(('command', (request_id, device_id, action, parameters)))
+    return future
+
+def relay_command_replies(replies):
+    """Resolve os Futures de forward_command() com as respostas dos workers."""
+    while True:
+        reply = replies.get()
+        if reply is None:
+            break
+        request_id, result = reply
+        with forwarded_commands_lock:
+            _, future = forwarded_commands.pop(request_id, (None, None))
+        if future is not None:
+            future.set_result(result)
+
+def fail_forwarded_commands(error, worker=None):
+    """Responde com erro os comandos repassados (a 'worker', ou a todos) ainda sem resposta."""
+    with forwarded_commands_lock:
+        failed = [request_id for request_id, (owner, _) in forwarded_commands.items()
+                  if worker is None or owner == worker]
+        futures = [forwarded_commands.pop(request_id)[1] for request_id in failed]
+    for future in futures:
+        future.set_result((False, error))
+
+def run_forwarded_command(replies, request_id, device_id, action, parameters):
+    """Worker: executa um comando recebido do processo HTTP e devolve o resultado."""
+    def reply(future):
+        result = (False, "Comando cancelado.") if future.cancelled() else future.result()
+        replies.put((request_id, result))
+
+    device_info = disp.get(device_id)
+    if device_info is None:
+        # O dispositivo mudou de worker depois da leitura da tabela
+        replies.put((request_id, (False, f"Dispositivo '{device_id}' não está neste worker.")))
+        return
+    submit_command(device_info, action, parameters).add_done_callback(reply)
+
+def serialized_device_list():
+    """Retorna (versão, bytes JSON) da lista completa, serializando só quando há mudanças."""
+    global _listdevice_cache
+    source = device_source()
+    version, body = _listdevice_cache
+    if version == source.version:
+        return version, body
+    with _listdevice_cache_lock:
+        if _listdevice_cache[0] != source.version:
+            version, devices = source.versioned_snapshot()
+            _listdevice_cache = (version, dumps(devices).encode())
+        return _listdevice_cache
+
+def publish_command_event(device_id, action, future):
+    """Notifica os navegadores sobre o resultado de um comando."""
+    success, error = future.result()
+    event_broker.publish('command', device_id, {
+        "id": device_id, "action": action, "success": success, "error": error
+    })
+
+@app.route('/events', methods=['GET'])
+def events():
+    """
+    Stream Server-Sent Events com as mudanças do registro e os resultados de
+    comandos. Começa com um evento 'snapshot' (lista completa) ou, com
+    ?device_id=<id>, apenas com o estado atual desse dispositivo.
+    """
+    device_id = request.args.get('device_id')
+    subscriber = event_broker.subscribe(device_id)
+    if subscriber is None:
+        # Sem thread livre para mais um stream: o navegador tenta de novo depois
+        return jsonify({"error": "Limite de clientes do stream de eventos atingido."}), 503, {'Retry-After': '30'}
+    source = device_source()
+    if device_id:
+        device = source.get(device_id)
+        initial = [('device', {"version": source.version, "device": dict(device)})] if device else []
+    else:
+        version, devices = source.versioned_snapshot()
+        initial = [('snapshot', {"epoch": source.epoch, "version": version, "devices": devices})]
+    return Response(
+        event_broker.stream(subscriber, initial),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/history/<device_id>', methods=['GET'])
+def device_history(device_id):
+    """
+    Histórico de um sensor: ?from=&to= (epoch em segundos) e ?step=<segundos>
+    para reduzir a resolução no servidor (média, mínimo e máximo por janela).
+    """
+    start = request.args.get('from', type=float)
+    end = request.args.get('to', type=float)
+    step = request.args.get('step', type=int)
+    if step is not None and step <= 0:
+        return jsonify({"error": "'step' deve ser positivo."}), 400
+    if latest_table is not None:
+        return jsonify({"error": "Histórico mantido pelos workers de ingestão (GATEWAY_WORKERS > 0)."}), 501
+    data = history.query(device_id, start, end, step)
+    if data is None:
+        return jsonify({"error": f"Sem histórico para '{device_id}'."}), 404
+    return jsonify(data)
+
 @app.route('/listdevice_data', methods=['GET'])
 def listdevice_data():
-    """Retorna a lista de dispositivos em formato JSON para atualização assíncrona."""
-    return jsonify(disp)
+    """
+    Retorna a lista de dispositivos em formato JSON para atualização assíncrona.
+
+    - Sem parâmetros: lista completa, com ETag (responde 304 a If-None-Match).
+    - ?since=<versão>&epoch=<epoch>: apenas dispositivos alterados e ids
+      removidos após a versão. Se o epoch não corresponder (gateway
+      reiniciado), a versão for futura ou for anterior às remoções ainda
+      lembradas pelo registro, devolve a lista completa.
+
+    Com workers de ingestão, lê a tabela compartilhada: a versão é o vetor
+    das versões dos workers ('3.10.7').
+    """
+    source = device_source()
+    since = request.args.get('since', type=int if source is disp else str)
+    if since is not None:
+        changes = None
+        if request.args.get('epoch', source.epoch) == source.epoch:
+            if source is not disp:
+                changes = source.changes_since(since)
+            elif since <= disp.version:
+                changes = disp.changes_since(since)
+        if changes is None:
+            version, devices = source.versioned_snapshot()
+            removed, full = [], True
+        else:
+            version, devices, removed = changes
+            full = False
+        return jsonify({"epoch": source.epoch, "version": version, "full": full,
+                        "devices": devices, "removed": removed})
+
+    version, body = serialized_device_list()
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(f"{source.epoch}-{version}")
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 
 @app.route('/listdevice', methods=['GET'])
 def listdevice():
     print("[GATEWAY] Listagem de dispositivos requisitada.")
-    return render_template("listdevice.html", devices=disp)
+    return render_template("listdevice.html", devices=device_source().versioned_snapshot()[1])
 
 @app.route('/device_status', methods=['GET', 'POST'])
 def device_status():
     device_info = None
     if request.method == 'POST':
         device_id = request.form.get('device_id')
-        device_info = next((d for d in disp if d['id'] == device_id), None)
+        device_info = device_source().get(device_id)
         print(f"[GATEWAY] Status solicitado para dispositivo '{device_id}': {device_info}")
     return render_template("device_status.html", device_info=device_info)
 
@@ -199,16 +630,16 @@ def device_toggle():
         print(f"[GATEWAY] Toggle requisitado para dispositivo '{device_id}' para o estado '{new_state}'")
         
         if device_id and new_state:
-            device_info = next((d for d in disp if d['id'] == device_id), None)
+            device_info = device_source().get(device_id)
             
             if device_info:
                 device_type = device_info.get('subtype') or device_info.get('type')
                 
                 if device_type in ['lamp', 'ac', 'sprinkler']:
-                    success, error = send_grpc_command(device_info, new_state)
+                    success, error = submit_command(device_info, new_state, wait=True)
                     
                     if success:
-                        device_info['state'] = new_state
+                        update_device_fields(device_id, state=new_state)
                         message = f"Dispositivo '{device_id}' atualizado para '{new_state}'."
                         message_type = "success"
                     else:
@@ -241,21 +672,21 @@ def device_config():
         print(f"[GATEWAY] Configuração requisitada para dispositivo '{device_id}' - "
               f"temperatura: '{temperature}' / status: '{status}'")
         
-        device_info = next((d for d in disp if d['id'] == device_id), None)
+        device_info = device_source().get(device_id)
         if device_info:
             if device_info.get('type') == 'ac' and temperature:
-                success, error = send_grpc_command(device_info, 'config', {'temperature': float(temperature)})
+                success, error = submit_command(device_info, 'config', {'temperature': float(temperature)}, wait=True)
                 if success:
-                    device_info['temperature'] = temperature
+                    update_device_fields(device_id, temperature=temperature)
                     print(f"[GATEWAY] Temperatura do dispositivo '{device_id}' atualizada para {temperature}.")
                 else:
                     print(f"[GATEWAY ERROR] Erro ao configurar dispositivo '{device_id}': {error}")
             elif device_info.get('type') == 'door' and status:
                 # Para a porta, o campo 'status' deve ser 'open' ou 'closed'
                 if status.lower() in ['open', 'closed']:
-                    success, error = send_grpc_command(device_info, status.lower())
+                    success, error = submit_command(device_info, status.lower(), wait=True)
                     if success:
-                        device_info['state'] = status.lower()
+                        update_device_fields(device_id, state=status.lower())
                         print(f"[GATEWAY] Status da porta '{device_id}' atualizado para {status.lower()}.")
                     else:
                         print(f"[GATEWAY ERROR] Erro ao configurar dispositivo '{device_id}': {error}")
@@ -266,92 +697,375 @@ def device_config():
     return render_template("device_config.html", device_info=device_info)
 
 
+@app.route('/rules/reload', methods=['POST'])
+def rules_reload():
+    """Recarrega configs/rules.json; em caso de erro, mantém as regras atuais."""
+    try:
+        count = reload_rules()
+    except (OSError, ValueError) as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    notify_workers('reload_rules')
+    return jsonify({"status": "ok", "rules": count})
+
+
+@app.route('/shards', methods=['GET', 'POST'])
+def shards_status():
+    """Filas de shard desta instância; POST {"instances": [...]} rebalanceia."""
+    if shards is None:
+        return jsonify({"status": "error", "error": "Sharding desativado (INGEST_SHARDS=0)."}), 404
+    if request.method == 'POST':
+        instances = (request.get_json(silent=True) or {}).get('instances')
+        if not isinstance(instances, list) or not instances:
+            return jsonify({"status": "error", "error": "Informe 'instances': lista de instâncias."}), 400
+        gained, lost, dropped = rebalance_shards(instances)
+        return jsonify(dict(shards.status(), gained=gained, lost=lost, dropped=len(dropped)))
+    return jsonify(shards.status())
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Métricas internas do gateway em JSON. Com workers de ingestão, registro e
+    histórico ficam nos workers: as métricas deles não aparecem aqui.
+    """
+    local = latest_table is None
+    return jsonify({
+        "devices": len(device_source()),
+        "silent_devices": len(silent_devices()) if local else None,
+        "grpc_channels": grpc_pool.stats(),
+        "commands": dispatcher.stats(),
+        "sse_clients": len(event_broker),
+        "sse_dropped": event_broker.dropped,
+        "sse_rejected": event_broker.rejected,
+        "history": history.stats() if local else None,
+        "rules": len(rule_table.rules),
+        "shards": None if shards is None else len(shards.queues()),
+        "workers": None if local else sum(process.is_alive() for process, _ in ingest_workers),
+    })
+
+
 @app.route('/')
 def home():
     print("[GATEWAY] Página inicial acessada.")
     return render_template("home.html")
 
+def apply_rule_decisions(decisions):
+    """Submete ao dispatcher os comandos decididos pela tabela de regras."""
+    for actuator_id, action, parameters in decisions:
+        actuator = disp.get(actuator_id)
+        if actuator:
+            submit_command(actuator, action, parameters, latest=True)
+
+
+def evaluate_device(device):
+    """
+    Avalia apenas as regras afetadas pela mudança de um dispositivo:
+      - sensor: a regra do próprio sensor;
+      - atuador: as regras dos sensores ligados a ele.
+    """
+    try:
+        apply_rule_decisions(rule_table.evaluate(rule_table.rows_for(device)))
+    except Exception as e:
+        print(f"[GATEWAY ERROR] Erro ao avaliar regras de '{device.get('id')}': {e}")
+
+
 def evaluate_sensor_values():
     """
+    Varredura de segurança: reavalia todos os sensores a cada RULES_SWEEP_DELAY
+    segundos. A avaliação normal acontece em custom_callback, a cada mensagem.
+    A primeira varredura é imediata, para agir sobre o estado restaurado do disco.
     """
     while True:
-        for device in disp:
-            # Controle do Ar-Condicionado (já existente)...
-            if device.get('subtype') == 'temperature' and 'temperature' in device and 'related_device' in device:
-                sensor_temp = device
-                related_id = sensor_temp['related_device']
-                ac = next((d for d in disp if d['id'] == related_id), None)
-                if ac:
-                    temp_value = float(sensor_temp['temperature'])
-                    if temp_value > HIGH_TEMP_THRESHOLD:
-                        desired_state = 'on'
-                        desired_temp = 22.0
-                    elif temp_value < LOW_TEMP_THRESHOLD:
-                        desired_state = 'off'
-                        desired_temp = 22.0
-                    else:
-                        desired_state = 'off'
-                        desired_temp = 22.0
-
-                    if (ac.get('state') != desired_state) or (desired_state == 'on' and float(ac.get('temperature', 22.0)) != desired_temp):
-                        success, error = send_grpc_command(ac, 'config', {'temperature': desired_temp})
-                        if success:
-                            ac['state'] = desired_state
-                            ac['temperature'] = desired_temp
-            if device.get('subtype') == 'luminosity' and 'luminosity' in device and 'related_device' in device:
-                sensor_lum = device
-                related_id = sensor_lum['related_device']
-                lamp = next((d for d in disp if d['id'] == related_id), None)
-                if lamp:
-                    lum_value = float(sensor_lum['luminosity'])
-                    if lum_value < LUMINOSITY_THRESHOLD_LOW:
-                        desired_state = 'on'
-                    elif lum_value > LUMINOSITY_THRESHOLD_HIGH:
-                        desired_state = 'off'
-                    else:
-                        desired_state = lamp.get('state', 'off')
-                    if desired_state != lamp.get('state'):
-                        success, error = send_grpc_command(lamp, desired_state)
-                        if success:
-                            lamp['state'] = desired_state
-            if device.get('subtype') == 'presence' and 'related_device' in device:
-                sensor_presence = device
-                related_id = sensor_presence['related_device']
-                # Se o sensor indicar "door", remapeia para "door_actuator"
-                door = next((d for d in disp if d['id'] == related_id), None)
-                if door:
-                    # Se o sensor estiver "on", a porta deve ficar open; se "off", closed.
-                    desired_state = 'open' if sensor_presence.get('state') == 'on' else 'closed'
-                    if door.get('state') != desired_state:
-                        success, error = send_grpc_command(door, desired_state)
-                        if success:
-                            door['state'] = desired_state
+        try:
+            apply_rule_decisions(rule_table.evaluate())
+        except Exception as e:
+            print(f"[GATEWAY ERROR] Erro na varredura de regras: {e}")
+        sleep(RULES_SWEEP_DELAY)
+
+
+_rules_lock = threading.Lock()
+
+def reload_rules():
+    """
+    Compila o arquivo de regras e troca a tabela de forma atômica, reavaliando
+    todos os sensores com as regras novas.
+    :raises ValueError: se o arquivo for inválido (as regras atuais são mantidas).
+    """
+    with _rules_lock:
+        rules = load_rules(RULES_FILE)
+        rule_table.load_rules(rules)
+    print(f"[GATEWAY] {len(rules)} regras carregadas de {RULES_FILE}.")
+    apply_rule_decisions(rule_table.evaluate())
+    return len(rules)
 
 
+def watch_rules_file():
+    """Recarrega as regras quando o arquivo é alterado (verificado a cada RULES_RELOAD_INTERVAL)."""
+    last_mtime = os.path.getmtime(RULES_FILE)
+    while True:
+        sleep(RULES_RELOAD_INTERVAL)
+        try:
+            mtime = os.path.getmtime(RULES_FILE)
+            if mtime == last_mtime:
+                continue
+            last_mtime = mtime
+            reload_rules()
+        except (OSError, ValueError) as e:
+            print(f"[GATEWAY ERROR] Regras não recarregadas, mantendo as atuais: {e}")
 
-        sleep(DEVICES_DELAY)
 
+_services_lock = threading.Lock()
+_services_started = False
 
-def main():
+# Snapshot + log de mudanças do registro em disco
+registry_store = RegistryStore() if REGISTRY_PERSISTENCE else None
+
+def restore_registry():
+    """Restaura o registro do disco e prepara canais e políticas dos atuadores restaurados."""
+    registry_store.restore(disp)
+    for device in disp:
+        if device.get('type') != 'sensor':
+            update_grpc_channel(device, True, {})
+            configure_command_policy(device)
+    registry_store.start(disp)
+
+def start_background_services():
+    """
+    Inicia a conexão RabbitMQ, os consumidores e a varredura de regras (ou,
+    com GATEWAY_WORKERS, os workers de ingestão que fazem isso).
+    Idempotente: os serviços são iniciados uma única vez por processo,
+    independentemente de quantas threads HTTP existam.
+    """
+    global _services_started, rabbitmq_connection
+    with _services_lock:
+        if _services_started:
+            return
+        _services_started = True
+
+        if GATEWAY_WORKERS and worker_index is None:
+            start_ingest_workers()
+            return
+
+        if registry_store is not None:
+            restore_registry()
+
+        rabbitmq_connection = RabbitMQConnection()
+        print("[GATEWAY] Inicializando consumidores RabbitMQ...")
+        start_rabbitmq_consumers()
+
+        print("[GATEWAY] Iniciando thread de varredura de segurança das regras...")
+        sensor_thread = threading.Thread(target=evaluate_sensor_values, daemon=True)
+        sensor_thread.start()
+
+        if RULES_RELOAD_INTERVAL:
+            threading.Thread(target=watch_rules_file, daemon=True).start()
+
+def stop_background_services():
+    stop_ingest_workers()
+    if registry_store is not None:
+        registry_store.close()
+    dispatcher.shutdown(wait=False)
+    grpc_pool.close_all()
+    if rabbitmq_connection is not None:
+        rabbitmq_connection.close()
+        print("[GATEWAY] Conexão RabbitMQ encerrada.")
+
+def worker_name(index):
+    return f"w{index}"
+
+def notify_workers(command, *args):
+    """Envia um comando aos workers de ingestão (nada acontece sem workers)."""
+    with ingest_workers_lock:
+        for _, control in ingest_workers:
+            control.put((command, args))
+
+def spawn_ingest_worker(index):
+    """Inicia o processo de ingestão de índice 'index'; retorna (processo, fila de comandos)."""
+    # 'spawn': o processo HTTP pode já ter threads, que não sobrevivem a um fork
+    context = multiprocessing.get_context('spawn')
+    control = context.Queue()
+    process = context.Process(target=run_ingest_worker,
+                              args=(index, latest_table.spec, control, command_replies),
+                              name=f"gateway-{worker_name(index)}", daemon=True)
+    process.start()
+    process.started_at = monotonic()
+    return process, control
+
+def restart_dead_workers():
+    """
+    Reinicia os workers de ingestão que morreram (no máximo um reinício por
+    worker a cada GATEWAY_WORKER_RESTART_DELAY segundos). O novo processo
+    assume a faixa do anterior na tabela (bind_writer repara um registro
+    deixado no meio de uma escrita) e os mesmos shards; comandos repassados
+    ao worker morto e ainda sem resposta falham.
+    """
+    with ingest_workers_lock:
+        for index, (process, _) in enumerate(ingest_workers):
+            if process.is_alive() or monotonic() - process.started_at < GATEWAY_WORKER_RESTART_DELAY:
+                continue
+            print(f"[GATEWAY ERROR] Worker {index} terminou (código {process.exitcode}); reiniciando.")
+            fail_forwarded_commands("Worker de ingestão reiniciado.", index)
+            ingest_workers[index] = spawn_ingest_worker(index)
+            # O conjunto de instâncias pode ter mudado desde o início
+            ingest_workers[index][1].put(('rebalance', (shards.status()["instances"],)))
+
+def start_ingest_workers():
+    """
+    Cria a tabela compartilhada e inicia GATEWAY_WORKERS processos de ingestão.
+    Este processo fica só com as rotas HTTP; as mudanças lidas da tabela
+    alimentam o stream de eventos (relay_table_events).
+    """
+    global latest_table, command_replies
+    latest_table = LatestValueTable.create(GATEWAY_WORKERS)
+    command_replies = multiprocessing.get_context('spawn').Queue()
+    threading.Thread(target=relay_command_replies, args=(command_replies,), daemon=True).start()
+    with ingest_workers_lock:
+        for index in range(GATEWAY_WORKERS):
+            ingest_workers.append(spawn_ingest_worker(index))
+    print(f"[GATEWAY] {GATEWAY_WORKERS} workers de ingestão iniciados "
+          f"(tabela compartilhada '{latest_table.epoch}').")
+    threading.Thread(target=relay_table_events, daemon=True).start()
+
+def stop_ingest_workers():
+    global latest_table, command_replies
+    with ingest_workers_lock:
+        workers = list(ingest_workers)
+        ingest_workers.clear()  # restart_dead_workers() não reinicia mais nenhum
+    for process, control in workers:
+        control.put(('stop', ()))
+    for process, _ in workers:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    if command_replies is not None:
+        command_replies.put(None)
+        command_replies = None
+    fail_forwarded_commands("Gateway encerrado.")
+    if latest_table is not None:
+        latest_table.close()
+        latest_table = None
+
+def relay_table_events():
+    """
+    As mudanças feitas pelos workers não passam pelo registro deste processo:
+    lê a tabela a cada GATEWAY_TABLE_POLL segundos e repassa as mudanças aos
+    navegadores (SSE). A cada leitura, reinicia os workers que morreram.
+    """
+    table = latest_table
+    version, devices = table.versioned_snapshot()
+    known = {device['id'] for device in devices}
+    while latest_table is table:
+        sleep(GATEWAY_TABLE_POLL)
+        restart_dead_workers()
+        changes = table.changes_since(version)
+        if changes is None:
+            # Remoções antigas já esquecidas: compara com a lista completa
+            version, devices = table.versioned_snapshot()
+            removed = known - {device['id'] for device in devices}
+        else:
+            version, devices, removed = changes
+        for device in devices:
+            known.add(device['id'])
+            publish_device_event(device['id'], device, version)
+        for device_id in removed:
+            known.discard(device_id)
+            publish_device_event(device_id, None, version)
+
+def run_ingest_worker(index, table_spec, control, replies):
+    """
+    Processo de ingestão (GATEWAY_WORKERS > 0): consome a parte dos shards
+    desta instância que cabe ao worker, mantém registro, histórico e regras
+    dos dispositivos dela e publica cada mudança na tabela compartilhada.
+    Atuador e sensores ligados a ele caem no mesmo shard, portanto no mesmo
+    worker. Recebe comandos do processo HTTP pela fila 'control', inclusive
+    os comandos para atuadores, cujos resultados voltam pela fila 'replies'.
+    """
+    global shards, registry_store, worker_index
+    worker_index = index
+    shards = ShardManager(worker=worker_name(index), workers=[worker_name(i) for i in range(GATEWAY_WORKERS)])
+    if registry_store is not None:
+        registry_store = RegistryStore(REGISTRY_DATA_DIR / worker_name(index))
+    table = LatestValueTable.attach(*table_spec)
+    table.bind_writer(index)
+    disp.add_listener(table.on_registry_change)
+    start_background_services()
+    commands = {
+        'rebalance': rebalance_shards,
+        'reload_rules': reload_rules,
+        'update_fields': lambda device_id, fields: disp.update_fields(device_id, **fields),
+        'command': lambda *args: run_forwarded_command(replies, *args),
+    }
+    while True:
+        command, args = control.get()
+        if command == 'stop':
+            break
+        try:
+            commands[command](*args)
+        except Exception as e:
+            print(f"[GATEWAY ERROR] Worker {index}: erro no comando '{command}': {e}")
+    stop_background_services()
+    table.close()
+
+def serve_production(args):
+    """Servidor WSGI multi-thread (waitress) com keep-alive e timeouts configuráveis."""
+    from waitress import serve
+
+    # Clientes SSE ocupam uma thread cada: o limite acompanha --threads
+    event_broker.max_subscribers = max(0, args.threads - SSE_RESERVED_THREADS)
+    print(f"[GATEWAY] Iniciando servidor de produção (waitress) em {args.host}:{args.port} "
+          f"com {args.threads} threads...")
+    serve(
+        app,
+        host=args.host,
+        port=args.port,
+        threads=args.threads,
+        connection_limit=args.connection_limit,
+        channel_timeout=args.channel_timeout,  # fecha conexões keep-alive ociosas
+        backlog=args.backlog,
+        ident="smart-room-gateway",
+    )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gateway da sala inteligente")
+    parser.add_argument('--mode', choices=['dev', 'prod'], default=GATEWAY_MODE,
+                        help="dev: servidor Flask com debug; prod: servidor WSGI multi-thread")
+    parser.add_argument('--host', type=str, default=GATEWAY_HOST, help='Endereço HTTP')
+    parser.add_argument('--port', type=int, default=GATEWAY_PORT, help='Porta HTTP')
+    parser.add_argument('--threads', type=int, default=GATEWAY_THREADS,
+                        help='Threads que atendem requisições HTTP (prod)')
+    parser.add_argument('--connection_limit', type=int, default=GATEWAY_CONNECTION_LIMIT,
+                        help='Conexões HTTP simultâneas (prod)')
+    parser.add_argument('--channel_timeout', type=int, default=GATEWAY_CHANNEL_TIMEOUT,
+                        help='Segundos de inatividade antes de fechar uma conexão (prod)')
+    parser.add_argument('--backlog', type=int, default=GATEWAY_BACKLOG, help='Backlog do socket (prod)')
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """
     Função principal do gateway:
       - Inicializa os consumidores RabbitMQ.
       - Inicia a thread de avaliação dos sensores.
-      - Inicia o servidor Flask.
+      - Inicia o servidor HTTP (Flask em dev, waitress em prod).
     """
-    print("[GATEWAY] Inicializando consumidores RabbitMQ...")
-    start_rabbitmq_consumers()
+    args = parse_args(argv)
+    if GATEWAY_WORKERS and not INGEST_SHARDS:
+        raise SystemExit("[GATEWAY ERROR] GATEWAY_WORKERS exige INGEST_SHARDS > 0: "
+                         "os workers dividem entre si as filas de shard.")
 
-    print("[GATEWAY] Iniciando thread de avaliação de sensores...")
-    sensor_thread = threading.Thread(target=evaluate_sensor_values, daemon=True)
-    sensor_thread.start()
+    # Com o reloader do Flask, o processo pai apenas monitora arquivos:
+    # os serviços rodam somente no processo filho que atende as requisições.
+    reloader_parent = args.mode == 'dev' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+    if not reloader_parent:
+        start_background_services()
 
     try:
-        print("[GATEWAY] Iniciando servidor Flask na porta 8080...")
-        app.run(debug=True, host='0.0.0.0', port=8080)
+        if args.mode == 'prod':
+            serve_production(args)
+        else:
+            print(f"[GATEWAY] Iniciando servidor Flask (dev) na porta {args.port}...")
+            app.run(debug=True, host=args.host, port=args.port)
     finally:
-        rabbitmq_connection.close()
-        print("[GATEWAY] Conexão RabbitMQ encerrada.")
+        stop_background_services()
 
 if __name__ == "__main__":
     main()
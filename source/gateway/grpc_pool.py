@@ -0,0 +1,135 @@
+import grpc
+import threading
+import time
+
+from configs.envs import GRPC_CHANNEL_IDLE_TIMEOUT, GRPC_KEEPALIVE_TIME_MS, GRPC_KEEPALIVE_TIMEOUT_MS
+from source.devices.actuators.proto import actuators_pb2_grpc
+
+# Opções de keepalive aplicadas a todos os canais do pool
+KEEPALIVE_OPTIONS = [
+    ('grpc.keepalive_time_ms', GRPC_KEEPALIVE_TIME_MS),
+    ('grpc.keepalive_timeout_ms', GRPC_KEEPALIVE_TIMEOUT_MS),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+]
+
+
+class GrpcChannelPool:
+    """
+    Cache de canais gRPC e stubs do ActuatorService, indexado por 'host:port'.
+
+    Canais são abertos antecipadamente via bind(), reaproveitados
+    entre comandos e despejados após GRPC_CHANNEL_IDLE_TIMEOUT segundos sem
+    uso. Vários dispositivos podem compartilhar um endereço: bind() conta os
+    dispositivos de cada endereço, e o canal só é fechado quando o último
+    deles muda de endpoint ou é removido (release()).
+    """
+
+    def __init__(self, idle_timeout=GRPC_CHANNEL_IDLE_TIMEOUT, options=None):
+        self._idle_timeout = idle_timeout
+        self._options = options if options is not None else KEEPALIVE_OPTIONS
+        self._lock = threading.Lock()
+        self._entries = {}  # target -> [channel, stub, last_used]
+        self._users = {}  # target -> ids dos dispositivos associados ao endereço
+        self._device_targets = {}  # id do dispositivo -> target
+        self._last_sweep = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def target(host, port):
+        return f"{host}:{port}"
+
+    def _open(self, target):
+        channel = grpc.insecure_channel(target, options=self._options)
+        # Inicia a conexão TCP/HTTP2 em segundo plano, sem bloquear
+        grpc.channel_ready_future(channel)
+        entry = [channel, actuators_pb2_grpc.ActuatorServiceStub(channel), time.monotonic()]
+        self._entries[target] = entry
+        return entry
+
+    def get_stub(self, host, port):
+        """Retorna o stub em cache para o endereço, abrindo o canal se necessário."""
+        target = self.target(host, port)
+        with self._lock:
+            self._evict_idle_locked()
+            entry = self._entries.get(target)
+            if entry is None:
+                self.misses += 1
+                entry = self._open(target)
+                print(f"[GATEWAY] Canal gRPC aberto para {target}.")
+            else:
+                self.hits += 1
+            entry[2] = time.monotonic()
+            return entry[1]
+
+    def bind(self, device_id, host, port):
+        """
+        Associa o dispositivo ao endereço e pré-aquece o canal. Se ele estava
+        em outro endereço, libera o anterior (fechado se ficou sem dispositivos).
+        """
+        target = self.target(host, port)
+        with self._lock:
+            previous = self._device_targets.get(device_id)
+            if previous == target:
+                return
+            self._device_targets[device_id] = target
+            self._users.setdefault(target, set()).add(device_id)
+            if target not in self._entries:
+                self._open(target)
+                print(f"[GATEWAY] Canal gRPC pré-aquecido para {target}.")
+            channel = self._release_locked(device_id, previous)
+        self._close_channel(previous, channel)
+
+    def release(self, device_id):
+        """Desassocia o dispositivo (ex.: removido do registro)."""
+        with self._lock:
+            target = self._device_targets.pop(device_id, None)
+            channel = self._release_locked(device_id, target)
+        self._close_channel(target, channel)
+
+    def _release_locked(self, device_id, target):
+        """Retira o dispositivo do endereço; devolve o canal a fechar se ninguém mais o usa."""
+        users = self._users.get(target)
+        if users is None:
+            return None
+        users.discard(device_id)
+        if users:
+            return None
+        del self._users[target]
+        entry = self._entries.pop(target, None)
+        return None if entry is None else entry[0]
+
+    @staticmethod
+    def _close_channel(target, channel):
+        if channel is not None:
+            channel.close()
+            print(f"[GATEWAY] Canal gRPC para {target} fechado (sem dispositivos).")
+
+    def _evict_idle_locked(self):
+        now = time.monotonic()
+        if now - self._last_sweep < self._idle_timeout / 2:
+            return
+        self._last_sweep = now
+        for target, entry in list(self._entries.items()):
+            if now - entry[2] > self._idle_timeout:
+                del self._entries[target]
+                entry[0].close()
+                self.evictions += 1
+                print(f"[GATEWAY] Canal gRPC ocioso para {target} despejado.")
+
+    def close_all(self):
+        with self._lock:
+            entries, self._entries = self._entries, {}
+        for channel, _, _ in entries.values():
+            channel.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open_channels": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,197 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from configs.envs import HISTORY_CAPACITY, HISTORY_MAX_POINTS, HISTORY_RETENTION, SENSOR_SILENCE_TIMEOUT
+
+# Campo numérico registrado para cada subtipo de sensor
+HISTORY_FIELDS = {
+    'temperature': 'temperature',
+    'luminosity': 'luminosity',
+    'presence': 'state',
+}
+
+
+def sensor_value(device):
+    """Extrai o valor numérico de uma leitura de sensor (None se não houver)."""
+    field = HISTORY_FIELDS.get(device.get('subtype'))
+    if field is None or device.get(field) is None:
+        return None
+    value = device[field]
+    if field == 'state':
+        return 1.0 if value == 'on' else 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SensorHistory:
+    """
+    Buffer circular de leituras (timestamp, valor) com capacidade fixa.
+
+    Os dados ficam em dois arrays compactos pré-alocados: timestamps em
+    segundos (uint32) e valores em float32, ou seja, 8 bytes por leitura.
+    """
+    __slots__ = ('_timestamps', '_values', '_capacity', '_head', '_count')
+
+    def __init__(self, capacity=HISTORY_CAPACITY):
+        self._capacity = capacity
+        self._timestamps = array('I', bytes(4 * capacity))
+        self._values = array('f', bytes(4 * capacity))
+        self._head = 0  # próxima posição de escrita
+        self._count = 0
+
+    def append(self, timestamp, value):
+        self._timestamps[self._head] = int(timestamp)
+        self._values[self._head] = value
+        self._head = (self._head + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def _position(self, index):
+        """Converte um índice cronológico (0 = mais antigo) em posição no array."""
+        return (self._head - self._count + index) % self._capacity
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        # Permite bisect sobre os timestamps em ordem cronológica
+        return self._timestamps[self._position(index)]
+
+    def before(self, start):
+        """Última leitura com timestamp < start, ou None."""
+        index = bisect_left(self, start) - 1
+        if index < 0:
+            return None
+        position = self._position(index)
+        return self._timestamps[position], self._values[position]
+
+    def range(self, start, end):
+        """Leituras com start <= timestamp <= end, em ordem cronológica."""
+        first = bisect_left(self, start)
+        last = bisect_right(self, end)
+        return [(self._timestamps[self._position(i)], self._values[self._position(i)])
+                for i in range(first, last)]
+
+    @property
+    def nbytes(self):
+        return self._timestamps.itemsize * self._capacity + self._values.itemsize * self._capacity
+
+
+def downsample(points, start, step, end=None, previous=None, hold=0):
+    """
+    Agrupa as leituras em janelas de 'step' segundos: [início, média, mínimo, máximo].
+
+    Sensores publicam por exceção, então janela sem leitura significa valor
+    inalterado: com 'hold' > 0, as janelas vazias até 'end' repetem o último
+    valor conhecido ('previous' é a leitura anterior a 'start') por até
+    'hold' segundos depois dessa leitura. Além disso, o sensor está
+    silencioso e a janela fica vazia.
+    """
+    buckets = []
+    current = None
+    for timestamp, value in points:
+        bucket = start + ((timestamp - start) // step) * step
+        if current is None or current[0] != bucket:
+            current = [bucket, 0.0, value, value, 0, timestamp, value]
+            buckets.append(current)
+        current[1] += value
+        current[2] = min(current[2], value)
+        current[3] = max(current[3], value)
+        current[4] += 1
+        current[5], current[6] = timestamp, value
+    if hold <= 0 or end is None:
+        return [[bucket, round(total / count, 3), low, high] for bucket, total, low, high, count, _, _ in buckets]
+
+    result = []
+    last = previous  # (timestamp, valor) da leitura mais recente antes da janela
+    index = 0
+    for bucket in range(start, int(end) + 1, step):
+        if index < len(buckets) and buckets[index][0] == bucket:
+            _, total, low, high, count, last_timestamp, last_value = buckets[index]
+            result.append([bucket, round(total / count, 3), low, high])
+            last = (last_timestamp, last_value)
+            index += 1
+        elif last is not None and bucket - last[0] <= hold:
+            result.append([bucket, round(last[1], 3), last[1], last[1]])
+    return result
+
+
+class HistoryStore:
+    """Histórico em memória por sensor, com memória limitada e previsível."""
+
+    def __init__(self, capacity=HISTORY_CAPACITY, retention=HISTORY_RETENTION, hold=SENSOR_SILENCE_TIMEOUT):
+        """
+        :param hold: segundos em que a última leitura continua valendo nas
+                     janelas sem leitura (ver downsample)
+        """
+        self._capacity = capacity
+        self._retention = retention
+        self._hold = hold
+        self._lock = threading.Lock()
+        self._series = {}  # device_id -> SensorHistory
+
+    def record(self, device):
+        """Registra a leitura atual de um sensor, se ela tiver valor numérico."""
+        value = sensor_value(device)
+        if value is None:
+            return
+        with self._lock:
+            series = self._series.get(device['id'])
+            if series is None:
+                series = self._series[device['id']] = SensorHistory(self._capacity)
+            series.append(time.time(), value)
+
+    def record_many(self, devices):
+        """Registra as leituras de vários sensores (ex.: um micro-lote) com um único lock."""
+        readings = []
+        for device in devices:
+            value = sensor_value(device)
+            if value is not None:
+                readings.append((device['id'], value))
+        if not readings:
+            return
+        now = time.time()
+        with self._lock:
+            for device_id, value in readings:
+                series = self._series.get(device_id)
+                if series is None:
+                    series = self._series[device_id] = SensorHistory(self._capacity)
+                series.append(now, value)
+
+    def query(self, device_id, start=None, end=None, step=None):
+        """
+        Leituras de um sensor entre 'start' e 'end' (epoch em segundos).
+
+        Sem 'step', devolve pares [timestamp, valor]; se houver mais de
+        HISTORY_MAX_POINTS leituras, o passo é escolhido automaticamente.
+        Com 'step', devolve janelas [início, média, mínimo, máximo], e as
+        janelas sem leitura repetem o último valor (silêncio = inalterado).
+        :return: dicionário serializável, ou None se o sensor não tiver histórico.
+        """
+        end = time.time() if end is None else end
+        oldest = end - self._retention
+        start = oldest if start is None else max(start, oldest)
+        with self._lock:
+            series = self._series.get(device_id)
+            if series is None:
+                return None
+            points = series.range(start, end)
+            previous = series.before(start)
+        if step is None and len(points) > HISTORY_MAX_POINTS:
+            step = max(1, int((end - start) / HISTORY_MAX_POINTS) + 1)
+        if step:
+            data = downsample(points, int(start), int(step), end, previous, self._hold)
+        else:
+            data = [[timestamp, round(value, 3)] for timestamp, value in points]
+        return {"id": device_id, "from": start, "to": end, "step": step, "points": data}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "series": len(self._series),
+                "bytes": sum(series.nbytes for series in self._series.values()),
+            }
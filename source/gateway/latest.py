@@ -0,0 +1,284 @@
+import time
+from collections import OrderedDict
+from json import dumps, loads
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from configs.envs import GATEWAY_TABLE_READ_RETRIES, GATEWAY_WORKER_SLOTS
+
+# Estado de um slot
+FREE, USED, REMOVED = 0, 1, 2
+
+# Registro de largura fixa (512 bytes): o dispositivo vai serializado em JSON
+# no campo 'data'; 'seq' é o seqlock do registro (ímpar durante a escrita)
+RECORD_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('version', '<u8'),  # contador do worker dono do slot na última escrita
+    ('updated', '<f8'),  # time.time() da última escrita
+    ('status', 'u1'),
+    ('id', 'S63'),
+    ('data', 'S424'),
+], align=True)
+ID_SIZE = RECORD_DTYPE['id'].itemsize
+DATA_SIZE = RECORD_DTYPE['data'].itemsize
+
+
+def _header_size(workers):
+    # [versão, piso] por worker, alinhado a 64 bytes
+    return (workers * 16 + 63) // 64 * 64
+
+
+class LatestValueTable:
+    """
+    Último estado de cada dispositivo em memória compartilhada
+    (multiprocessing.shared_memory), escrito pelos workers de ingestão do
+    gateway e lido pelas rotas HTTP do processo pai sem locks nem IPC.
+
+    Cada worker tem uma faixa própria de 'slots' registros e é o único
+    escritor dela. A escrita de um registro segue um seqlock: 'seq' fica
+    ímpar durante a escrita e volta a par ao final; o leitor copia o registro
+    e repete a cópia se 'seq' estava ímpar ou mudou no meio, até 'read_retries'
+    vezes (um worker que morre no meio de uma escrita deixa 'seq' ímpar até
+    ser reiniciado; bind_writer() repara o registro). Isso depende de
+    as escritas serem vistas na ordem em que são feitas (garantido em x86;
+    em arquiteturas com ordenação mais fraca o seqlock precisaria de barreiras).
+
+    Cada worker mantém no cabeçalho um contador de versão (incrementado a cada
+    escrita) e um piso: a maior versão de remoção cujo slot já foi
+    reaproveitado. A versão da tabela é o vetor dos contadores ('3.10.7');
+    changes_since() devolve os registros com versão maior que a do vetor
+    informado no worker dono de cada slot, ou None se o vetor for de outra
+    configuração, do futuro, ou anterior a um piso (remoções já esquecidas).
+    """
+
+    def __init__(self, shm, workers, slots, owner=False, read_retries=GATEWAY_TABLE_READ_RETRIES):
+        self._shm = shm
+        self._read_retries = read_retries
+        self._last_good = {}  # slot -> última cópia consistente lida por _read()
+        self._owner = owner
+        self.workers = workers
+        self.slots = slots
+        # Identifica a tabela: versões de tabelas diferentes não são comparáveis
+        self.epoch = shm.name
+        header = _header_size(workers)
+        self._counters = np.ndarray((workers, 2), dtype='<u8', buffer=shm.buf)
+        self._records = np.ndarray((workers * slots,), dtype=RECORD_DTYPE, buffer=shm.buf, offset=header)
+        self._seq = self._records['seq']
+        self._worker_of = np.arange(workers * slots) // slots  # worker dono de cada slot
+        # Estado do escritor (bind_writer)
+        self._worker = None
+        self._version = 0
+        self._slot_of = {}  # id -> slot em uso
+        self._removed = OrderedDict()  # id -> slot com a remoção, do mais antigo ao mais recente
+        self._free = []
+
+    @classmethod
+    def create(cls, workers, slots=GATEWAY_WORKER_SLOTS):
+        """Cria a tabela (processo pai, que a remove em close())."""
+        size = _header_size(workers) + workers * slots * RECORD_DTYPE.itemsize
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        return cls(shm, workers, slots, owner=True)
+
+    @classmethod
+    def attach(cls, name, workers, slots):
+        """Abre uma tabela existente (workers); os argumentos vêm de 'spec'."""
+        return cls(shared_memory.SharedMemory(name=name), workers, slots)
+
+    @property
+    def spec(self):
+        """(name, workers, slots): argumentos de attach() em outro processo."""
+        return self._shm.name, self.workers, self.slots
+
+    # Escrita (um processo por worker)
+    def bind_writer(self, worker):
+        """
+        Torna este processo o escritor da faixa do worker informado. Registros
+        deixados por um processo anterior com o mesmo índice são marcados como
+        removidos, e a versão continua de onde ele parou. Um registro que ele
+        deixou no meio de uma escrita ('seq' ímpar) volta a ser legível.
+        """
+        self._worker = worker
+        self._version = int(self._counters[worker, 0])
+        self._slot_of = {}
+        self._removed = OrderedDict()
+        start = worker * self.slots
+        self._free = []
+        for slot in range(start + self.slots - 1, start - 1, -1):
+            status = self._records['status'][slot]
+            # Escrita interrompida: o registro pode estar pela metade e é reescrito
+            interrupted = bool(self._seq[slot] & 1)
+            if status == FREE:
+                if interrupted:
+                    self._store(slot, FREE, b"", b"")
+                self._free.append(slot)
+                continue
+            device_id = self._records['id'][slot].decode(errors='replace')
+            if status == USED or interrupted:
+                self._store(slot, REMOVED, device_id.encode(), b"")
+            self._removed[device_id] = slot
+
+    def on_registry_change(self, device_id, device, version):
+        """Listener do DeviceRegistry: publica cada mudança na tabela."""
+        if device is None:
+            self.remove(device_id)
+        else:
+            self.put(device)
+
+    def put(self, device):
+        """
+        Publica o estado do dispositivo.
+        :return: False se ele não couber no registro ou a faixa estiver cheia.
+        """
+        device_id = device['id']
+        key = device_id.encode()
+        data = dumps(device, separators=(',', ':')).encode()
+        if len(key) > ID_SIZE or len(data) > DATA_SIZE:
+            print(f"[GATEWAY ERROR] Dispositivo '{device_id}' não cabe na tabela compartilhada "
+                  f"({len(data)} bytes, máximo {DATA_SIZE}).")
+            return False
+        slot = self._slot_of.get(device_id)
+        if slot is None:
+            slot = self._allocate(device_id)
+            if slot is None:
+                print(f"[GATEWAY ERROR] Tabela compartilhada cheia no worker {self._worker} "
+                      f"({self.slots} slots): '{device_id}' não publicado.")
+                return False
+            self._slot_of[device_id] = slot
+        self._store(slot, USED, key, data)
+        return True
+
+    def remove(self, device_id):
+        slot = self._slot_of.pop(device_id, None)
+        if slot is None:
+            return
+        self._store(slot, REMOVED, device_id.encode(), b"")
+        self._removed[device_id] = slot
+
+    def _allocate(self, device_id):
+        # Um dispositivo que volta reaproveita o próprio slot de remoção
+        slot = self._removed.pop(device_id, None)
+        if slot is not None:
+            return slot
+        if self._free:
+            return self._free.pop()
+        if not self._removed:
+            return None
+        # Reaproveita a remoção mais antiga: leitores com versão anterior a ela
+        # precisam da lista completa (piso), pois a remoção deixa de existir
+        _, slot = self._removed.popitem(last=False)
+        self._counters[self._worker, 1] = self._records['version'][slot]
+        return slot
+
+    def _store(self, slot, status, key, data):
+        self._version += 1
+        # Ímpar: escrita em andamento (já é, se a anterior foi interrompida)
+        seq = int(self._seq[slot]) | 1
+        self._seq[slot] = seq
+        self._records[slot] = (seq, self._version, time.time(), status, key, data)
+        self._seq[slot] = seq + 1
+        self._counters[self._worker, 0] = self._version
+
+    # Leitura (qualquer processo, sem locks)
+    def _read(self, slot):
+        """
+        Cópia consistente de um registro. Se o escritor não concluir a escrita
+        em 'read_retries' tentativas (worker morto no meio dela), devolve a
+        última cópia consistente lida, ou um registro livre.
+        """
+        for _ in range(self._read_retries):
+            before = self._seq[slot]
+            if not before & 1:
+                record = self._records[slot:slot + 1].copy()[0]
+                if self._seq[slot] == before:
+                    self._last_good[slot] = record
+                    return record
+            time.sleep(0)  # cede a CPU ao escritor
+        print(f"[GATEWAY ERROR] Registro {slot} da tabela compartilhada em escrita há "
+              f"{self._read_retries} leituras; usando a última cópia consistente.")
+        record = self._last_good.get(slot)
+        return record if record is not None else np.zeros(1, dtype=RECORD_DTYPE)[0]
+
+    def _copy(self):
+        """Cópia consistente de todos os registros: cópia em bloco e releitura só dos inconsistentes."""
+        before = self._seq.copy()
+        records = self._records.copy()
+        retry = np.flatnonzero((before != self._seq) | (before & 1).astype(bool))
+        for slot in retry:
+            records[slot] = self._read(slot)
+        return records
+
+    @property
+    def version(self):
+        return ".".join(str(int(counter)) for counter in self._counters[:, 0])
+
+    def _latest(self, device_id):
+        """(slot, registro) da escrita mais recente do dispositivo, ou (None, None)."""
+        key = device_id.encode()
+        latest_slot = latest = None
+        for slot in np.flatnonzero(self._records['id'] == key):
+            record = self._read(slot)
+            # Durante uma transferência entre workers o dispositivo pode estar em
+            # duas faixas: vale a escrita mais recente
+            if record['status'] == USED and record['id'] == key and (
+                    latest is None or record['updated'] > latest['updated']):
+                latest_slot, latest = slot, record
+        return latest_slot, latest
+
+    def get(self, device_id):
+        """Estado mais recente do dispositivo (cópia), ou None."""
+        _, latest = self._latest(device_id)
+        return None if latest is None else loads(latest['data'])
+
+    def owner(self, device_id):
+        """Índice do worker que publicou o estado mais recente do dispositivo, ou None."""
+        slot, _ = self._latest(device_id)
+        return None if slot is None else int(self._worker_of[slot])
+
+    def versioned_snapshot(self):
+        """(versão, lista de dispositivos), como DeviceRegistry.versioned_snapshot()."""
+        version = self.version
+        return version, self._devices(self._copy())
+
+    def _devices(self, records):
+        records = records[records['status'] == USED]
+        latest = {}
+        for record in records[np.argsort(records['updated'], kind='stable')]:
+            latest[record['id']] = record['data']
+        return [loads(data) for data in latest.values()]
+
+    def changes_since(self, since):
+        """
+        :param since: versão ('3.10.7') devolvida por uma leitura anterior.
+        :return: (versão atual, dispositivos alterados, ids removidos), ou None
+                 se 'since' não for comparável (use versioned_snapshot()).
+        """
+        counters = self._counters.copy()
+        try:
+            since = np.array([int(part) for part in str(since).split(".")], dtype='<u8')
+        except ValueError:
+            return None
+        if len(since) != self.workers or (since > counters[:, 0]).any() or (since < counters[:, 1]).any():
+            return None
+        version = ".".join(str(int(counter)) for counter in counters[:, 0])
+        records = self._copy()
+        if (since < self._counters[:, 1]).any():
+            # Uma remoção foi esquecida durante a cópia
+            return None
+        live = {record_id for record_id in records['id'][records['status'] == USED]}
+        changed = records[records['version'] > since[self._worker_of]]
+        devices = self._devices(changed)
+        removed = [record_id.decode() for record_id in changed['id'][changed['status'] == REMOVED]
+                   if record_id not in live]
+        return version, devices, removed
+
+    def __len__(self):
+        return len(np.unique(self._records['id'][self._records['status'] == USED]))
+
+    def close(self):
+        # As views NumPy precisam ser liberadas antes de fechar o segmento
+        self._counters = self._records = self._seq = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
@@ -0,0 +1,191 @@
+import mmap
+import os
+import queue
+import threading
+import time
+from json import JSONDecodeError, dumps, loads
+
+from configs.envs import (REGISTRY_DATA_DIR, REGISTRY_FLUSH_INTERVAL, REGISTRY_LOG_COMPACT_ENTRIES,
+                          REGISTRY_LOG_MAX_BYTES)
+
+SNAPSHOT_FILE = "registry.snapshot"
+LOG_FILE = "registry.log"
+_MISSING = object()
+
+
+def _read_mapped(path):
+    """Abre o arquivo com mmap (somente leitura); retorna None se estiver vazio ou não existir."""
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+
+class RegistryStore:
+    """
+    Persistência do registro de dispositivos em disco.
+
+    - registry.snapshot: estado completo em JSON, regravado na compactação;
+    - registry.log: uma linha JSON por mudança, apenas acrescentada. Um
+      dispositivo novo vai completo; nas atualizações, só os campos alterados.
+
+    As mudanças chegam por um listener do registro e são gravadas por uma
+    thread própria, que também compacta o log (novo snapshot + log vazio)
+    após REGISTRY_LOG_COMPACT_ENTRIES entradas ou REGISTRY_LOG_MAX_BYTES
+    bytes. O log recebe fsync a cada 'flush_interval' segundos: uma queda
+    perde no máximo as mudanças desse intervalo.
+    """
+
+    def __init__(self, directory=REGISTRY_DATA_DIR, compact_entries=REGISTRY_LOG_COMPACT_ENTRIES,
+                 flush_interval=REGISTRY_FLUSH_INTERVAL, max_log_bytes=REGISTRY_LOG_MAX_BYTES):
+        self._directory = str(directory)
+        self._snapshot_path = os.path.join(self._directory, SNAPSHOT_FILE)
+        self._log_path = os.path.join(self._directory, LOG_FILE)
+        self._compact_entries = compact_entries
+        self._flush_interval = flush_interval
+        self._max_log_bytes = max_log_bytes
+        self._queue = queue.Queue()
+        self._registry = None
+        self._log = None
+        self._log_entries = 0
+        self._log_bytes = 0
+        self._synced = True  # log sem escritas pendentes de fsync
+        self._last_sync = time.monotonic()
+        self._base_version = 0  # versão do último snapshot
+        self._written = {}  # id -> estado gravado (snapshot + log), base dos campos alterados
+        self._thread = None
+
+    # Restauração
+    def restore(self, registry):
+        """
+        Carrega snapshot + log no registro informado.
+        :return: quantidade de dispositivos restaurados.
+        """
+        start = time.monotonic()
+        devices = {}
+        snapshot_version = 0
+        mapped = _read_mapped(self._snapshot_path)
+        if mapped is not None:
+            with mapped:
+                snapshot = loads(mapped[:])
+            snapshot_version = snapshot.get("version", 0)
+            devices = {device['id']: device for device in snapshot.get("devices", [])}
+
+        mapped = _read_mapped(self._log_path)
+        if mapped is not None:
+            with mapped:
+                for line in iter(mapped.readline, b""):
+                    try:
+                        entry = loads(line)
+                    except JSONDecodeError:
+                        # Última linha incompleta (queda durante a escrita)
+                        continue
+                    if entry["version"] <= snapshot_version:
+                        continue
+                    if entry["op"] == "del":
+                        devices.pop(entry["id"], None)
+                    elif entry["op"] == "set":
+                        devices.setdefault(entry["id"], {"id": entry["id"]}).update(entry["fields"])
+                    else:
+                        devices[entry["id"]] = entry["device"]
+
+        for device in devices.values():
+            registry.upsert(device)
+        print(f"[GATEWAY] {len(devices)} dispositivos restaurados do disco "
+              f"em {(time.monotonic() - start) * 1000:.1f} ms.")
+        return len(devices)
+
+    # Gravação
+    def start(self, registry):
+        """Passa a registrar as mudanças do registro e inicia a thread de gravação."""
+        os.makedirs(self._directory, exist_ok=True)
+        self._registry = registry
+        self._log = open(self._log_path, 'ab')
+        registry.add_listener(self._on_change)
+        # As versões recomeçam a cada execução: um snapshot novo serve de base para o log
+        self.compact()
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def _on_change(self, device_id, device, version):
+        # Chamado com o lock do registro: apenas enfileira
+        self._queue.put((device_id, device, version))
+
+    def _writer(self):
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self._flush_interval))
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                if batch:
+                    self._append(batch)
+                if self._log_entries >= self._compact_entries or self._log_bytes >= self._max_log_bytes:
+                    self.compact()
+                elif not self._synced and time.monotonic() - self._last_sync >= self._flush_interval:
+                    self._sync()
+            except Exception as e:
+                print(f"[GATEWAY ERROR] Erro ao gravar o registro em disco: {e}")
+
+    def _append(self, batch):
+        lines = []
+        for device_id, device, version in batch:
+            if version <= self._base_version:
+                continue  # já está no snapshot
+            if device is None:
+                self._written.pop(device_id, None)
+                entry = {"op": "del", "id": device_id, "version": version}
+            else:
+                previous = self._written.get(device_id)
+                self._written[device_id] = device
+                if previous is None:
+                    entry = {"op": "put", "id": device_id, "version": version, "device": device}
+                else:
+                    # O registro só mescla campos: basta gravar os que mudaram
+                    fields = {key: value for key, value in device.items() if previous.get(key, _MISSING) != value}
+                    if not fields:
+                        continue
+                    entry = {"op": "set", "id": device_id, "version": version, "fields": fields}
+            lines.append(dumps(entry))
+        if not lines:
+            return
+        data = ("\n".join(lines) + "\n").encode()
+        self._log.write(data)
+        self._log.flush()
+        self._synced = False
+        self._log_entries += len(lines)
+        self._log_bytes += len(data)
+
+    def _sync(self):
+        os.fsync(self._log.fileno())
+        self._synced = True
+        self._last_sync = time.monotonic()
+
+    def compact(self):
+        """Grava um novo snapshot e esvazia o log (executado na thread de gravação)."""
+        version, devices = self._registry.versioned_snapshot()
+        temp_path = self._snapshot_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(dumps({"version": version, "devices": devices}).encode())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._snapshot_path)
+        # Entradas ainda na fila com versão <= 'version' já estão no snapshot
+        self._base_version = version
+        self._written = {device['id']: device for device in devices}
+        self._log.truncate(0)
+        self._sync()
+        self._log_entries = 0
+        self._log_bytes = 0
+        print(f"[GATEWAY] Log do registro compactado ({len(devices)} dispositivos, versão {version}).")
+
+    def close(self):
+        if self._log is not None:
+            self._log.flush()
+            os.fsync(self._log.fileno())
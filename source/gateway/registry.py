@@ -0,0 +1,247 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+from configs.envs import REGISTRY_MAX_TOMBSTONES
+
+
+class DeviceRegistry:
+    """
+    Registro de dispositivos do gateway, seguro para uso concorrente.
+
+    Mantém um índice primário por 'id' e índices secundários por 'subtype'
+    e por 'related_device' (índice reverso: atuador -> sensores que apontam
+    para ele). Todas as operações são O(1) ou proporcionais ao resultado.
+
+    Cada alteração incrementa um contador de versão monotônico; changes_since()
+    devolve apenas os dispositivos alterados ou removidos após uma versão.
+    Só as 'max_tombstones' remoções mais recentes são lembradas: para versões
+    anteriores à mais antiga esquecida, changes_since() devolve None e o
+    cliente precisa da lista completa.
+    """
+
+    def __init__(self, devices=None, max_tombstones=REGISTRY_MAX_TOMBSTONES):
+        self._lock = threading.RLock()
+        self._devices = {}
+        # Identifica esta instância: versões de instâncias diferentes não são comparáveis
+        self.epoch = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._changed_at = OrderedDict()  # id -> versão, da mais antiga para a mais recente
+        self._removed_at = OrderedDict()  # tombstones: id -> versão da remoção
+        self._max_tombstones = max_tombstones
+        self._tombstone_floor = 0  # versão da remoção mais recente já esquecida
+        self._by_subtype = defaultdict(set)
+        self._by_related = defaultdict(set)
+        self._listeners = []
+        self._last_seen = {}  # id -> time.monotonic() da última mensagem (status ou heartbeat)
+        for device in devices or []:
+            self.upsert(device)
+
+    # Índices secundários
+    def _index(self, device):
+        device_id = device['id']
+        if device.get('subtype'):
+            self._by_subtype[device['subtype']].add(device_id)
+        if device.get('related_device'):
+            self._by_related[device['related_device']].add(device_id)
+
+    def _unindex(self, device):
+        device_id = device['id']
+        for index, key in ((self._by_subtype, device.get('subtype')),
+                           (self._by_related, device.get('related_device'))):
+            if key and key in index:
+                index[key].discard(device_id)
+                if not index[key]:
+                    del index[key]
+
+    def _touch(self, device_id, removed=False):
+        self._version += 1
+        changed, other = (self._removed_at, self._changed_at) if removed else (self._changed_at, self._removed_at)
+        other.pop(device_id, None)
+        changed[device_id] = self._version
+        changed.move_to_end(device_id)
+        while len(self._removed_at) > self._max_tombstones:
+            _, self._tombstone_floor = self._removed_at.popitem(last=False)
+        if self._listeners:
+            device = None if removed else dict(self._devices[device_id])
+            for listener in self._listeners:
+                try:
+                    listener(device_id, device, self._version)
+                except Exception as e:
+                    print(f"[GATEWAY ERROR] Erro em listener do registro: {e}")
+
+    # Notificações
+    def add_listener(self, listener):
+        """
+        Registra listener(device_id, device, version), chamado a cada mudança
+        ('device' é uma cópia, ou None em remoções). É chamado com o lock do
+        registro adquirido, na ordem das versões: deve apenas enfileirar trabalho.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    # Escrita
+    def upsert(self, device_data):
+        """
+        Insere ou atualiza um dispositivo.
+
+        :return: (device, created, changes) onde 'device' é uma cópia do estado
+                 resultante e 'changes' mapeia cada campo alterado para o seu
+                 valor anterior.
+        """
+        if not device_data.get('id'):
+            raise ValueError("Dispositivo sem 'id'.")
+        with self._lock:
+            return self._upsert_locked(device_data, time.monotonic())
+
+    def upsert_many(self, devices):
+        """
+        Insere ou atualiza vários dispositivos com uma única aquisição do lock
+        (ex.: um micro-lote de leituras). Dispositivos sem 'id' são ignorados.
+
+        :return: lista de (device, created, changes), na ordem de 'devices'.
+        """
+        with self._lock:
+            now = time.monotonic()
+            return [self._upsert_locked(device_data, now) for device_data in devices if device_data.get('id')]
+
+    def _upsert_locked(self, device_data, now):
+        device_id = device_data['id']
+        self._last_seen[device_id] = now
+        device = self._devices.get(device_id)
+        if device is None:
+            device = dict(device_data)
+            self._devices[device_id] = device
+            self._index(device)
+            self._touch(device_id)
+            return dict(device), True, {key: None for key in device}
+
+        changes = {key: device.get(key) for key, value in device_data.items()
+                   if key not in device or device[key] != value}
+        if not changes:
+            return dict(device), False, changes
+        reindex = 'subtype' in changes or 'related_device' in changes
+        if reindex:
+            self._unindex(device)
+        device.update(device_data)
+        if reindex:
+            self._index(device)
+        self._touch(device_id)
+        return dict(device), False, changes
+
+    def heartbeat(self, device_id):
+        """
+        Registra que o dispositivo segue ativo e sem mudanças: nenhum campo é
+        mesclado e a versão não muda.
+        :return: o dispositivo, ou None se ele ainda não é conhecido.
+        """
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is None:
+                return None
+            self._last_seen[device_id] = time.monotonic()
+            return dict(device)
+
+    def update_fields(self, device_id, **fields):
+        """Atualiza campos de um dispositivo existente. Retorna False se não existir."""
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is None:
+                return False
+            self.upsert(dict(fields, id=device_id))
+            return True
+
+    def remove(self, device_id):
+        with self._lock:
+            device = self._devices.pop(device_id, None)
+            self._last_seen.pop(device_id, None)
+            if device is not None:
+                self._unindex(device)
+                self._touch(device_id, removed=True)
+            return device
+
+    # Leitura
+    @property
+    def version(self):
+        return self._version
+
+    def changes_since(self, version):
+        """
+        :return: (versão atual, dispositivos alterados após 'version',
+                  ids removidos após 'version'), ou None se remoções
+                  posteriores a 'version' já foram esquecidas.
+        """
+        with self._lock:
+            if version < self._tombstone_floor:
+                return None
+            devices = []
+            for device_id in reversed(self._changed_at):
+                if self._changed_at[device_id] <= version:
+                    break
+                devices.append(dict(self._devices[device_id]))
+            removed = []
+            for device_id in reversed(self._removed_at):
+                if self._removed_at[device_id] <= version:
+                    break
+                removed.append(device_id)
+            devices.reverse()
+            removed.reverse()
+            return self._version, devices, removed
+
+    # As leituras devolvem cópias: os dicionários internos mudam a cada
+    # mensagem, e as rotas serializam o resultado fora do lock
+    def get(self, device_id):
+        with self._lock:
+            device = self._devices.get(device_id)
+            return None if device is None else dict(device)
+
+    def get_related(self, device_id):
+        """Retorna o dispositivo apontado por 'related_device' do dispositivo informado."""
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is None or not device.get('related_device'):
+                return None
+            related = self._devices.get(device['related_device'])
+            return None if related is None else dict(related)
+
+    def by_subtype(self, subtype):
+        with self._lock:
+            return [dict(self._devices[i]) for i in self._by_subtype.get(subtype, ())]
+
+    def sensors_for(self, actuator_id):
+        """Índice reverso: sensores cujo 'related_device' é o atuador informado."""
+        with self._lock:
+            return [dict(self._devices[i]) for i in self._by_related.get(actuator_id, ())]
+
+    def last_seen(self, device_id):
+        """Instante (time.monotonic()) da última mensagem do dispositivo, ou None."""
+        with self._lock:
+            return self._last_seen.get(device_id)
+
+    def silent(self, timeout):
+        """Ids dos dispositivos sem nenhuma mensagem há mais de 'timeout' segundos."""
+        limit = time.monotonic() - timeout
+        with self._lock:
+            return [device_id for device_id, seen in self._last_seen.items() if seen < limit]
+
+    def snapshot(self):
+        """Cópia rasa de todos os dispositivos, segura para serialização."""
+        return self.versioned_snapshot()[1]
+
+    def versioned_snapshot(self):
+        """Como snapshot(), junto com a versão correspondente."""
+        with self._lock:
+            return self._version, [dict(device) for device in self._devices.values()]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._devices)
+
+    def __contains__(self, device_id):
+        with self._lock:
+            return device_id in self._devices
+
+    def __iter__(self):
+        with self._lock:
+            return iter([dict(device) for device in self._devices.values()])
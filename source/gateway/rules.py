@@ -0,0 +1,300 @@
+import threading
+from collections import defaultdict
+from json import load
+
+import numpy as np
+
+# Códigos de estado usados nas colunas da tabela
+INACTIVE = 0
+ACTIVE = 1
+HOLD = -1  # dentro da banda: mantém o estado atual do atuador
+UNKNOWN = -2  # estado do atuador ainda não conhecido
+
+
+class Rule:
+    """
+    Regra de histerese sensor -> atuador.
+
+    Acima de 'high' o atuador vai para 'above'; abaixo de 'low' vai para
+    'below'; entre os dois, para 'band' (None mantém o estado atual).
+    'states' nomeia os estados (inativo, ativo) do atuador, ex.: ('off', 'on').
+    'parameter' é um par opcional (campo, valor) enviado junto com o comando
+    e conferido no atuador quando ativo, ex.: ('temperature', 22.0) para o ar.
+    """
+
+    def __init__(self, subtype, field, low, high, above, below, band=None,
+                 states=('off', 'on'), parameter=None):
+        self.subtype = subtype
+        self.field = field
+        self.low = float(low)
+        self.high = float(high)
+        self.states = tuple(states)
+        self.above = self.code(above)
+        self.below = self.code(below)
+        self.band = HOLD if band is None else self.code(band)
+        self.parameter = parameter
+
+    def code(self, state):
+        """Converte o nome do estado do atuador em código (UNKNOWN se não reconhecido)."""
+        if state == self.states[ACTIVE]:
+            return ACTIVE
+        if state == self.states[INACTIVE]:
+            return INACTIVE
+        return UNKNOWN
+
+    def value(self, device, field=None):
+        """Valor numérico de um campo do dispositivo (por padrão, o do sensor); NaN se ausente."""
+        field = field or self.field
+        value = device.get(field)
+        if value is None:
+            return np.nan
+        if field == 'state':
+            return 1.0 if value == 'on' else 0.0
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+
+    def action(self, code):
+        """Ação e parâmetros do comando que leva o atuador ao estado 'code'."""
+        parameters = dict([self.parameter]) if self.parameter else None
+        return self.states[code], parameters
+
+
+def compile_rules(config):
+    """
+    Compila as regras declarativas em uma tabela de despacho subtipo -> Rule.
+
+    Cada regra do config tem:
+      - subtype / field: subtipo do sensor e campo lido da mensagem;
+      - comparison: 'above' ativa o atuador quando o valor passa da banda,
+        'below' quando fica abaixo dela;
+      - band: [low, high], a banda de histerese;
+      - in_band: estado dentro da banda, ou 'hold' para manter o atual;
+      - states: [inativo, ativo], ex.: ["off", "on"] ou ["closed", "open"];
+      - parameters: opcional, no máximo um parâmetro numérico enviado com o
+        comando, ex.: {"temperature": 22.0}.
+    :raises ValueError: se alguma regra for inválida.
+    """
+    compiled = {}
+    for position, spec in enumerate(config.get("rules", [])):
+        try:
+            inactive, active = spec.get("states", ["off", "on"])
+            low, high = (float(limit) for limit in spec["band"])
+            if low > high:
+                raise ValueError("'band' deve ser [low, high] com low <= high")
+            comparison = spec.get("comparison", "above")
+            if comparison == "above":
+                above, below = active, inactive
+            elif comparison == "below":
+                above, below = inactive, active
+            else:
+                raise ValueError(f"'comparison' inválido: {comparison!r}")
+            in_band = spec.get("in_band", "hold")
+            if in_band not in ("hold", inactive, active):
+                raise ValueError(f"'in_band' inválido: {in_band!r}")
+            parameters = spec.get("parameters") or {}
+            if len(parameters) > 1:
+                raise ValueError("apenas um parâmetro por regra é suportado")
+            parameter = next(((name, float(value)) for name, value in parameters.items()), None)
+            rule = Rule(spec["subtype"], field=spec["field"], low=low, high=high,
+                        above=above, below=below, band=None if in_band == "hold" else in_band,
+                        states=(inactive, active), parameter=parameter)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Regra #{position} inválida: {e}") from e
+        if rule.subtype in compiled:
+            raise ValueError(f"Regra #{position} inválida: subtipo '{rule.subtype}' repetido")
+        compiled[rule.subtype] = rule
+    return compiled
+
+
+def load_rules(path):
+    """Lê e compila o arquivo de regras (JSON)."""
+    with open(path, encoding='utf-8') as f:
+        return compile_rules(load(f))
+
+
+class RuleTable:
+    """
+    Regras compiladas em colunas (uma linha por par sensor -> atuador).
+
+    As colunas são arrays NumPy: valor do sensor, limiares, estados alvo e o
+    estado atual do atuador. evaluate() avalia todas as linhas (ou um
+    subconjunto) em uma única passada vetorizada e devolve apenas os
+    atuadores cujo estado desejado difere do atual.
+
+    A tabela é mantida por on_registry_change(), registrado como listener do
+    DeviceRegistry. load_rules() troca as regras de forma atômica, recompilando
+    as colunas a partir das últimas leituras conhecidas.
+    """
+
+    _FLOAT_COLUMNS = ('_value', '_low', '_high', '_target_param', '_current_param')
+    _CODE_COLUMNS = ('_above', '_below', '_band', '_current')
+
+    def __init__(self, rules, capacity=1024):
+        self._rules = dict(rules)  # subtype -> Rule
+        self._lock = threading.Lock()
+        self._sensors = {}  # sensor_id -> última leitura conhecida
+        self._actuators = {}  # actuator_id -> último estado conhecido
+        self._reset_rows(capacity)
+
+    def _reset_rows(self, capacity):
+        self._size = 0
+        self._capacity = 0
+        self._rows = {}
+        self._by_actuator = defaultdict(set)
+        self._sensor_ids = []
+        self._actuator_ids = []
+        self._row_rules = []
+        self._grow(capacity)
+
+    @property
+    def rules(self):
+        return self._rules
+
+    def load_rules(self, rules):
+        """
+        Substitui as regras e recompila as colunas. Leituras que chegam durante
+        a troca aguardam o lock e são aplicadas já com as regras novas.
+        """
+        with self._lock:
+            self._rules = dict(rules)
+            self._reset_rows(max(1024, self._capacity))
+            for sensor in self._sensors.values():
+                self._set_sensor_locked(sensor)
+
+    def _grow(self, capacity):
+        for name in self._FLOAT_COLUMNS:
+            column = np.full(capacity, np.nan, dtype=np.float64)
+            if self._capacity:
+                column[:self._size] = getattr(self, name)[:self._size]
+            setattr(self, name, column)
+        for name in self._CODE_COLUMNS:
+            column = np.full(capacity, UNKNOWN, dtype=np.int8)
+            if self._capacity:
+                column[:self._size] = getattr(self, name)[:self._size]
+            setattr(self, name, column)
+        present = np.zeros(capacity, dtype=bool)
+        if self._capacity:
+            present[:self._size] = self._present[:self._size]
+        self._present = present
+        self._capacity = capacity
+
+    # Manutenção das colunas
+    def on_registry_change(self, device_id, device, version):
+        with self._lock:
+            if device is None:
+                self._remove_locked(device_id)
+            elif device.get('type') == 'sensor':
+                self._set_sensor_locked(device)
+            else:
+                self._set_actuator_locked(device)
+
+    def _set_sensor_locked(self, sensor):
+        sensor_id = sensor['id']
+        self._sensors[sensor_id] = sensor
+        rule = self._rules.get(sensor.get('subtype'))
+        actuator_id = sensor.get('related_device')
+        row = self._rows.get(sensor_id)
+        if rule is None or not actuator_id:
+            if row is not None:
+                self._value[row] = np.nan
+            return
+        if row is None:
+            if self._size == self._capacity:
+                self._grow(self._capacity * 2)
+            row = self._rows[sensor_id] = self._size
+            self._size += 1
+            self._sensor_ids.append(sensor_id)
+            self._actuator_ids.append(None)
+            self._row_rules.append(None)
+        if self._row_rules[row] is not rule:
+            self._row_rules[row] = rule
+            self._low[row] = rule.low
+            self._high[row] = rule.high
+            self._above[row] = rule.above
+            self._below[row] = rule.below
+            self._band[row] = rule.band
+            self._target_param[row] = rule.parameter[1] if rule.parameter else np.nan
+            self._actuator_ids[row] = None  # força recarregar o estado do atuador
+        if self._actuator_ids[row] != actuator_id:
+            if self._actuator_ids[row] is not None:
+                self._by_actuator[self._actuator_ids[row]].discard(row)
+            self._actuator_ids[row] = actuator_id
+            self._by_actuator[actuator_id].add(row)
+            self._fill_actuator_locked(row)
+        self._value[row] = rule.value(sensor)
+
+    def _set_actuator_locked(self, actuator):
+        self._actuators[actuator['id']] = actuator
+        for row in self._by_actuator.get(actuator['id'], ()):
+            self._fill_actuator_locked(row)
+
+    def _fill_actuator_locked(self, row):
+        rule = self._row_rules[row]
+        actuator = self._actuators.get(self._actuator_ids[row])
+        self._present[row] = actuator is not None
+        if actuator is None:
+            self._current[row] = UNKNOWN
+            self._current_param[row] = np.nan
+            return
+        self._current[row] = rule.code(actuator.get('state'))
+        self._current_param[row] = rule.value(actuator, rule.parameter[0]) if rule.parameter else np.nan
+
+    def _remove_locked(self, device_id):
+        self._sensors.pop(device_id, None)
+        row = self._rows.get(device_id)
+        if row is not None:
+            # A linha é mantida para reaproveitamento; sem valor, não gera comandos
+            self._value[row] = np.nan
+        if self._actuators.pop(device_id, None) is not None:
+            for row in self._by_actuator.get(device_id, ()):
+                self._fill_actuator_locked(row)
+
+    # Consulta
+    def rows_for(self, device):
+        """Linhas afetadas por uma mudança no dispositivo (o sensor, ou os sensores do atuador)."""
+        with self._lock:
+            if device.get('type') == 'sensor':
+                row = self._rows.get(device['id'])
+                return [] if row is None else [row]
+            return list(self._by_actuator.get(device['id'], ()))
+
+    def evaluate(self, rows=None):
+        """
+        Avalia as regras das linhas informadas (todas, se None).
+
+        :return: lista de (actuator_id, action, parameters) apenas para os
+                 atuadores cujo estado desejado mudou.
+        """
+        with self._lock:
+            if rows is None:
+                # Passada completa: fatias são views, sem cópia das colunas
+                index = slice(0, self._size)
+                if not self._size:
+                    return []
+            else:
+                index = np.asarray(rows, dtype=np.intp)
+                if not len(index):
+                    return []
+            value = self._value[index]
+            current = self._current[index]
+            held = np.where(current >= 0, current, INACTIVE).astype(np.int8)
+            band = self._band[index]
+            desired = np.where(value > self._high[index], self._above[index],
+                               np.where(value < self._low[index], self._below[index],
+                                        np.where(band == HOLD, held, band)))
+            target_param = self._target_param[index]
+            param_differs = (desired == ACTIVE) & ~np.isnan(target_param) & \
+                            (self._current_param[index] != target_param)
+            changed = ((desired != current) | param_differs) & self._present[index] & ~np.isnan(value)
+            hits = np.flatnonzero(changed)
+            decisions = []
+            for position in hits:
+                row = position if rows is None else index[position]
+                action, parameters = self._row_rules[row].action(desired[position])
+                decisions.append((self._actuator_ids[row], action, parameters))
+            return decisions
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,136 @@
+import bisect
+import hashlib
+import threading
+
+from configs.envs import GATEWAY_INSTANCE, GATEWAY_INSTANCES, GATEWAY_RING_REPLICAS, INGEST_SHARDS
+from source.utils.rabbitmq.setup import SHARD_WEIGHT, shard_queue
+
+
+def _hash(key):
+    # Estável entre processos e máquinas (hash() do Python muda a cada execução)
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Anel de hash consistente com nós virtuais: cada nó ocupa 'replicas'
+    pontos do anel, e uma chave pertence ao nó do primeiro ponto após o seu
+    hash. Quando um nó entra ou sai, só mudam de dono as chaves vizinhas
+    aos pontos dele (~1/N do total).
+    """
+
+    def __init__(self, nodes=(), replicas=GATEWAY_RING_REPLICAS):
+        self._replicas = replicas
+        self._points = []  # hashes ordenados
+        self._owners = []  # nó de cada ponto
+        self._nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self):
+        return sorted(self._nodes)
+
+    def add(self, node):
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for replica in range(self._replicas):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def owner(self, key):
+        """Nó responsável pela chave; None se o anel estiver vazio."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def __len__(self):
+        return len(self._nodes)
+
+
+class ShardManager:
+    """
+    Filas de shard consumidas por esta instância do gateway.
+
+    A exchange x-consistent-hash distribui os dispositivos entre INGEST_SHARDS
+    filas fixas pelo header shard_key (o atuador, para ele e os seus sensores);
+    o HashRing distribui as filas entre as instâncias. Quando uma instância
+    entra ou sai, só ~1/N das filas muda de dono, e todos os dispositivos de
+    uma fila mudam juntos: registro e regras de um dispositivo ficam sempre na
+    instância dona da fila dele.
+
+    Com 'worker' (um dos 'workers' de ingestão da instância, GATEWAY_WORKERS),
+    as filas da instância são divididas de novo entre os workers por um
+    segundo anel, fixo: cada worker consome só a sua parte.
+    """
+
+    def __init__(self, instance=GATEWAY_INSTANCE, instances=GATEWAY_INSTANCES, shards=INGEST_SHARDS,
+                 replicas=GATEWAY_RING_REPLICAS, worker=None, workers=()):
+        self.instance = instance
+        self.worker = worker
+        self._shards = shards
+        self._replicas = replicas
+        self._lock = threading.Lock()
+        self._workers = HashRing(workers, replicas) if worker is not None else None
+        self._ring = HashRing(instances, replicas)
+        self._owned = self._owned_by(self._ring)
+        self._devices = {}  # fila -> ids dos dispositivos recebidos por ela
+
+    def _owned_by(self, ring):
+        return frozenset(queue_name for queue_name in map(shard_queue, range(self._shards))
+                         if ring.owner(queue_name) == self.instance
+                         and (self._workers is None or self._workers.owner(queue_name) == self.worker))
+
+    def queues(self):
+        """{queue_name: peso} das filas desta instância, no formato de RabbitMQConsumer(queues=...)."""
+        return {queue_name: SHARD_WEIGHT for queue_name in sorted(self._owned)}
+
+    def owns(self, queue_name):
+        return queue_name in self._owned
+
+    def track(self, message, queue_name):
+        """Lembra por qual fila chegou cada dispositivo da mensagem (ou do lote)."""
+        devices = self._devices.get(queue_name)
+        if devices is None:
+            devices = self._devices.setdefault(queue_name, set())
+        for item in message if isinstance(message, list) else (message,):
+            if item.get('id'):
+                devices.add(item['id'])
+
+    def rebalance(self, instances):
+        """
+        Recalcula as filas desta instância para o novo conjunto de instâncias.
+        :return: (filas ganhas, filas perdidas, ids dos dispositivos das filas perdidas)
+        """
+        ring = HashRing(instances, self._replicas)
+        with self._lock:
+            previous = self._owned
+            self._ring = ring
+            self._owned = self._owned_by(ring)
+            gained = sorted(self._owned - previous)
+            lost = sorted(previous - self._owned)
+            dropped = set()
+            for queue_name in lost:
+                dropped.update(self._devices.pop(queue_name, ()))
+        return gained, lost, dropped
+
+    def status(self):
+        return {
+            "instance": self.instance,
+            "worker": self.worker,
+            "instances": self._ring.nodes,
+            "shards": self._shards,
+            "owned": sorted(self._owned),
+        }
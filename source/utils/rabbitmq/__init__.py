@@ -1,4 +1,6 @@
 from .connection import RabbitMQConnection
 from .consumer import RabbitMQConsumer
 from .publisher import RabbitMQPublisher
+from .batcher import BatchingPublisher
 from .setup import setup_rabbitmq
+from .aio import AsyncRabbitMQConnection, AsyncRabbitMQConsumer, AsyncRabbitMQPublisher
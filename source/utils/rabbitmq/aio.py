@@ -0,0 +1,750 @@
+import asyncio
+import inspect
+from collections import OrderedDict
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+from pika.exceptions import AMQPConnectionError, ChannelClosed, NackError, StreamLostError
+
+from configs.envs import (
+    CONSUMER_ACK_BATCH, CONSUMER_ACK_INTERVAL, CONSUMER_PREFETCH, PUBLISH_CONFIRM_TIMEOUT, PUBLISH_CONFIRM_WINDOW,
+    RABBITMQ_HOST, RABBITMQ_PASSWORD, RABBITMQ_PORT, RABBITMQ_TRANSPORT, RABBITMQ_USER,
+)
+from source.utils.rabbitmq.codec import JSON, decode_message, encode_message
+from source.utils.rabbitmq.connection import TRANSPORTS
+from source.utils.rabbitmq.consumer import RequeueMessage, _AckBatcher, default_callback
+from source.utils.rabbitmq.memory import MemoryBroker, MemoryChannel, MemoryConnection
+
+MEMORY_IDLE_WAIT = 0.1  # segundos que a conexão em memória espera por eventos do broker
+
+
+class AsyncChannel:
+    """
+    Canal com operações aguardáveis (await) sobre o canal assíncrono do pika
+    ou sobre um MemoryChannel. Publicação, ack e nack não aguardam resposta
+    do broker e continuam síncronos.
+    """
+
+    def __init__(self, channel):
+        self._channel = channel
+        self._memory = isinstance(channel, MemoryChannel)
+        self._waiting = set()
+        if not self._memory:
+            channel.add_on_close_callback(self._on_close)
+
+    def _on_close(self, channel, reason):
+        # Operações em andamento falham em vez de aguardar para sempre
+        error = reason if isinstance(reason, Exception) else ChannelClosed(0, str(reason))
+        for future in self._waiting:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _call(self, method, *args, **kwargs):
+        """Executa um método RPC do canal e aguarda a resposta do broker."""
+        if self._memory:
+            return method(*args, **kwargs)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.add(future)
+
+        def done(frame=None):
+            if not future.done():
+                future.set_result(frame)
+
+        method(*args, callback=done, **kwargs)
+        try:
+            return await future
+        finally:
+            self._waiting.discard(future)
+
+    @property
+    def is_open(self):
+        return self._channel.is_open
+
+    async def exchange_declare(self, exchange, exchange_type="topic", durable=False, arguments=None):
+        return await self._call(self._channel.exchange_declare, exchange=exchange,
+                                exchange_type=exchange_type, durable=durable, arguments=arguments)
+
+    async def queue_declare(self, queue, durable=False):
+        return await self._call(self._channel.queue_declare, queue=queue, durable=durable)
+
+    async def queue_bind(self, queue, exchange, routing_key=None):
+        return await self._call(self._channel.queue_bind, queue=queue, exchange=exchange, routing_key=routing_key)
+
+    async def basic_qos(self, prefetch_count=0):
+        return await self._call(self._channel.basic_qos, prefetch_count=prefetch_count)
+
+    async def confirm_delivery(self, ack_nack_callback):
+        return await self._call(self._channel.confirm_delivery, ack_nack_callback=ack_nack_callback)
+
+    async def basic_cancel(self, consumer_tag):
+        if self._channel.is_open:
+            return await self._call(self._channel.basic_cancel, consumer_tag)
+
+    def basic_consume(self, queue, on_message_callback):
+        return self._channel.basic_consume(queue=queue, on_message_callback=on_message_callback)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self._channel.basic_publish(exchange, routing_key, body, properties)
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        self._channel.basic_ack(delivery_tag=delivery_tag, multiple=multiple)
+
+    def basic_nack(self, delivery_tag=0, multiple=False, requeue=True):
+        self._channel.basic_nack(delivery_tag=delivery_tag, multiple=multiple, requeue=requeue)
+
+    def close(self):
+        if self._channel.is_open:
+            self._channel.close()
+
+
+class AsyncRabbitMQConnection:
+    """
+    Versão asyncio de RabbitMQConnection, sobre o AsyncioConnection do pika.
+
+    Toda a E/S roda no event loop que chamou connect(): um único loop atende
+    milhares de fluxos lógicos (publicadores e consumidores) sem uma thread
+    por consumidor. No transporte 'memory', uma tarefa do loop entrega as
+    mensagens do MemoryBroker aos canais da conexão.
+
+        connection = await AsyncRabbitMQConnection().connect()
+    """
+
+    def __init__(self, host=RABBITMQ_HOST, port=RABBITMQ_PORT, user=RABBITMQ_USER, password=RABBITMQ_PASSWORD,
+                 transport=None, broker=None):
+        """
+        :param transport: 'amqp' (RabbitMQ via pika) ou 'memory' (broker em memória,
+                          no próprio processo); padrão: RABBITMQ_TRANSPORT.
+        :param broker: MemoryBroker usado pelo transporte 'memory' (padrão: o do processo).
+        """
+        self._host = host
+        self._port = port
+        self._user = user
+        self._password = password
+        self._transport = transport or RABBITMQ_TRANSPORT
+        if self._transport not in TRANSPORTS:
+            raise ValueError(f"[RabbitMQ] Transporte desconhecido: {self._transport}")
+        self._broker = broker
+        self._loop = None
+        self._connection = None
+        self._channel = None
+        self._closed = None  # Future resolvido quando a conexão AMQP fecha
+        self._closing = False
+        self._pump_task = None
+
+    async def connect(self):
+        """Abre a conexão (com novas tentativas) e o canal padrão; devolve a própria conexão."""
+        self._loop = asyncio.get_running_loop()
+        await self._connect_with_retry()
+        return self
+
+    async def _connect_with_retry(self, retries=5, delay=5):
+        """Tenta reconectar automaticamente ao RabbitMQ em caso de falhas, sem bloquear o loop."""
+        attempt = 0
+        while attempt < retries:
+            try:
+                print(f"[RabbitMQ] Tentando conectar ao broker ({self._host}:{self._port}) - Tentativa {attempt + 1}/{retries}")
+                await self._update_connection()
+                print("[RabbitMQ] Conexão estabelecida com sucesso!")
+                return
+            except (AMQPConnectionError, StreamLostError) as e:
+                attempt += 1
+                print(f"[RabbitMQ] Falha ao conectar: {e}. Tentando novamente em {delay}s...")
+                await asyncio.sleep(delay)
+
+        raise ConnectionError(f"[RabbitMQ] Falha ao conectar após {retries} tentativas.")
+
+    async def _update_connection(self):
+        if self._connection is not None and self._connection.is_open:
+            await self.close()
+        self._closing = False
+        if self._transport == "memory":
+            self._connection = MemoryConnection(self._broker or MemoryBroker.default())
+            self._pump_task = self._loop.create_task(self._pump(self._connection))
+        else:
+            self._connection = await self._open_amqp(pika.ConnectionParameters(
+                host=self._host,
+                port=self._port,
+                credentials=pika.PlainCredentials(self._user, self._password),
+                heartbeat=600,  # Mantém a conexão ativa
+                blocked_connection_timeout=300  # Evita desconexão em operações prolongadas
+            ))
+        self._channel = await self.new_channel()
+
+    async def _open_amqp(self, parameters):
+        opened = self._loop.create_future()
+        closed = self._closed = self._loop.create_future()
+
+        def on_open(connection):
+            if not opened.done():
+                opened.set_result(connection)
+
+        def on_open_error(connection, error):
+            if not opened.done():
+                opened.set_exception(error if isinstance(error, Exception) else AMQPConnectionError(error))
+
+        def on_close(connection, reason):
+            if not opened.done():
+                opened.set_exception(reason if isinstance(reason, Exception) else AMQPConnectionError(reason))
+            elif not self._closing:
+                print(f"[RabbitMQ] Conexão perdida: {reason}")
+            if not closed.done():
+                closed.set_result(reason)
+
+        AsyncioConnection(parameters, on_open_callback=on_open, on_open_error_callback=on_open_error,
+                          on_close_callback=on_close, custom_ioloop=self._loop)
+        return await opened
+
+    async def _pump(self, connection):
+        """Entrega as mensagens do MemoryBroker aos canais da conexão e executa os callbacks agendados."""
+        broker = connection.broker
+        while connection.is_open:
+            seen = broker.events
+            active = connection._run_callbacks()
+            for channel in list(connection._channels):
+                if channel.is_open:
+                    deliveries = channel._next_deliveries()
+                    channel._dispatch(deliveries)
+                    active = active or deliveries
+            if active:
+                await asyncio.sleep(0)  # Cede o loop às demais tarefas
+            else:
+                # A espera bloqueante fica em uma thread do executor, fora do loop
+                await self._loop.run_in_executor(None, broker.wait, MEMORY_IDLE_WAIT, seen)
+
+    @property
+    def host(self):
+        return self._host
+
+    @property
+    def port(self):
+        return self._port
+
+    @property
+    def transport(self):
+        return self._transport
+
+    @property
+    def channel(self):
+        return self._channel
+
+    @property
+    def is_open(self):
+        return self._connection is not None and self._connection.is_open
+
+    async def new_channel(self):
+        """Abre um canal adicional na mesma conexão (ex.: um canal em modo confirm)."""
+        if self._transport == "memory":
+            return AsyncChannel(self._connection.channel())
+        opened = self._loop.create_future()
+        self._connection.channel(on_open_callback=lambda channel: opened.done() or opened.set_result(channel))
+        return AsyncChannel(await opened)
+
+    def add_callback_threadsafe(self, callback):
+        """Agenda 'callback' no event loop da conexão (pode ser chamado de qualquer thread)."""
+        self._loop.call_soon_threadsafe(callback)
+
+    def call_later(self, delay, callback):
+        """Agenda 'callback' após 'delay' segundos, no event loop da conexão."""
+        self._loop.call_later(delay, callback)
+
+    async def reconnect(self):
+        """Reabre a conexão e o canal padrão (canais obtidos antes deixam de valer)."""
+        await self._connect_with_retry()
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+    async def close(self):
+        """Fecha a conexão e o canal com o RabbitMQ, se estiverem abertos."""
+        try:
+            self._closing = True
+            if self._channel is not None:
+                self._channel.close()
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+                if self._closed is not None and self._transport != "memory":
+                    await asyncio.wait_for(asyncio.shield(self._closed), timeout=5)
+            if self._pump_task is not None:
+                self._pump_task.cancel()
+                self._pump_task = None
+            print("[RabbitMQ] Conexão e canal fechados com sucesso.")
+        except Exception as e:
+            print(f"[RabbitMQ] Erro ao fechar a conexão: {e}")
+
+
+class AsyncRabbitMQPublisher:
+    """
+    Versão asyncio de RabbitMQPublisher. Os métodos que falam com o broker
+    são corrotinas; open() declara exchange e fila:
+
+        publisher = await AsyncRabbitMQPublisher(connection, "sensors_exchange", ...).open()
+        await publisher.publish_message({"id": ...})
+    """
+
+    def __init__(self, connection: AsyncRabbitMQConnection, exchange_name, exchange_type="topic", queue_name=None,
+                 routing_key=None, verbose=True, confirm=False, max_in_flight=PUBLISH_CONFIRM_WINDOW, codec=JSON):
+        """
+        :param verbose: imprime cada mensagem publicada (desative em alto volume)
+        :param confirm: modo confirm com publicações em pipeline: cada publicação
+                        devolve um asyncio.Future, resolvido quando o broker confirma
+                        (ack) ou com NackError se ele recusar a mensagem
+        :param max_in_flight: publicações aguardando confirmação antes de suspender
+        :param codec: formato do corpo (ver codec.py), informado no content_type;
+                      mensagens que não cabem no schema do codec vão em JSON
+        """
+        self._connection = connection
+        self._codec = codec
+        self._verbose = verbose
+        self._exchange_name = exchange_name
+        self._exchange_type = exchange_type
+        self._queue_name = queue_name
+        self._routing_key = routing_key
+        self._confirm = confirm
+        self._max_in_flight = max_in_flight
+        # delivery_tag -> (future, routing_key, body, properties), em ordem de publicação
+        self._pending = OrderedDict()
+        self._next_tag = 1
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+        self._channel = None
+
+    async def open(self):
+        await self._open_channel()
+        return self
+
+    async def _open_channel(self):
+        if self._confirm:
+            # Canal próprio: o modo confirm vale para o canal inteiro
+            self._channel = await self._connection.new_channel()
+            await self._channel.confirm_delivery(self._on_confirm)
+            self._next_tag = 1
+        else:
+            self._channel = self._connection.channel
+        await self.setup_exchange()
+        if self._queue_name and self._routing_key:
+            await self.setup_queue()
+
+    # Getters
+    def get_exchange_name(self):
+        return self._exchange_name
+
+    def get_exchange_type(self):
+        return self._exchange_type
+
+    def get_queue_name(self):
+        return self._queue_name
+
+    def get_routing_key(self):
+        return self._routing_key
+
+    # Setters
+    async def set_exchange_name(self, exchange_name):
+        self._exchange_name = exchange_name
+        await self.setup_exchange()
+
+    async def set_exchange_type(self, exchange_type):
+        self._exchange_type = exchange_type
+        await self.setup_exchange()
+
+    async def set_queue_name(self, queue_name):
+        self._queue_name = queue_name
+        if self._routing_key:
+            await self.setup_queue()
+
+    async def set_routing_key(self, routing_key):
+        self._routing_key = routing_key
+        if self._queue_name:
+            await self.setup_queue()
+
+    async def setup_exchange(self):
+        await self._channel.exchange_declare(
+            exchange=self._exchange_name,
+            exchange_type=self._exchange_type,
+            durable=True
+        )
+
+    async def setup_queue(self):
+        await self._channel.queue_declare(queue=self._queue_name, durable=True)
+        await self._channel.queue_bind(
+            exchange=self._exchange_name,
+            queue=self._queue_name,
+            routing_key=self._routing_key
+        )
+
+    async def publish_message(self, message_body: dict, routing_key=None, shard_key=None):
+        """
+        Publica uma mensagem persistente. No modo confirm, suspende apenas
+        enquanto a janela de confirmações estiver cheia.
+        :param shard_key: chave do header usado pela exchange de shards do gateway
+        :return: Future da confirmação no modo confirm; None caso contrário.
+        """
+        routing_key = routing_key or self._routing_key
+        body, properties = encode_message(message_body, self._codec, shard_key)
+        if self._confirm:
+            future = await self._publish_confirmed(routing_key, body, properties)
+        else:
+            future = None
+            self._channel.basic_publish(self._exchange_name, routing_key, body, properties)
+        if self._verbose:
+            print(f"Mensagem publicada no Exchange '{self._exchange_name}' "
+                  f"com routing_key '{routing_key}': {message_body}")
+        return future
+
+    async def publish_batch(self, messages, routing_key=None):
+        """
+        Publica várias mensagens de uma vez (sem log por mensagem).
+
+        :param messages: dicionários, ou pares (routing_key, dicionário)
+        :return: lista de Futures no modo confirm; None caso contrário.
+        """
+        default_key = routing_key or self._routing_key
+        futures = [] if self._confirm else None
+        for message in messages:
+            key, message_body = message if isinstance(message, tuple) else (default_key, message)
+            body, properties = encode_message(message_body, self._codec)
+            if self._confirm:
+                futures.append(await self._publish_confirmed(key, body, properties))
+            else:
+                self._channel.basic_publish(self._exchange_name, key, body, properties)
+        if self._verbose:
+            print(f"Lote de {len(messages)} mensagens publicado no Exchange '{self._exchange_name}'.")
+        return futures
+
+    # Modo confirm
+    async def _publish_confirmed(self, routing_key, body, properties, future=None):
+        # Janela limitada: aguarda confirmações antes de publicar mais
+        while len(self._pending) >= self._max_in_flight:
+            self._has_room.clear()
+            try:
+                await asyncio.wait_for(self._has_room.wait(), PUBLISH_CONFIRM_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise TimeoutError("[RabbitMQ] Tempo esgotado aguardando confirmações do broker.") from None
+        future = future or asyncio.get_running_loop().create_future()
+        self._channel.basic_publish(self._exchange_name, routing_key, body, properties)
+        self._pending[self._next_tag] = (future, routing_key, body, properties)
+        self._next_tag += 1
+        return future
+
+    def _on_confirm(self, frame):
+        """Ack/Nack do broker; 'multiple' confirma todas as tags até delivery_tag."""
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        if getattr(method, 'multiple', False):
+            tags = [tag for tag in self._pending if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self._pending else []
+        for tag in tags:
+            future, _, body, _ = self._pending.pop(tag)
+            if future.done():
+                continue
+            if acked:
+                future.set_result(True)
+            else:
+                future.set_exception(NackError([body]))
+        if len(self._pending) < self._max_in_flight:
+            self._has_room.set()
+
+    async def flush(self, timeout=PUBLISH_CONFIRM_TIMEOUT):
+        """
+        Aguarda a confirmação de todas as publicações pendentes.
+        :return: True se todas foram confirmadas (ack ou nack) dentro do prazo.
+        """
+        if self._pending:
+            await asyncio.wait([future for future, _, _, _ in self._pending.values()], timeout=timeout)
+        return not self._pending
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    async def reconnect(self):
+        """
+        Reabre a conexão e recria exchange/fila. No modo confirm, as mensagens
+        ainda sem confirmação são republicadas (entrega ao menos uma vez) e os
+        seus Futures continuam válidos.
+        """
+        await self._connection.reconnect()
+        unconfirmed = list(self._pending.values())
+        self._pending.clear()
+        self._has_room.set()
+        await self._open_channel()
+        for future, routing_key, body, properties in unconfirmed:
+            await self._publish_confirmed(routing_key, body, properties, future)
+
+
+class AsyncRabbitMQConsumer:
+    """
+    Versão asyncio de RabbitMQConsumer. O callback recebe os mesmos
+    argumentos (body, exchange_name, routing_key, queue_name) e pode ser uma
+    corrotina; funções comuns rodam direto no loop e devem ser rápidas.
+
+        consumer = await AsyncRabbitMQConsumer(connection, "sensors_exchange", queues={...}).open()
+        await consumer.consume(callback)  # até stop_consuming() ou cancelamento
+    """
+
+    def __init__(self, connection: AsyncRabbitMQConnection, exchange_name, exchange_type="topic", queues=None,
+                 prefetch_count=CONSUMER_PREFETCH, ack_batch=CONSUMER_ACK_BATCH, workers=0, order_key=None,
+                 decode=False, exchange_arguments=None):
+        """
+        :param connection: Conexão asyncio com o RabbitMQ
+        :param exchange_name: Nome da exchange
+        :param exchange_type: Tipo da exchange (padrão: topic)
+        :param exchange_arguments: argumentos da exchange (ex.: 'hash-header' da x-consistent-hash)
+        :param queues: Dicionário {queue_name: routing_key}
+        :param prefetch_count: mensagens entregues e ainda sem ack (basic_qos; 0 = sem limite)
+        :param ack_batch: mensagens confirmadas por basic_ack (multiple=True)
+        :param workers: lanes (tarefas do loop) que executam o callback; mensagens com
+                        a mesma chave vão sempre para a mesma lane, preservando a ordem
+                        entre elas (0 ou 1: uma lane, na ordem de entrega)
+        :param order_key: função (body, routing_key) -> chave de ordenação
+                          (padrão: a routing key)
+        :param decode: entrega ao callback (e a order_key) o dicionário já decodificado
+                       pelo codec do content_type da mensagem (JSON se ausente), em
+                       vez do corpo bruto; um lote chega como lista de dicionários
+        """
+        self._connection = connection
+        self._channel = connection.channel
+        self._exchange_name = exchange_name
+        self._exchange_type = exchange_type
+        self._exchange_arguments = exchange_arguments
+        self._queues = queues or {}
+        self._prefetch_count = prefetch_count
+        # Com prefetch, o lote precisa ser menor que a janela para o consumo não travar
+        self._ack_batch = max(1, min(ack_batch, prefetch_count // 2 or ack_batch))
+        self._workers = max(1, workers)
+        self._order_key = order_key or (lambda body, routing_key: routing_key)
+        self._decode = decode
+        self._lanes = []
+        self._lane_tasks = []
+        self._consumer_tags = {}  # queue_name -> consumer_tag, durante o consumo
+        self._callback = None
+        self._acks = None
+        self._stopped = None
+
+    async def open(self):
+        """Declara a exchange e as filas; devolve o próprio consumidor."""
+        await self.setup_exchange()
+        await self.setup_queues()
+        return self
+
+    # Getters e Setters
+    def get_exchange_name(self):
+        return self._exchange_name
+
+    async def set_exchange_name(self, exchange_name):
+        self._exchange_name = exchange_name
+        await self.setup_exchange()
+
+    def get_queues(self):
+        return self._queues
+
+    async def set_queues(self, queues):
+        """Redefine todas as filas e realiza a nova configuração."""
+        self._queues = queues
+        await self.setup_queues()
+
+    # Configurações do broker
+    async def setup_exchange(self):
+        await self._channel.exchange_declare(
+            exchange=self._exchange_name,
+            exchange_type=self._exchange_type,
+            durable=True,
+            arguments=self._exchange_arguments
+        )
+
+    async def setup_queues(self):
+        """Configura todas as filas especificadas no dicionário self._queues."""
+        for queue_name, routing_key in self._queues.items():
+            await self._declare_and_bind_queue(queue_name, routing_key)
+
+    async def _declare_and_bind_queue(self, queue_name, routing_key):
+        """Declara e vincula uma fila à exchange."""
+        await self._channel.queue_declare(queue=queue_name, durable=True)
+        await self._channel.queue_bind(
+            exchange=self._exchange_name,
+            queue=queue_name,
+            routing_key=routing_key
+        )
+        print(f"Inscrito na fila '{queue_name}' com routing key '{routing_key}'.")
+
+    # Gerenciamento dinâmico de filas
+    async def add_queue(self, queue_name, routing_key):
+        """Adiciona uma nova fila e a vincula à exchange, se ainda não existir."""
+        if queue_name not in self._queues:
+            self._queues[queue_name] = routing_key
+            await self._declare_and_bind_queue(queue_name, routing_key)
+        else:
+            print(f"A fila '{queue_name}' já existe. Use 'update_queue_routing_key' para atualizar a routing key.")
+
+    def remove_queue(self, queue_name):
+        """Remove uma fila da configuração atual."""
+        if queue_name in self._queues:
+            del self._queues[queue_name]
+            print(f"A fila '{queue_name}' foi removida da configuração local.")
+        else:
+            print(f"A fila '{queue_name}' não existe na configuração atual.")
+
+    async def update_queue_routing_key(self, queue_name, new_routing_key):
+        """Atualiza a routing key de uma fila existente."""
+        if queue_name in self._queues:
+            self._queues[queue_name] = new_routing_key
+            await self._channel.queue_bind(
+                exchange=self._exchange_name,
+                queue=queue_name,
+                routing_key=new_routing_key
+            )
+            print(f"Routing key da fila '{queue_name}' atualizada para '{new_routing_key}'.")
+        else:
+            print(f"A fila '{queue_name}' não existe para atualização.")
+
+    async def update_queues(self, queues):
+        """
+        Passa a consumir exatamente as filas de 'queues' ({queue_name: routing_key})
+        sem interromper o consumo das demais; as mensagens já entregues das
+        filas removidas ainda são processadas.
+        :return: (filas adicionadas, filas removidas)
+        """
+        removed = [queue_name for queue_name in self._queues if queue_name not in queues]
+        added = {queue_name: routing_key for queue_name, routing_key in queues.items()
+                 if queue_name not in self._queues}
+        for queue_name in removed:
+            consumer_tag = self._consumer_tags.pop(queue_name, None)
+            if consumer_tag is not None:
+                await self._channel.basic_cancel(consumer_tag)
+            self.remove_queue(queue_name)
+        for queue_name, routing_key in added.items():
+            await self.add_queue(queue_name, routing_key)
+            if self._callback is not None:
+                self._basic_consume(queue_name)
+        return list(added), removed
+
+    # Consumo de mensagens
+    async def _run_callback(self, method, body, queue_name, callback_function):
+        """
+        Executa o callback (aguardando-o, se for corrotina); retorna False se ele
+        falhar e None se pedir RequeueMessage.
+        """
+        try:
+            print(f"\nMensagem recebida na fila '{queue_name}' (Routing Key: {method.routing_key})")
+            print(f"Exchange: {method.exchange}")
+            result = callback_function(body, method.exchange, method.routing_key, queue_name)
+            if inspect.isawaitable(result):
+                await result
+            return True
+        except RequeueMessage:
+            return None
+        except Exception as e:
+            print(f"Erro ao processar mensagem: {e}")
+            return False
+
+    def _process_message(self, ch, method, properties, body, queue_name, callback_function):
+        """Encaminha cada mensagem recebida para a lane da sua chave de ordenação."""
+        self._acks.delivered(method.delivery_tag)
+        if self._decode:
+            try:
+                body = decode_message(body, properties.content_type, properties.content_encoding)
+            except Exception as e:
+                print(f"Erro ao decodificar mensagem da fila '{queue_name}': {e}")
+                self._acks.completed(method.delivery_tag, False)
+                return
+        lane = self._lanes[hash(self._order_key(body, method.routing_key)) % len(self._lanes)]
+        lane.put_nowait((method, body, queue_name, callback_function))
+
+    async def _lane_worker(self, lane):
+        while True:
+            item = await lane.get()
+            if item is None:
+                return
+            method, body, queue_name, callback_function = item
+            success = await self._run_callback(method, body, queue_name, callback_function)
+            # As lanes rodam no loop da conexão: o ack pode ir direto ao canal
+            self._acks.completed(method.delivery_tag, success)
+
+    def _start_lanes(self):
+        loop = asyncio.get_running_loop()
+        self._lanes = [asyncio.Queue() for _ in range(self._workers)]
+        self._lane_tasks = [loop.create_task(self._lane_worker(lane)) for lane in self._lanes]
+
+    def _stop_lanes(self):
+        for lane in self._lanes:
+            lane.put_nowait(None)
+        self._lanes = []
+        self._lane_tasks = []
+
+    def _flush_acks_periodically(self):
+        # Confirma o que sobrou de um lote quando o fluxo de mensagens diminui
+        if self._acks is not None and self._channel.is_open:
+            self._acks.flush()
+            self._connection.call_later(CONSUMER_ACK_INTERVAL, self._flush_acks_periodically)
+
+    async def reconnect(self):
+        """Reabre a conexão e recria exchange e filas (mensagens sem ack são reentregues)."""
+        self._stop_lanes()
+        await self._connection.reconnect()
+        self._channel = self._connection.channel
+        await self.open()
+
+    async def consume(self, callback_function=default_callback):
+        """Consome todas as filas cadastradas até stop_consuming() ou o cancelamento da tarefa."""
+        await self._channel.basic_qos(prefetch_count=self._prefetch_count)
+        self._acks = _AckBatcher(self._channel, self._ack_batch)
+        self._start_lanes()
+        self._connection.call_later(CONSUMER_ACK_INTERVAL, self._flush_acks_periodically)
+        self._stopped = asyncio.get_running_loop().create_future()
+        self._callback = callback_function
+        for queue_name in self._queues:
+            self._basic_consume(queue_name)
+
+        print(f"Consumindo mensagens das filas: {', '.join(self._queues.keys())}.")
+        try:
+            await self._stopped
+        finally:
+            for consumer_tag in self._consumer_tags.values():
+                try:
+                    await self._channel.basic_cancel(consumer_tag)
+                except Exception as e:
+                    print(f"Erro ao cancelar consumidor '{consumer_tag}': {e}")
+            self._consumer_tags = {}
+            self._callback = None
+            self._stop_lanes()
+            self._acks.flush()
+
+    def _basic_consume(self, queue_name):
+        callback_function = self._callback
+        self._consumer_tags[queue_name] = self._channel.basic_consume(
+            queue=queue_name,
+            on_message_callback=lambda ch, method, properties, body, q=queue_name:
+                self._process_message(ch, method, properties, body, q, callback_function)
+        )
+
+    def stop_consuming(self):
+        """Encerra consume(); as mensagens ainda sem ack são reentregues pelo broker."""
+        if self._stopped is not None and not self._stopped.done():
+            self._stopped.set_result(None)
+
+    def start(self, callback_function=default_callback):
+        """Inicia o consumo em uma tarefa do loop atual e a devolve."""
+        return asyncio.get_running_loop().create_task(self.consume(callback_function))
+
+
+if __name__ == "__main__":
+    async def main():
+        connection = await AsyncRabbitMQConnection().connect()
+        consumer = await AsyncRabbitMQConsumer(
+            connection=connection,
+            exchange_name="sensors_exchange",
+            queues={
+                "queue.temperature": "sensor.temperature",
+                "queue.luminosity": "sensor.luminosity",
+            }
+        ).open()
+        publisher = await AsyncRabbitMQPublisher(connection, "sensors_exchange", routing_key="sensor.temperature").open()
+
+        task = consumer.start()
+        await publisher.publish_message({"ola": "mundo"})
+        await connection.sleep(1)
+        consumer.stop_consuming()
+        await task
+        await connection.close()
+
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+import time
+
+from configs.envs import BATCH_COMPRESS_MIN, BATCH_MAX_DELAY, BATCH_MAX_SIZE, INGEST_SHARDS
+from source.utils.rabbitmq.publisher import RabbitMQPublisher
+
+
+class BatchingPublisher:
+    """
+    Acumula mensagens e as publica em micro-lotes: uma única mensagem AMQP
+    (RabbitMQPublisher.publish_packed), comprimida a partir de 'compress_min'
+    bytes. Um lote reúne mensagens de vários dispositivos, então usa a
+    routing key do publisher (ex.: 'sensor.temperature'); com 'by_shard',
+    há um lote por shard_key, para que cada lote caia em um único shard.
+
+    Um lote é enviado ao atingir 'max_size' mensagens ou quando a mais
+    antiga já espera 'max_delay' segundos. O limite de tempo é verificado a
+    cada publish_message() e em flush_due(), que quem usa deve chamar
+    periodicamente (o atraso de uma mensagem fica limitado a 'max_delay'
+    mais o intervalo entre essas chamadas).
+
+    Tem a mesma interface de publicação de RabbitMQPublisher
+    (publish_message/reconnect) e, como ele, não é thread-safe.
+    """
+
+    def __init__(self, publisher: RabbitMQPublisher, max_size=BATCH_MAX_SIZE, max_delay=BATCH_MAX_DELAY,
+                 compress_min=BATCH_COMPRESS_MIN, by_shard=INGEST_SHARDS > 0):
+        self._publisher = publisher
+        self._max_size = max_size
+        self._max_delay = max_delay
+        self._compress_min = compress_min
+        self._by_shard = by_shard
+        self._buffers = {}  # shard_key (None sem 'by_shard') -> mensagens aguardando
+        self._first_at = {}  # shard_key -> instante da mensagem mais antiga do lote
+        self.batches = 0  # mensagens AMQP publicadas
+
+    @property
+    def publisher(self):
+        return self._publisher
+
+    @property
+    def max_delay(self):
+        return self._max_delay
+
+    @property
+    def pending(self):
+        """Mensagens aguardando no buffer."""
+        return sum(len(buffer) for buffer in self._buffers.values())
+
+    def publish_message(self, message_body: dict, routing_key=None, shard_key=None):
+        """
+        Adiciona a mensagem ao lote; publica os lotes que venceram. A routing
+        key da mensagem é ignorada (o lote usa a do publisher).
+        """
+        key = shard_key if self._by_shard else None
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = []
+        now = time.monotonic()
+        if not buffer:
+            self._first_at[key] = now
+        buffer.append(message_body)
+        if len(buffer) >= self._max_size:
+            self._flush_key(key)
+        self.flush_due(now)
+
+    def flush_due(self, now=None):
+        """Publica os lotes cuja mensagem mais antiga já esperou 'max_delay'."""
+        now = time.monotonic() if now is None else now
+        for key, first_at in list(self._first_at.items()):
+            if now - first_at >= self._max_delay:
+                self._flush_key(key)
+
+    def flush(self):
+        """Publica tudo o que está no buffer."""
+        for key in list(self._first_at):
+            self._flush_key(key)
+
+    def next_due(self):
+        """Instante (time.monotonic) em que o próximo lote vence; None se não há pendências."""
+        if not self._first_at:
+            return None
+        return min(self._first_at.values()) + self._max_delay
+
+    def _flush_key(self, key):
+        messages = self._buffers.get(key)
+        self._first_at.pop(key, None)
+        if not messages:
+            return
+        # O buffer é trocado antes de publicar: se a publicação falhar, o lote
+        # volta ao buffer e segue no próximo flush (após reconnect())
+        self._buffers[key] = []
+        try:
+            self._publisher.publish_packed(messages, compress_min=self._compress_min, shard_key=key)
+        except Exception:
+            self._buffers[key] = messages + self._buffers[key]
+            self._first_at.setdefault(key, time.monotonic() - self._max_delay)
+            raise
+        self.batches += 1
+
+    def reconnect(self):
+        self._publisher.reconnect()
@@ -0,0 +1,158 @@
+import json
+import zlib
+from functools import lru_cache
+
+import pika
+
+from configs.envs import BATCH_COMPRESS_LEVEL, BATCH_COMPRESS_MIN
+from source.devices.actuators.proto.telemetry_pb2 import Telemetry, TelemetryBatch
+from source.utils.rabbitmq.setup import SHARD_HEADER
+
+JSON_CONTENT_TYPE = "application/json"
+TELEMETRY_CONTENT_TYPE = "application/vnd.smartroom.telemetry+protobuf"
+TELEMETRY_BATCH_CONTENT_TYPE = "application/vnd.smartroom.telemetry-batch+protobuf"
+# content_encoding de corpos comprimidos com zlib
+DEFLATE = "deflate"
+
+
+class JsonCodec:
+    """Formato original das mensagens (e o usado quando não há content_type)."""
+
+    content_type = JSON_CONTENT_TYPE
+
+    def encode(self, message):
+        return json.dumps(message)
+
+    def decode(self, body):
+        return json.loads(body)
+
+
+class ProtobufCodec:
+    """
+    Converte dicionários de/para uma mensagem protobuf com campos de mesmo
+    nome. A mensagem deve declarar todos os campos como 'optional', para
+    que decode() devolva exatamente as chaves enviadas.
+    """
+
+    def __init__(self, message_class, content_type):
+        self.message_class = message_class
+        self.content_type = content_type
+        # descritor -> nome do campo (ler field.name a cada mensagem custa mais que o parse)
+        self._names = {field: field.name for field in message_class.DESCRIPTOR.fields}
+
+    def encode(self, message):
+        """:raises ValueError/TypeError: chave fora do schema ou valor de tipo incompatível."""
+        return self.message_class(**message).SerializeToString()
+
+    def decode(self, body):
+        names = self._names
+        return {names[field]: value for field, value in self.message_class.FromString(body).ListFields()}
+
+
+class ProtobufBatchCodec:
+    """
+    Lote de mensagens: uma lista de dicionários <-> mensagem protobuf com um
+    único campo repeated de mensagens do codec 'item'.
+    """
+
+    def __init__(self, message_class, item, content_type):
+        self.message_class = message_class
+        self.item = item
+        self.content_type = content_type
+        self._field = message_class.DESCRIPTOR.fields[0].name
+
+    def encode(self, messages):
+        """:raises ValueError/TypeError: alguma mensagem não cabe no schema."""
+        item_class = self.item.message_class
+        return self.message_class(**{self._field: [item_class(**message) for message in messages]}).SerializeToString()
+
+    def decode(self, body):
+        names = self.item._names
+        return [{names[field]: value for field, value in item.ListFields()}
+                for item in getattr(self.message_class.FromString(body), self._field)]
+
+
+JSON = JsonCodec()
+TELEMETRY = ProtobufCodec(Telemetry, TELEMETRY_CONTENT_TYPE)
+TELEMETRY_BATCH = ProtobufBatchCodec(TelemetryBatch, TELEMETRY, TELEMETRY_BATCH_CONTENT_TYPE)
+
+# content_type -> codec; mensagens sem content_type (dispositivos antigos) são JSON
+CODECS = {codec.content_type: codec for codec in (JSON, TELEMETRY, TELEMETRY_BATCH)}
+CODEC_NAMES = {"json": JSON, "protobuf": TELEMETRY}
+# codec das mensagens avulsas -> codec dos lotes (JSON: lista de objetos)
+BATCH_CODECS = {JSON: JSON, TELEMETRY: TELEMETRY_BATCH}
+
+
+def register_codec(codec):
+    CODECS[codec.content_type] = codec
+
+
+def get_codec(content_type):
+    """Codec do content_type informado; JSON se ausente ou desconhecido."""
+    return CODECS.get(content_type, JSON)
+
+
+def codec_by_name(name):
+    try:
+        return CODEC_NAMES[name]
+    except KeyError:
+        raise ValueError(f"Codec desconhecido: {name} (use {', '.join(CODEC_NAMES)})") from None
+
+
+@lru_cache(maxsize=4096)
+def persistent_properties(content_type, content_encoding=None, shard_key=None):
+    """
+    Propriedades de mensagem persistente com o content_type, reaproveitadas
+    entre publicações. 'shard_key' vai no header usado pela exchange de shards.
+    """
+    headers = None if shard_key is None else {SHARD_HEADER: shard_key}
+    return pika.BasicProperties(delivery_mode=2, content_type=content_type, content_encoding=content_encoding,
+                                headers=headers)
+
+
+def encode_message(message, codec=JSON, shard_key=None):
+    """
+    Codifica 'message' com o codec; se ele não couber no schema (ex.: chaves
+    extras), usa JSON.
+    :return: (body, properties)
+    """
+    if codec is not JSON:
+        try:
+            return codec.encode(message), persistent_properties(codec.content_type, None, shard_key)
+        except (ValueError, TypeError):
+            pass
+    return JSON.encode(message), persistent_properties(JSON.content_type, None, shard_key)
+
+
+def encode_batch(messages, codec=JSON, compress_min=BATCH_COMPRESS_MIN, shard_key=None):
+    """
+    Codifica uma lista de mensagens como um único corpo (lote). Corpos a
+    partir de 'compress_min' bytes são comprimidos (content_encoding
+    'deflate'); 0 desativa a compressão.
+    :return: (body, properties)
+    """
+    batch_codec = BATCH_CODECS.get(codec, JSON)
+    body = None
+    if batch_codec is not JSON:
+        try:
+            body = batch_codec.encode(messages)
+        except (ValueError, TypeError):
+            batch_codec = JSON
+    if body is None:
+        body = JSON.encode(messages).encode()
+    if compress_min and len(body) >= compress_min:
+        return (zlib.compress(body, BATCH_COMPRESS_LEVEL),
+                persistent_properties(batch_codec.content_type, DEFLATE, shard_key))
+    return body, persistent_properties(batch_codec.content_type, None, shard_key)
+
+
+def decode_message(body, content_type=None, content_encoding=None):
+    """
+    Decodifica o corpo pelo content_type. Um lote (ver encode_batch) é
+    devolvido como lista de mensagens.
+    """
+    if content_encoding == DEFLATE:
+        body = zlib.decompress(body)
+    elif content_encoding:
+        raise ValueError(f"content_encoding não suportado: {content_encoding}")
+    return get_codec(content_type).decode(body)
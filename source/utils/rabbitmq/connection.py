@@ -1,15 +1,28 @@
 import pika
 import time
 from pika.exceptions import AMQPConnectionError, StreamLostError
-from configs.envs import RABBITMQ_HOST, RABBITMQ_PORT, RABBITMQ_USER, RABBITMQ_PASSWORD
+from configs.envs import RABBITMQ_HOST, RABBITMQ_PORT, RABBITMQ_USER, RABBITMQ_PASSWORD, RABBITMQ_TRANSPORT
+from source.utils.rabbitmq.memory import MemoryBroker, MemoryConnection
+
+TRANSPORTS = ("amqp", "memory")
 
 
 class RabbitMQConnection:
-    def __init__(self, host=RABBITMQ_HOST, port=RABBITMQ_PORT, user=RABBITMQ_USER, password=RABBITMQ_PASSWORD):
+    def __init__(self, host=RABBITMQ_HOST, port=RABBITMQ_PORT, user=RABBITMQ_USER, password=RABBITMQ_PASSWORD,
+                 transport=None, broker=None):
+        """
+        :param transport: 'amqp' (RabbitMQ via pika) ou 'memory' (broker em memória,
+                          no próprio processo); padrão: RABBITMQ_TRANSPORT.
+        :param broker: MemoryBroker usado pelo transporte 'memory' (padrão: o do processo).
+        """
         self._host = host
         self._port = port
         self._user = user
         self._password = password
+        self._transport = transport or RABBITMQ_TRANSPORT
+        if self._transport not in TRANSPORTS:
+            raise ValueError(f"[RabbitMQ] Transporte desconhecido: {self._transport}")
+        self._broker = broker
         self._connect_with_retry()  # Reconexão automática
 
     def _connect_with_retry(self, retries=5, delay=5):
@@ -30,6 +43,12 @@ class RabbitMQConnection:
 
     def _update_connection(self):
         """Atualiza a conexão e parâmetros sempre que necessário, com heartbeat configurado."""
+        if self._transport == "memory":
+            if hasattr(self, '_connection') and self._connection.is_open:
+                self.close()
+            self._connection = MemoryConnection(self._broker or MemoryBroker.default())
+            self._channel = self._connection.channel()
+            return
         self._credentials = pika.PlainCredentials(self._user, self._password)
         self._connection_params = pika.ConnectionParameters(
             host=self._host,
@@ -81,10 +100,54 @@ class RabbitMQConnection:
         self._password = value
         self._connect_with_retry()
 
+    @property
+    def transport(self):
+        return self._transport
+
     @property
     def channel(self):
         return self._channel
 
+    def new_channel(self):
+        """Abre um canal adicional na mesma conexão (ex.: um canal em modo confirm)."""
+        return self._connection.channel()
+
+    def new_confirm_channel(self, ack_nack_callback):
+        """
+        Abre um canal em modo confirm com confirmações em pipeline: basic_publish
+        retorna sem esperar o broker, e cada Basic.Ack/Basic.Nack é entregue a
+        ack_nack_callback(frame) durante process_data_events() (ou qualquer outra
+        chamada bloqueante da conexão).
+        """
+        channel = self._connection.channel()
+        if self._transport == "memory":
+            channel.confirm_delivery(ack_nack_callback=ack_nack_callback)
+        else:
+            # BlockingChannel.confirm_delivery() espera cada confirmação antes de
+            # retornar; o modo em pipeline existe apenas no canal assíncrono que ele envolve
+            channel._impl.confirm_delivery(ack_nack_callback=ack_nack_callback)
+        return channel
+
+    def process_data_events(self, time_limit=0):
+        """Processa I/O pendente (envio, confirms, heartbeats) por até 'time_limit' segundos."""
+        self._connection.process_data_events(time_limit=time_limit)
+
+    def add_callback_threadsafe(self, callback):
+        """Agenda 'callback' na thread da conexão (a única que pode usar o canal)."""
+        self._connection.add_callback_threadsafe(callback)
+
+    def call_later(self, delay, callback):
+        """Agenda 'callback' após 'delay' segundos, na thread da conexão."""
+        self._connection.call_later(delay, callback)
+
+    def reconnect(self):
+        """Reabre a conexão e o canal padrão (canais obtidos antes deixam de valer)."""
+        self._connect_with_retry()
+
+    def sleep(self, seconds):
+        """Aguarda processando os eventos da conexão (heartbeats), em vez de bloqueá-la."""
+        self._connection.sleep(seconds)
+
     def close(self):
         """Fecha a conexão e o canal com o RabbitMQ, se estiverem abertos."""
         try:
@@ -1,5 +1,9 @@
 import pika
+import queue
 import threading
+from collections import deque
+from configs.envs import CONSUMER_ACK_BATCH, CONSUMER_ACK_INTERVAL, CONSUMER_PREFETCH
+from source.utils.rabbitmq.codec import decode_message
 from source.utils.rabbitmq.connection import RabbitMQConnection
 from json import loads
 
@@ -13,18 +17,90 @@ def default_callback(body, exchange_name, routing_key, queue_name):
         print(f"Erro ao processar mensagem: {e}")
 
 
+class RequeueMessage(Exception):
+    """Levantada pelo callback para devolver a mensagem à fila (basic_nack com requeue)."""
+
+
+class _AckBatcher:
+    """
+    Confirma mensagens em lote (basic_ack com multiple=True).
+
+    As entregas podem terminar fora de ordem (lanes diferentes); o ack
+    avança apenas até a maior tag contígua já processada. Mensagens que
+    falham são rejeitadas na hora (basic_nack individual) e nunca servem de
+    tag para o ack múltiplo: o broker fecharia o canal por tag desconhecida.
+    Usado somente na thread da conexão.
+    """
+
+    def __init__(self, channel, batch):
+        self._channel = channel
+        self._batch = batch
+        self._delivered = deque()  # tags ainda não confirmadas, em ordem de entrega
+        self._done = {}  # tag processada fora de ordem -> True (ack pendente) ou False (já rejeitada)
+        self._ready = 0  # tags contíguas processadas e ainda não confirmadas
+        self._last_ready = None  # maior tag contígua processada com sucesso
+
+    def delivered(self, delivery_tag):
+        self._delivered.append(delivery_tag)
+
+    def completed(self, delivery_tag, success=True):
+        """:param success: True (ack), False (descartada) ou None (devolvida à fila)"""
+        if not success:
+            # Os acks contíguos pendentes têm tags menores: saem antes da rejeição
+            self.flush()
+            self._channel.basic_nack(delivery_tag=delivery_tag, requeue=success is None)
+        self._done[delivery_tag] = bool(success)
+        while self._delivered and self._delivered[0] in self._done:
+            tag = self._delivered.popleft()
+            if self._done.pop(tag):
+                self._last_ready = tag
+                self._ready += 1
+        if self._ready >= self._batch:
+            self.flush()
+
+    def flush(self):
+        if self._ready and self._channel.is_open:
+            self._channel.basic_ack(delivery_tag=self._last_ready, multiple=True)
+            self._ready = 0
+
+
 class RabbitMQConsumer:
-    def __init__(self, connection: RabbitMQConnection, exchange_name, exchange_type="topic", queues=None):
+    def __init__(self, connection: RabbitMQConnection, exchange_name, exchange_type="topic", queues=None,
+                 prefetch_count=CONSUMER_PREFETCH, ack_batch=CONSUMER_ACK_BATCH, workers=0, order_key=None,
+                 decode=False, exchange_arguments=None):
         """
         :param connection: Conexão com o RabbitMQ
         :param exchange_name: Nome da exchange
         :param exchange_type: Tipo da exchange (padrão: topic)
+        :param exchange_arguments: argumentos da exchange (ex.: 'hash-header' da x-consistent-hash)
         :param queues: Dicionário {queue_name: routing_key}
+        :param prefetch_count: mensagens entregues e ainda sem ack (basic_qos; 0 = sem limite)
+        :param ack_batch: mensagens confirmadas por basic_ack (multiple=True)
+        :param workers: se > 0, o callback roda em 'workers' lanes fora da thread da
+                        conexão; mensagens com a mesma chave vão sempre para a mesma
+                        lane, preservando a ordem entre elas
+        :param order_key: função (body, routing_key) -> chave de ordenação
+                          (padrão: a routing key)
+        :param decode: entrega ao callback (e a order_key) o dicionário já decodificado
+                       pelo codec do content_type da mensagem (JSON se ausente), em
+                       vez do corpo bruto; um lote chega como lista de dicionários
         """
+        self._connection = connection
         self._channel = connection.channel
         self._exchange_name = exchange_name
         self._exchange_type = exchange_type
+        self._exchange_arguments = exchange_arguments
         self._queues = queues or {}
+        self._prefetch_count = prefetch_count
+        # Com prefetch, o lote precisa ser menor que a janela para o consumo não travar
+        self._ack_batch = max(1, min(ack_batch, prefetch_count // 2 or ack_batch))
+        self._workers = workers
+        self._order_key = order_key or (lambda body, routing_key: routing_key)
+        self._decode = decode
+        self._lanes = []
+        self._acks = None
+        self._callback = None
+        self._consumer_tags = {}  # queue_name -> consumer_tag, durante o consumo
         self.setup_exchange()
         self.setup_queues()
 
@@ -49,7 +125,8 @@ class RabbitMQConsumer:
         self._channel.exchange_declare(
             exchange=self._exchange_name,
             exchange_type=self._exchange_type,
-            durable=True
+            durable=True,
+            arguments=self._exchange_arguments
         )
 
     def setup_queues(self):
@@ -97,25 +174,104 @@ class RabbitMQConsumer:
         else:
             print(f"A fila '{queue_name}' não existe para atualização.")
 
+    def update_queues(self, queues):
+        """
+        Passa a consumir exatamente as filas de 'queues' ({queue_name: routing_key})
+        sem interromper o consumo das demais. Durante o consumo, deve rodar na
+        thread da conexão (ex.: via connection.add_callback_threadsafe); as
+        mensagens já entregues das filas removidas ainda são processadas.
+        :return: (filas adicionadas, filas removidas)
+        """
+        removed = [queue_name for queue_name in self._queues if queue_name not in queues]
+        added = {queue_name: routing_key for queue_name, routing_key in queues.items()
+                 if queue_name not in self._queues}
+        for queue_name in removed:
+            consumer_tag = self._consumer_tags.pop(queue_name, None)
+            if consumer_tag is not None:
+                self._channel.basic_cancel(consumer_tag)
+            self.remove_queue(queue_name)
+        for queue_name, routing_key in added.items():
+            self.add_queue(queue_name, routing_key)
+            if self._callback is not None:
+                self._basic_consume(queue_name)
+        return list(added), removed
+
     # Consumo de mensagens
-    def _process_message(self, ch, method, properties, body, queue_name, callback_function):
-        """Processa cada mensagem recebida chamando o callback fornecido."""
+    def _run_callback(self, method, body, queue_name, callback_function):
+        """Executa o callback; retorna False se ele falhar e None se pedir RequeueMessage."""
         try:
             print(f"\nMensagem recebida na fila '{queue_name}' (Routing Key: {method.routing_key})")
             print(f"Exchange: {method.exchange}")
             callback_function(body, method.exchange, method.routing_key, queue_name)
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return True
+        except RequeueMessage:
+            return None
         except Exception as e:
             print(f"Erro ao processar mensagem: {e}")
+            return False
+
+    def _process_message(self, ch, method, properties, body, queue_name, callback_function):
+        """Processa cada mensagem recebida (na thread da conexão ou em uma lane)."""
+        self._acks.delivered(method.delivery_tag)
+        if self._decode:
+            try:
+                body = decode_message(body, properties.content_type, properties.content_encoding)
+            except Exception as e:
+                print(f"Erro ao decodificar mensagem da fila '{queue_name}': {e}")
+                self._acks.completed(method.delivery_tag, False)
+                return
+        if not self._lanes:
+            self._acks.completed(method.delivery_tag, self._run_callback(method, body, queue_name, callback_function))
+            return
+        lane = self._lanes[hash(self._order_key(body, method.routing_key)) % len(self._lanes)]
+        lane.put((method, body, queue_name, callback_function))
+
+    def _lane_worker(self, lane):
+        while True:
+            item = lane.get()
+            if item is None:
+                return
+            method, body, queue_name, callback_function = item
+            success = self._run_callback(method, body, queue_name, callback_function)
+            # O canal só pode ser usado pela thread da conexão: o ack é agendado nela
+            self._connection.add_callback_threadsafe(
+                lambda tag=method.delivery_tag, ok=success: self._acks.completed(tag, ok))
+
+    def _start_lanes(self):
+        self._lanes = [queue.Queue() for _ in range(self._workers)]
+        for index, lane in enumerate(self._lanes):
+            threading.Thread(target=self._lane_worker, args=(lane,), daemon=True,
+                             name=f"consumer-lane-{index}").start()
+
+    def _stop_lanes(self):
+        for lane in self._lanes:
+            lane.put(None)
+        self._lanes = []
+
+    def _flush_acks_periodically(self):
+        # Confirma o que sobrou de um lote quando o fluxo de mensagens diminui
+        if self._acks is not None and self._channel.is_open:
+            self._acks.flush()
+            self._connection.call_later(CONSUMER_ACK_INTERVAL, self._flush_acks_periodically)
+
+    def reconnect(self):
+        """Reabre a conexão e recria exchange e filas (mensagens sem ack são reentregues)."""
+        self._stop_lanes()
+        self._connection.reconnect()
+        self._channel = self._connection.channel
+        self.setup_exchange()
+        self.setup_queues()
 
     def consume(self, callback_function=default_callback):
         """Inicia o consumo de todas as filas cadastradas."""
+        self._channel.basic_qos(prefetch_count=self._prefetch_count)
+        self._acks = _AckBatcher(self._channel, self._ack_batch)
+        if self._workers:
+            self._start_lanes()
+        self._connection.call_later(CONSUMER_ACK_INTERVAL, self._flush_acks_periodically)
+        self._callback = callback_function
         for queue_name in self._queues:
-            self._channel.basic_consume(
-                queue=queue_name,
-                on_message_callback=lambda ch, method, properties, body, q=queue_name: 
-                    self._process_message(ch, method, properties, body, q, callback_function)
-            )
+            self._basic_consume(queue_name)
 
         print(f"Consumindo mensagens das filas: {', '.join(self._queues.keys())}. Pressione CTRL+C para sair.")
         try:
@@ -123,6 +279,18 @@ class RabbitMQConsumer:
         except KeyboardInterrupt:
             print("Interrompido pelo usuário. Encerrando consumidor.")
             self._channel.stop_consuming()
+        finally:
+            self._stop_lanes()
+            self._callback = None
+            self._consumer_tags = {}
+
+    def _basic_consume(self, queue_name):
+        callback_function = self._callback
+        self._consumer_tags[queue_name] = self._channel.basic_consume(
+            queue=queue_name,
+            on_message_callback=lambda ch, method, properties, body, q=queue_name:
+                self._process_message(ch, method, properties, body, q, callback_function)
+        )
 
     def start(self, callback_function=default_callback):
         """Inicia o consumo em uma thread separada."""
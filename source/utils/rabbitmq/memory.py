@@ -0,0 +1,726 @@
+import bisect
+import heapq
+import itertools
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+
+import pika
+from pika.exceptions import ChannelClosedByBroker, ChannelWrongStateError, ConnectionClosed
+from pika.spec import Basic
+
+EXCHANGE_TYPES = ("topic", "direct", "fanout", "x-consistent-hash")
+DISPATCH_BATCH = 256  # entregas por consumidor a cada rodada, sem prefetch
+TOPIC_CACHE_SIZE = 4096  # routing keys com resultado memorizado por exchange topic (LRU)
+
+
+class TopicTrie:
+    """
+    Índice de bindings topic em trie (uma palavra por nível).
+
+    '*' casa exatamente uma palavra e '#' casa zero ou mais. O resultado de
+    cada routing key é memorizado até o próximo bind/unbind, então o caminho
+    quente de publicação é uma única consulta de dicionário. Só as
+    'cache_size' routing keys usadas mais recentemente ficam memorizadas:
+    com uma chave por dispositivo (sensor.<tipo>.<id>), o cache não cresce
+    com a frota.
+    """
+
+    __slots__ = ('_root', '_cache', '_cache_size')
+
+    def __init__(self, cache_size=TOPIC_CACHE_SIZE):
+        self._root = {}  # palavra -> nó; a chave None guarda o conjunto de filas
+        self._cache = OrderedDict()  # routing key -> filas, da menos para a mais recente
+        self._cache_size = cache_size
+
+    def bind(self, pattern, queue):
+        node = self._root
+        for word in pattern.split('.'):
+            node = node.setdefault(word, {})
+        node.setdefault(None, set()).add(queue)
+        self._cache.clear()
+
+    def unbind(self, pattern, queue):
+        node = self._root
+        for word in pattern.split('.'):
+            node = node.get(word)
+            if node is None:
+                return
+        node.get(None, set()).discard(queue)
+        self._cache.clear()
+
+    def match(self, routing_key):
+        queues = self._cache.get(routing_key)
+        if queues is not None:
+            self._cache.move_to_end(routing_key)
+            return queues
+        queues = set()
+        self._walk(self._root, routing_key.split('.'), 0, queues)
+        queues = self._cache[routing_key] = frozenset(queues)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return queues
+
+    def _walk(self, node, words, index, found):
+        if index == len(words):
+            found.update(node.get(None, ()))
+            # '#' no final também casa zero palavras
+            if '#' in node:
+                self._walk(node['#'], words, index, found)
+            return
+        word = words[index]
+        if word in node:
+            self._walk(node[word], words, index + 1, found)
+        if '*' in node:
+            self._walk(node['*'], words, index + 1, found)
+        if '#' in node:
+            hash_node = node['#']
+            for skip in range(index, len(words) + 1):
+                self._walk(hash_node, words, skip, found)
+
+
+def _ring_hash(value):
+    return zlib.crc32(value.encode())
+
+
+class _Exchange:
+    __slots__ = ('name', 'type', 'durable', 'arguments', 'bindings', 'trie', 'ring',
+                 'exchange_bindings', 'exchange_trie')
+
+    def __init__(self, name, exchange_type, durable, arguments=None):
+        self.name = name
+        self.type = exchange_type
+        self.durable = durable
+        self.arguments = dict(arguments or {})
+        self.bindings = set()  # (queue, routing_key)
+        self.trie = TopicTrie()
+        self.ring = None  # x-consistent-hash: lista ordenada de (hash, fila)
+        self.exchange_bindings = set()  # (exchange de destino, routing_key)
+        self.exchange_trie = TopicTrie()
+
+    def bind(self, queue, routing_key):
+        if (queue, routing_key) not in self.bindings:
+            self.bindings.add((queue, routing_key))
+            self.trie.bind(routing_key, queue)
+            self.ring = None
+
+    def unbind(self, queue, routing_key):
+        if (queue, routing_key) in self.bindings:
+            self.bindings.discard((queue, routing_key))
+            self.trie.unbind(routing_key, queue)
+            self.ring = None
+
+    def bind_exchange(self, destination, routing_key):
+        if (destination, routing_key) not in self.exchange_bindings:
+            self.exchange_bindings.add((destination, routing_key))
+            self.exchange_trie.bind(routing_key, destination)
+
+    def unbind_exchange(self, destination, routing_key):
+        if (destination, routing_key) in self.exchange_bindings:
+            self.exchange_bindings.discard((destination, routing_key))
+            self.exchange_trie.unbind(routing_key, destination)
+
+    def _match(self, bindings, trie, routing_key):
+        if self.type == "fanout":
+            return {target for target, _ in bindings}
+        if self.type == "direct":
+            return {target for target, key in bindings if key == routing_key}
+        return trie.match(routing_key)
+
+    def route(self, routing_key, properties=None):
+        if self.type == "x-consistent-hash":
+            return self._route_hash(routing_key, properties)
+        return self._match(self.bindings, self.trie, routing_key)
+
+    def route_exchanges(self, routing_key):
+        """Exchanges de destino (bindings exchange -> exchange) que casam com a routing key."""
+        return self._match(self.exchange_bindings, self.exchange_trie, routing_key)
+
+    def _route_hash(self, routing_key, properties):
+        """
+        Como o plugin rabbitmq_consistent_hash_exchange: cada binding coloca
+        no anel tantos pontos quanto o seu peso (a routing key do binding), e
+        a mensagem vai para a fila do primeiro ponto após o hash da sua routing
+        key, ou do header 'hash-header' se configurado (sem o header, a
+        mensagem não é roteada).
+        """
+        header = self.arguments.get("hash-header")
+        if header:
+            headers = getattr(properties, "headers", None) or {}
+            value = headers.get(header)
+            if value is None:
+                return ()
+            routing_key = str(value)
+        if self.ring is None:
+            self.ring = sorted((_ring_hash(f"{queue}:{point}"), queue)
+                               for queue, weight in self.bindings for point in range(int(weight or 1)))
+        if not self.ring:
+            return ()
+        index = bisect.bisect(self.ring, (_ring_hash(routing_key),)) % len(self.ring)
+        return (self.ring[index][1],)
+
+
+class _Message:
+    __slots__ = ('exchange', 'routing_key', 'body', 'properties', 'published_at', 'redelivered')
+
+    def __init__(self, exchange, routing_key, body, properties, published_at):
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.body = body
+        self.properties = properties
+        self.published_at = published_at
+        self.redelivered = False
+
+    @property
+    def persistent(self):
+        return self.properties is not None and self.properties.delivery_mode == 2
+
+
+class _Queue:
+    __slots__ = ('name', 'durable', 'exclusive', 'auto_delete', 'owner', 'messages', 'consumers')
+
+    def __init__(self, name, durable, exclusive, auto_delete, owner):
+        self.name = name
+        self.durable = durable
+        self.exclusive = exclusive
+        self.auto_delete = auto_delete
+        self.owner = owner
+        self.messages = deque()
+        self.consumers = 0
+
+
+class _Consumer:
+    __slots__ = ('tag', 'queue', 'callback', 'auto_ack', 'unacked')
+
+    def __init__(self, tag, queue, callback, auto_ack):
+        self.tag = tag
+        self.queue = queue
+        self.callback = callback
+        self.auto_ack = auto_ack
+        self.unacked = 0
+
+
+class MemoryBroker:
+    """
+    Broker AMQP em memória, compartilhado pelas conexões do mesmo processo.
+
+    Suporta exchanges topic/direct/fanout/x-consistent-hash, bindings entre
+    exchanges e a exchange padrão (""), filas
+    duráveis, exclusivas e auto_delete, bindings, acks (inclusive
+    multiple=True), nack/reject com requeue e prefetch por consumidor.
+    restart() simula a reinicialização do broker: só exchanges e filas
+    duráveis, seus bindings e as mensagens persistentes (delivery_mode=2)
+    sobrevivem.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._exchanges = {}
+        self._queues = {}
+        self.published = 0
+        self.delivered = 0
+        self.acked = 0
+        self.unroutable = 0
+        self.events = 0  # incrementado a cada publicação, ack ou devolução à fila
+        # Chamado a cada ack com (fila, segundos desde a publicação); usado por benchmarks
+        self.ack_listener = None
+
+    @classmethod
+    def default(cls):
+        """Instância única usada por RabbitMQConnection(transport="memory")."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    # Topologia
+    def exchange_declare(self, exchange, exchange_type="topic", durable=False, passive=False, arguments=None):
+        with self._condition:
+            existing = self._exchanges.get(exchange)
+            if existing is None:
+                if passive:
+                    raise ChannelClosedByBroker(404, f"NOT_FOUND - no exchange '{exchange}'")
+                if exchange_type not in EXCHANGE_TYPES:
+                    raise ChannelClosedByBroker(503, f"COMMAND_INVALID - unknown exchange type '{exchange_type}'")
+                self._exchanges[exchange] = _Exchange(exchange, exchange_type, durable, arguments)
+            elif not passive and existing.type != exchange_type:
+                raise ChannelClosedByBroker(406, f"PRECONDITION_FAILED - inequivalent arg 'type' for exchange '{exchange}'")
+            elif not passive and existing.arguments != dict(arguments or {}):
+                raise ChannelClosedByBroker(406, f"PRECONDITION_FAILED - inequivalent arguments for exchange '{exchange}'")
+
+    def exchange_bind(self, destination, source, routing_key):
+        with self._condition:
+            self._require_exchange(destination)
+            self._require_exchange(source).bind_exchange(destination, routing_key)
+
+    def exchange_unbind(self, destination, source, routing_key):
+        with self._condition:
+            self._require_exchange(source).unbind_exchange(destination, routing_key)
+
+    def exchange_delete(self, exchange):
+        with self._condition:
+            self._exchanges.pop(exchange, None)
+
+    def queue_declare(self, queue, durable=False, exclusive=False, auto_delete=False, passive=False, owner=None):
+        with self._condition:
+            existing = self._queues.get(queue)
+            if existing is None:
+                if passive:
+                    raise ChannelClosedByBroker(404, f"NOT_FOUND - no queue '{queue}'")
+                existing = self._queues[queue] = _Queue(queue, durable, exclusive, auto_delete,
+                                                        owner if exclusive else None)
+            elif existing.exclusive and existing.owner is not owner:
+                raise ChannelClosedByBroker(405, f"RESOURCE_LOCKED - queue '{queue}' is exclusive")
+            return len(existing.messages), existing.consumers
+
+    def queue_bind(self, exchange, queue, routing_key):
+        with self._condition:
+            self._require_queue(queue)
+            self._require_exchange(exchange).bind(queue, routing_key)
+
+    def queue_unbind(self, exchange, queue, routing_key):
+        with self._condition:
+            self._require_exchange(exchange).unbind(queue, routing_key)
+
+    def queue_purge(self, queue):
+        with self._condition:
+            messages = self._require_queue(queue).messages
+            count = len(messages)
+            messages.clear()
+            return count
+
+    def queue_delete(self, queue):
+        with self._condition:
+            removed = self._queues.pop(queue, None)
+            for exchange in self._exchanges.values():
+                for bound_queue, routing_key in list(exchange.bindings):
+                    if bound_queue == queue:
+                        exchange.unbind(bound_queue, routing_key)
+            return len(removed.messages) if removed else 0
+
+    def _require_exchange(self, exchange):
+        try:
+            return self._exchanges[exchange]
+        except KeyError:
+            raise ChannelClosedByBroker(404, f"NOT_FOUND - no exchange '{exchange}'") from None
+
+    def _require_queue(self, queue):
+        try:
+            return self._queues[queue]
+        except KeyError:
+            raise ChannelClosedByBroker(404, f"NOT_FOUND - no queue '{queue}'") from None
+
+    # Mensagens
+    def publish(self, exchange, routing_key, body, properties=None):
+        """:return: quantidade de filas que receberam a mensagem."""
+        if isinstance(body, str):
+            body = body.encode()
+        message = _Message(exchange, routing_key, body, properties, time.perf_counter())
+        with self._condition:
+            if exchange == "":
+                queues = (routing_key,) if routing_key in self._queues else ()
+            else:
+                source = self._require_exchange(exchange)
+                queues = source.route(routing_key, properties)
+                if source.exchange_bindings:
+                    queues = self._route_exchanges_locked(source, routing_key, properties, set(queues), {exchange})
+            self.published += 1
+            if not queues:
+                self.unroutable += 1
+                return 0
+            for queue in queues:
+                self._queues[queue].messages.append(message)
+            self._notify_locked()
+            return len(queues)
+
+    def _route_exchanges_locked(self, source, routing_key, properties, queues, visited):
+        """Acrescenta a 'queues' as filas alcançadas pelos bindings exchange -> exchange."""
+        for name in source.route_exchanges(routing_key):
+            destination = self._exchanges.get(name)
+            if destination is None or name in visited:
+                continue
+            visited.add(name)
+            queues.update(destination.route(routing_key, properties))
+            if destination.exchange_bindings:
+                self._route_exchanges_locked(destination, routing_key, properties, queues, visited)
+        return queues
+
+    def _next_delivery_locked(self, consumer, prefetch):
+        queue = self._queues.get(consumer.queue)
+        if queue is None or not queue.messages:
+            return None
+        if prefetch and not consumer.auto_ack and consumer.unacked >= prefetch:
+            return None
+        message = queue.messages.popleft()
+        self.delivered += 1
+        if not consumer.auto_ack:
+            consumer.unacked += 1
+        return message
+
+    def _requeue_locked(self, queue, messages):
+        target = self._queues.get(queue)
+        if target is None:
+            return
+        for message in reversed(messages):
+            message.redelivered = True
+            target.messages.appendleft(message)
+        self._notify_locked()
+
+    def _acked_locked(self, queue, message):
+        self.acked += 1
+        if self.ack_listener is not None:
+            self.ack_listener(queue, time.perf_counter() - message.published_at)
+
+    def _notify_locked(self):
+        self.events += 1
+        self._condition.notify_all()
+
+    def wait(self, timeout, seen=None):
+        """
+        Aguarda um evento do broker por até 'timeout' segundos. Com 'seen' (valor
+        de 'events' lido antes), retorna na hora se algo aconteceu desde então.
+        """
+        with self._condition:
+            if seen is None:
+                self._condition.wait(timeout)
+            else:
+                self._condition.wait_for(lambda: self.events != seen, timeout)
+
+    def notify(self):
+        with self._condition:
+            self._notify_locked()
+
+    def release_owner(self, owner):
+        """Remove as filas exclusivas de uma conexão encerrada."""
+        with self._condition:
+            for name in [name for name, queue in self._queues.items() if queue.owner is owner]:
+                self.queue_delete(name)
+
+    def restart(self):
+        """Simula a reinicialização do broker (perde o que não é durável/persistente)."""
+        with self._condition:
+            self._exchanges = {name: exchange for name, exchange in self._exchanges.items() if exchange.durable}
+            for name in [name for name, queue in self._queues.items() if not queue.durable]:
+                self.queue_delete(name)
+            for queue in self._queues.values():
+                queue.messages = deque(message for message in queue.messages if message.persistent)
+                queue.consumers = 0
+
+    def message_count(self, queue):
+        with self._condition:
+            return len(self._require_queue(queue).messages)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "published": self.published,
+                "delivered": self.delivered,
+                "acked": self.acked,
+                "unroutable": self.unroutable,
+                "queued": sum(len(queue.messages) for queue in self._queues.values()),
+            }
+
+
+class _Frame:
+    """Imita o frame devolvido pelo pika em queue_declare (frame.method.queue etc.)."""
+
+    def __init__(self, method):
+        self.method = method
+
+
+class MemoryChannel:
+    """
+    Canal com a mesma interface do BlockingChannel do pika (subconjunto usado
+    pelo projeto), sobre um MemoryBroker.
+    """
+
+    def __init__(self, connection, broker, channel_number):
+        self._connection = connection
+        self._broker = broker
+        self.channel_number = channel_number
+        self._consumers = {}  # consumer_tag -> _Consumer
+        self._unacked = {}  # delivery_tag -> (consumer, message), em ordem de entrega
+        self._delivery_tags = itertools.count(1)
+        self._consumer_tags = itertools.count(1)
+        self._prefetch = 0
+        self._consuming = False
+        self._confirming = False
+        self._on_confirm = None
+        self._publish_seq = 0
+        self._closed = False
+
+    @property
+    def is_open(self):
+        return not self._closed and self._connection.is_open
+
+    @property
+    def is_closed(self):
+        return not self.is_open
+
+    def _check_open(self):
+        if not self.is_open:
+            raise ChannelWrongStateError("Channel is closed.")
+
+    # Topologia
+    def exchange_declare(self, exchange, exchange_type="direct", passive=False, durable=False,
+                         auto_delete=False, internal=False, arguments=None):
+        self._check_open()
+        exchange_type = getattr(exchange_type, "value", exchange_type)
+        self._broker.exchange_declare(exchange, exchange_type, durable, passive, arguments)
+
+    def exchange_delete(self, exchange=None, if_unused=False):
+        self._broker.exchange_delete(exchange)
+
+    def exchange_bind(self, destination, source, routing_key='', arguments=None):
+        self._check_open()
+        self._broker.exchange_bind(destination, source, routing_key)
+
+    def exchange_unbind(self, destination=None, source=None, routing_key='', arguments=None):
+        self._broker.exchange_unbind(destination, source, routing_key)
+
+    def queue_declare(self, queue, passive=False, durable=False, exclusive=False, auto_delete=False, arguments=None):
+        self._check_open()
+        if not queue:
+            queue = f"amq.gen-{id(self):x}-{next(self._consumer_tags)}"
+        message_count, consumer_count = self._broker.queue_declare(
+            queue, durable, exclusive, auto_delete, passive, owner=self._connection)
+        return _Frame(pika.spec.Queue.DeclareOk(queue, message_count, consumer_count))
+
+    def queue_bind(self, queue, exchange, routing_key=None, arguments=None):
+        self._check_open()
+        self._broker.queue_bind(exchange, queue, queue if routing_key is None else routing_key)
+
+    def queue_unbind(self, queue, exchange=None, routing_key=None, arguments=None):
+        self._broker.queue_unbind(exchange, queue, queue if routing_key is None else routing_key)
+
+    def queue_purge(self, queue):
+        return self._broker.queue_purge(queue)
+
+    def queue_delete(self, queue, if_unused=False, if_empty=False):
+        return self._broker.queue_delete(queue)
+
+    # Publicação
+    def confirm_delivery(self, ack_nack_callback=None, callback=None):
+        """
+        Modo confirm. Sem 'ack_nack_callback', como no BlockingChannel, basic_publish
+        retorna já confirmado; com ele, como no canal assíncrono do pika, cada
+        publicação é confirmada por ack_nack_callback(frame) com frame.method
+        do tipo Basic.Ack e delivery_tag sequencial.
+        """
+        self._confirming = True
+        self._on_confirm = ack_nack_callback
+        self._publish_seq = 0
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self._check_open()
+        routed = self._broker.publish(exchange, routing_key, body, properties)
+        if not self._confirming:
+            return
+        self._publish_seq += 1
+        if self._on_confirm is not None:
+            # A publicação em memória é síncrona: a mensagem já está nas filas
+            self._connection.add_callback_threadsafe(
+                lambda tag=self._publish_seq: self._on_confirm(_Frame(Basic.Ack(delivery_tag=tag))))
+        elif mandatory and not routed:
+            raise pika.exceptions.UnroutableError([])
+
+    # Consumo
+    def basic_qos(self, prefetch_size=0, prefetch_count=0, global_qos=False):
+        self._prefetch = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, exclusive=False,
+                      consumer_tag=None, arguments=None):
+        self._check_open()
+        consumer_tag = consumer_tag or f"ctag{self.channel_number}.{next(self._consumer_tags)}"
+        with self._broker._condition:
+            self._broker._require_queue(queue).consumers += 1
+            self._consumers[consumer_tag] = _Consumer(consumer_tag, queue, on_message_callback, auto_ack)
+        return consumer_tag
+
+    def basic_cancel(self, consumer_tag=""):
+        with self._broker._condition:
+            consumer = self._consumers.pop(consumer_tag, None)
+            if consumer is None:
+                return
+            queue = self._broker._queues.get(consumer.queue)
+            if queue is not None:
+                queue.consumers -= 1
+                if queue.auto_delete and queue.consumers <= 0:
+                    self._broker.queue_delete(queue.name)
+
+    def _settle(self, delivery_tag, multiple):
+        """
+        Remove e devolve as entregas confirmadas por (delivery_tag, multiple).
+        Como no RabbitMQ, uma tag desconhecida ou já confirmada é erro de protocolo.
+        """
+        if (delivery_tag or not multiple) and delivery_tag not in self._unacked:
+            raise ChannelClosedByBroker(406, f"PRECONDITION_FAILED - unknown delivery tag {delivery_tag}")
+        if multiple:
+            tags = [tag for tag in self._unacked if delivery_tag == 0 or tag <= delivery_tag]
+        else:
+            tags = [delivery_tag]
+        settled = [self._unacked.pop(tag) for tag in tags]
+        for consumer, _ in settled:
+            consumer.unacked -= 1
+        return settled
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        with self._broker._condition:
+            for consumer, message in self._settle(delivery_tag, multiple):
+                self._broker._acked_locked(consumer.queue, message)
+            self._broker._notify_locked()
+
+    def basic_nack(self, delivery_tag=0, multiple=False, requeue=True):
+        with self._broker._condition:
+            settled = self._settle(delivery_tag, multiple)
+            if requeue:
+                by_queue = {}
+                for consumer, message in settled:
+                    by_queue.setdefault(consumer.queue, []).append(message)
+                for queue, messages in by_queue.items():
+                    self._broker._requeue_locked(queue, messages)
+            self._broker._notify_locked()
+
+    def basic_reject(self, delivery_tag, requeue=True):
+        self.basic_nack(delivery_tag, multiple=False, requeue=requeue)
+
+    def _next_deliveries(self):
+        """Retira do broker as mensagens que cabem no prefetch de cada consumidor."""
+        deliveries = []
+        with self._broker._condition:
+            for consumer in list(self._consumers.values()):
+                for _ in range(DISPATCH_BATCH):
+                    message = self._broker._next_delivery_locked(consumer, self._prefetch)
+                    if message is None:
+                        break
+                    tag = next(self._delivery_tags)
+                    if not consumer.auto_ack:
+                        self._unacked[tag] = (consumer, message)
+                    deliveries.append((consumer, tag, message))
+        return deliveries
+
+    def _dispatch(self, deliveries):
+        for consumer, tag, message in deliveries:
+            method = Basic.Deliver(consumer.tag, tag, message.redelivered, message.exchange, message.routing_key)
+            properties = message.properties or pika.BasicProperties()
+            consumer.callback(self, method, properties, message.body)
+
+    def process_data_events(self, time_limit=0):
+        """
+        Entrega as mensagens pendentes e executa callbacks agendados. Como no
+        pika, espera até 'time_limit' apenas enquanto não houver eventos.
+        """
+        deadline = time.monotonic() + (time_limit or 0)
+        while True:
+            ran = self._connection._run_callbacks()
+            deliveries = self._next_deliveries() if self.is_open else []
+            self._dispatch(deliveries)
+            remaining = deadline - time.monotonic()
+            if ran or deliveries or remaining <= 0:
+                return
+            self._broker.wait(min(remaining, self._connection._next_timer_in()))
+
+    def start_consuming(self):
+        self._consuming = True
+        while self._consuming and self.is_open and self._consumers:
+            self.process_data_events(time_limit=0.1)
+
+    def stop_consuming(self, consumer_tag=None):
+        self._consuming = False
+        for tag in list(self._consumers):
+            self.basic_cancel(tag)
+
+    def close(self, reply_code=0, reply_text="Normal shutdown"):
+        if self._closed:
+            return
+        for tag in list(self._consumers):
+            self.basic_cancel(tag)
+        # Entregas sem ack voltam para a fila, como no RabbitMQ
+        self.basic_nack(0, multiple=True, requeue=True)
+        self._closed = True
+        self._consuming = False
+
+
+class MemoryConnection:
+    """Conexão com a interface do BlockingConnection do pika, sobre um MemoryBroker."""
+
+    def __init__(self, broker=None):
+        self._broker = broker or MemoryBroker.default()
+        self._channels = []
+        self._channel_numbers = itertools.count(1)
+        self._callbacks = deque()
+        self._timers = []  # heap de (instante, seq, callback)
+        self._timer_seq = itertools.count()
+        self._open = True
+
+    @property
+    def broker(self):
+        return self._broker
+
+    @property
+    def is_open(self):
+        return self._open
+
+    @property
+    def is_closed(self):
+        return not self._open
+
+    def channel(self, channel_number=None):
+        channel = MemoryChannel(self, self._broker, channel_number or next(self._channel_numbers))
+        self._channels.append(channel)
+        return channel
+
+    def add_callback_threadsafe(self, callback):
+        """Agenda 'callback' para a thread que processa os eventos da conexão."""
+        if not self._open:
+            raise ConnectionClosed(320, "Connection is closed")
+        self._callbacks.append(callback)
+        self._broker.notify()
+
+    def call_later(self, delay, callback):
+        """Agenda 'callback' após 'delay' segundos, na thread que processa os eventos."""
+        heapq.heappush(self._timers, (time.monotonic() + delay, next(self._timer_seq), callback))
+
+    def _next_timer_in(self, default=0.1):
+        if not self._timers:
+            return default
+        return max(0.0, min(default, self._timers[0][0] - time.monotonic()))
+
+    def _run_callbacks(self):
+        ran = 0
+        now = time.monotonic()
+        while self._timers and self._timers[0][0] <= now:
+            heapq.heappop(self._timers)[2]()
+            ran += 1
+        while self._callbacks:
+            try:
+                callback = self._callbacks.popleft()
+            except IndexError:
+                break
+            callback()
+            ran += 1
+        return ran
+
+    def process_data_events(self, time_limit=0):
+        channel = self._channels[0] if self._channels else self.channel()
+        channel.process_data_events(time_limit)
+
+    def sleep(self, duration):
+        deadline = time.monotonic() + duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.process_data_events(time_limit=remaining)
+
+    def close(self, reply_code=200, reply_text="Normal shutdown"):
+        if not self._open:
+            return
+        for channel in self._channels:
+            channel.close()
+        self._open = False
+        self._broker.release_owner(self)
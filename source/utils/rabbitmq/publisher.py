@@ -1,15 +1,48 @@
 import pika
-import json
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 
+from pika.exceptions import NackError
+
+from configs.envs import BATCH_COMPRESS_MIN, PUBLISH_CONFIRM_TIMEOUT, PUBLISH_CONFIRM_WINDOW
+from source.utils.rabbitmq.codec import JSON, encode_batch, encode_message
 from source.utils.rabbitmq.connection import RabbitMQConnection
 
+
 class RabbitMQPublisher:
-    def __init__(self, connection: RabbitMQConnection, exchange_name, exchange_type="topic", queue_name=None, routing_key=None):
-        self._channel = connection.channel
+    def __init__(self, connection: RabbitMQConnection, exchange_name, exchange_type="topic", queue_name=None, routing_key=None,
+                 verbose=True, confirm=False, max_in_flight=PUBLISH_CONFIRM_WINDOW, codec=JSON):
+        """
+        :param verbose: imprime cada mensagem publicada (desative em alto volume)
+        :param confirm: modo confirm com publicações em pipeline: cada publicação
+                        devolve um Future, resolvido quando o broker confirma (ack)
+                        ou com NackError se ele recusar a mensagem
+        :param max_in_flight: publicações aguardando confirmação antes de bloquear
+        :param codec: formato do corpo (ver codec.py), informado no content_type;
+                      mensagens que não cabem no schema do codec vão em JSON
+        """
+        self._connection = connection
+        self._codec = codec
+        self._verbose = verbose
         self._exchange_name = exchange_name
         self._exchange_type = exchange_type
         self._queue_name = queue_name
         self._routing_key = routing_key
+        self._confirm = confirm
+        self._max_in_flight = max_in_flight
+        # delivery_tag -> (future, routing_key, body, properties), em ordem de publicação
+        self._pending = OrderedDict()
+        self._next_tag = 1
+        self._open_channel()
+
+    def _open_channel(self):
+        if self._confirm:
+            # Canal próprio: o modo confirm vale para o canal inteiro
+            self._channel = self._connection.new_confirm_channel(self._on_confirm)
+            self._next_tag = 1
+        else:
+            self._channel = self._connection.channel
         self.setup_exchange()
         if self._queue_name and self._routing_key:
             self.setup_queue()
@@ -61,16 +94,145 @@ class RabbitMQPublisher:
             routing_key=self._routing_key
         )
 
-    def publish_message(self, message_body: dict):
-        body_str = json.dumps(message_body)
-        self._channel.basic_publish(
-            exchange=self._exchange_name,
-            routing_key=self._routing_key,
-            body=body_str,
-            properties=pika.BasicProperties(delivery_mode=2)
-        )
-        print(f"Mensagem publicada no Exchange '{self._exchange_name}' "
-              f"com routing_key '{self._routing_key}': {message_body}")
+    def publish_message(self, message_body: dict, routing_key=None, shard_key=None):
+        """
+        Publica uma mensagem persistente.
+        :param shard_key: chave do header usado pela exchange de shards do gateway
+        :return: Future da confirmação no modo confirm; None caso contrário.
+        """
+        routing_key = routing_key or self._routing_key
+        body, properties = encode_message(message_body, self._codec, shard_key)
+        if self._confirm:
+            future = self._publish_confirmed(routing_key, body, properties)
+            self._collect_confirms()
+        else:
+            future = None
+            self._channel.basic_publish(
+                exchange=self._exchange_name,
+                routing_key=routing_key,
+                body=body,
+                properties=properties
+            )
+        if self._verbose:
+            print(f"Mensagem publicada no Exchange '{self._exchange_name}' "
+                  f"com routing_key '{routing_key}': {message_body}")
+        return future
+
+    def publish_batch(self, messages, routing_key=None):
+        """
+        Publica várias mensagens de uma vez (sem log por mensagem).
+
+        :param messages: dicionários, ou pares (routing_key, dicionário)
+        :return: lista de Futures no modo confirm; None caso contrário.
+        """
+        default_key = routing_key or self._routing_key
+        futures = [] if self._confirm else None
+        for message in messages:
+            key, message_body = message if isinstance(message, tuple) else (default_key, message)
+            body, properties = encode_message(message_body, self._codec)
+            if self._confirm:
+                futures.append(self._publish_confirmed(key, body, properties))
+            else:
+                self._channel.basic_publish(exchange=self._exchange_name, routing_key=key,
+                                            body=body, properties=properties)
+        if self._confirm:
+            self._collect_confirms()
+        if self._verbose:
+            print(f"Lote de {len(messages)} mensagens publicado no Exchange '{self._exchange_name}'.")
+        return futures
+
+    def publish_packed(self, messages, routing_key=None, compress_min=BATCH_COMPRESS_MIN, shard_key=None):
+        """
+        Publica várias mensagens como uma única mensagem AMQP (lote), que o
+        consumidor decodifica como lista (ver codec.encode_batch).
+        :param compress_min: tamanho do corpo a partir do qual o lote é comprimido
+        :param shard_key: chave do header usado pela exchange de shards do gateway
+        :return: Future da confirmação no modo confirm; None caso contrário.
+        """
+        routing_key = routing_key or self._routing_key
+        body, properties = encode_batch(messages, self._codec, compress_min, shard_key)
+        if self._confirm:
+            future = self._publish_confirmed(routing_key, body, properties)
+            self._collect_confirms()
+        else:
+            future = None
+            self._channel.basic_publish(
+                exchange=self._exchange_name,
+                routing_key=routing_key,
+                body=body,
+                properties=properties
+            )
+        if self._verbose:
+            print(f"Lote de {len(messages)} mensagens ({len(body)} bytes) publicado no Exchange "
+                  f"'{self._exchange_name}' com routing_key '{routing_key}'.")
+        return future
+
+    # Modo confirm
+    def _publish_confirmed(self, routing_key, body, properties, future=None):
+        deadline = time.monotonic() + PUBLISH_CONFIRM_TIMEOUT
+        # Janela limitada: aguarda confirmações antes de publicar mais
+        while len(self._pending) >= self._max_in_flight:
+            if time.monotonic() > deadline:
+                raise TimeoutError("[RabbitMQ] Tempo esgotado aguardando confirmações do broker.")
+            self._connection.process_data_events(time_limit=0.01)
+        future = future or Future()
+        self._channel.basic_publish(exchange=self._exchange_name, routing_key=routing_key,
+                                    body=body, properties=properties)
+        self._pending[self._next_tag] = (future, routing_key, body, properties)
+        self._next_tag += 1
+        return future
+
+    def _collect_confirms(self):
+        """Recolhe, sem esperar, as confirmações que o broker já enviou."""
+        self._connection.process_data_events(time_limit=0)
+
+    def _on_confirm(self, frame):
+        """Ack/Nack do broker; 'multiple' confirma todas as tags até delivery_tag."""
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        if getattr(method, 'multiple', False):
+            tags = [tag for tag in self._pending if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self._pending else []
+        for tag in tags:
+            future, _, body, _ = self._pending.pop(tag)
+            if acked:
+                future.set_result(True)
+            else:
+                future.set_exception(NackError([body]))
+
+    def flush(self, timeout=PUBLISH_CONFIRM_TIMEOUT):
+        """
+        Aguarda a confirmação de todas as publicações pendentes.
+        :return: True se todas foram confirmadas (ack ou nack) dentro do prazo.
+        """
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            self._connection.process_data_events(time_limit=0.01)
+        return not self._pending
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    def reconnect(self):
+        """
+        Reabre a conexão e recria exchange/fila. No modo confirm, as mensagens
+        ainda sem confirmação são republicadas (entrega ao menos uma vez) e os
+        seus Futures continuam válidos; se a conexão não voltar, eles falham
+        com o mesmo erro.
+        """
+        unconfirmed = list(self._pending.values())
+        self._pending.clear()
+        try:
+            self._connection.reconnect()
+            self._open_channel()
+        except Exception as e:
+            for future, _, _, _ in unconfirmed:
+                future.set_exception(e)
+            raise
+        for future, routing_key, body, properties in unconfirmed:
+            self._publish_confirmed(routing_key, body, properties, future)
 
 if __name__ == "__main__":
     connection = RabbitMQConnection()
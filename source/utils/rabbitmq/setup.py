@@ -1,5 +1,5 @@
 import pika
-from configs.envs import RABBITMQ_HOST, RABBITMQ_PORT, RABBITMQ_USER, RABBITMQ_PASSWORD
+from configs.envs import INGEST_SHARDS, RABBITMQ_HOST, RABBITMQ_PORT, RABBITMQ_USER, RABBITMQ_PASSWORD
 
 EXCHANGES = {
     "sensors_exchange": "topic",
@@ -28,6 +28,67 @@ QUEUES = {
     "queue.door": {"exchange": "commands_exchange", "routing_key": "command.door.*"},
 }
 
+# Filas ligadas a 'sensors_exchange' (sem consumidores quando a ingestão usa shards)
+SENSOR_QUEUES = [name for name, config in QUEUES.items() if config["exchange"] == "sensors_exchange"]
+
+# Filas consumidas pelo gateway sem sharding, ligadas a 'sensors_exchange': {queue_name: routing_key}
+# ('#' casa tanto sensor.<tipo>.<id> quanto o formato antigo, sem o id)
+INGEST_QUEUES = {
+    "queue.temperature": "sensor.temperature.#",
+    "queue.luminosity": "sensor.luminosity.#",
+    "queue.presence": "sensor.presence.#",
+    "queue.lamp": "command.lamp.*",
+    "queue.air_conditioner": "command.air_conditioner.*",
+    "queue.door": "command.door.*",
+    "queue.sprinkler": "command.sprinkler.*",
+}
+
+# Sharding da ingestão: 'sensors_exchange' repassa tudo a uma exchange
+# x-consistent-hash (plugin rabbitmq_consistent_hash_exchange), que distribui
+# as mensagens entre INGEST_SHARDS filas pelo hash do header 'shard_key'.
+SHARDS_EXCHANGE = "ingest_shards"
+SHARDS_EXCHANGE_TYPE = "x-consistent-hash"
+SHARD_HEADER = "shard_key"
+SHARDS_EXCHANGE_ARGUMENTS = {"hash-header": SHARD_HEADER}
+SHARD_WEIGHT = "20"  # pontos de cada fila no anel da exchange (todas com o mesmo peso)
+
+
+def shard_queue(index):
+    return f"queue.shard.{index:03d}"
+
+
+def setup_shards(channel, shards=INGEST_SHARDS):
+    """
+    Declara a exchange de shards, o binding a partir de 'sensors_exchange' e
+    todas as filas de shard, consumidas ou não: enquanto um shard está sem
+    dono (ex.: durante um rebalanceamento), as mensagens dele ficam na fila.
+    Só declara (pode ser chamada por quem publica); a remoção dos bindings
+    antigos fica em unbind_ingest_queues().
+    """
+    channel.exchange_declare(exchange="sensors_exchange", exchange_type="topic", durable=True)
+    channel.exchange_declare(exchange=SHARDS_EXCHANGE, exchange_type=SHARDS_EXCHANGE_TYPE, durable=True,
+                             arguments=SHARDS_EXCHANGE_ARGUMENTS)
+    channel.exchange_bind(destination=SHARDS_EXCHANGE, source="sensors_exchange", routing_key="#")
+    for index in range(shards):
+        channel.queue_declare(queue=shard_queue(index), durable=True)
+        channel.queue_bind(exchange=SHARDS_EXCHANGE, queue=shard_queue(index), routing_key=SHARD_WEIGHT)
+
+
+def unbind_ingest_queues(channel):
+    """
+    Remove de 'sensors_exchange' os bindings da ingestão sem shards: os de
+    setup_rabbitmq() (QUEUES) e os do gateway (INGEST_QUEUES). Com shards
+    ninguém consome essas filas, e cada leitura, status ou heartbeat seria
+    copiado também para filas duráveis que só crescem. Chamada pelo gateway
+    (e por setup_rabbitmq()) ao usar shards, nunca pelos publicadores.
+    """
+    bindings = {(name, QUEUES[name]["routing_key"]) for name in SENSOR_QUEUES}
+    bindings.update(INGEST_QUEUES.items())
+    for queue_name, routing_key in sorted(bindings):
+        # Declarada antes: unbind de fila inexistente fecha o canal
+        channel.queue_declare(queue=queue_name, durable=True)
+        channel.queue_unbind(queue=queue_name, exchange="sensors_exchange", routing_key=routing_key)
+
 def setup_rabbitmq():
     """Configures RabbitMQ with multiple exchanges, queues, and appropriate bindings."""
     credentials = pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASSWORD)
@@ -40,12 +101,18 @@ def setup_rabbitmq():
         channel.exchange_declare(exchange=exchange_name, exchange_type=exchange_type, durable=True)
 
     for queue_name, config in QUEUES.items():
+        if INGEST_SHARDS and queue_name in SENSOR_QUEUES:
+            continue  # ver setup_shards
         exchange = config["exchange"]
         routing_key = config["routing_key"]
 
         channel.queue_declare(queue=queue_name, durable=True)
         channel.queue_bind(exchange=exchange, queue=queue_name, routing_key=routing_key)
 
+    if INGEST_SHARDS:
+        setup_shards(channel)
+        unbind_ingest_queues(channel)
+
     print("RabbitMQ configuration completed successfully!")
     connection.close()
 